@@ -0,0 +1,99 @@
+# benchmark_memory.py
+# 每個 session 保留的分析結果記憶體用量：舊版（每檔保留整份 TickerBundle）vs 精簡 TickerRecord
+#   python benchmark_memory.py [--tickers 50] [--sessions 10]     # 合成資料（大小接近 yfinance 實際回傳），不需連網
+#   python benchmark_memory.py --symbols AAPL,MSFT,...             # 實際向 Yahoo 抓取
+
+import argparse
+import gc
+import pickle
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from stock_core.statements import BALANCE_BAR_ITEMS, INCOME_BAR_ITEMS
+from stock_core.ticker_bundle import TickerBundle, TickerRecord, fetch_ticker_bundle
+
+# 合成資料的規模：yfinance 常見的報表列數、年度 / 季度欄數與 info 欄位數
+INCOME_ROWS, BALANCE_ROWS = 55, 70
+ANNUAL_COLS, QUARTERLY_COLS = 5, 6
+INFO_KEYS = 150
+
+
+def _statement(rng, items: list[str], extra: int, periods: pd.DatetimeIndex) -> pd.DataFrame:
+    index = items + [f"Line Item {i}" for i in range(extra - len(items))]
+    return pd.DataFrame(rng.normal(1e10, 3e9, (len(index), len(periods))), index=index, columns=periods[::-1])
+
+
+def synthetic_bundle(symbol: str, rng) -> TickerBundle:
+    today = pd.Timestamp.today().normalize()
+    annual = pd.date_range(end=today - pd.DateOffset(months=3), periods=ANNUAL_COLS, freq="YE")
+    quarterly = pd.date_range(end=today, periods=QUARTERLY_COLS, freq="QE")
+    info = {f"field{i}": float(rng.normal()) for i in range(INFO_KEYS - 20)}
+    info.update({f"text{i}": f"{symbol} value {i} " * 4 for i in range(18)})
+    info["longBusinessSummary"] = f"{symbol} designs, manufactures and markets products. " * 40
+    info["companyOfficers"] = [{"name": f"Officer {i}", "title": "Executive", "age": 50 + i, "totalPay": 1e6 * i} for i in range(10)]
+    days = pd.bdate_range(end=today, periods=5)
+    history = pd.DataFrame(rng.normal(100, 2, (5, 7)), index=days,
+                           columns=["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"])
+    return TickerBundle(
+        symbol=symbol,
+        financials=_statement(rng, INCOME_BAR_ITEMS, INCOME_ROWS, annual),
+        balance_sheet=_statement(rng, BALANCE_BAR_ITEMS, BALANCE_ROWS, annual),
+        quarterly_financials=_statement(rng, INCOME_BAR_ITEMS, INCOME_ROWS, quarterly),
+        quarterly_balance_sheet=_statement(rng, BALANCE_BAR_ITEMS, BALANCE_ROWS, quarterly),
+        info=info,
+        recent_history=history,
+    )
+
+
+def _traced(build):
+    """build() 產生的物件在 tracemalloc 下的淨增記憶體（位元組）。"""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    return obj, tracemalloc.get_traced_memory()[0] - before
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="分析結果的每 session 記憶體用量基準測試")
+    parser.add_argument("--tickers", type=int, default=50, help="合成股票檔數（預設 50）")
+    parser.add_argument("--sessions", type=int, default=10, help="同時保留結果的 session 數（預設 10）")
+    parser.add_argument("--symbols", help="以逗號分隔的實際股票代碼（會連網抓取）")
+    args = parser.parse_args(argv)
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",")] if args.symbols else [f"SYN{i:03d}" for i in range(args.tickers)]
+    rng = np.random.default_rng(0)
+    make = fetch_ticker_bundle if args.symbols else (lambda sym: synthetic_bundle(sym, rng))
+
+    # 先各跑一次，避免把 pandas 首次呼叫時的延遲載入與內部快取算進量測
+    warm = make(symbols[0]) if not args.symbols else None
+    if warm is not None:
+        TickerRecord.from_bundle(warm)
+
+    tracemalloc.start()
+    # 舊版：每個 session 的 all_details 各自保留整份資料包
+    bundles, bundle_bytes = _traced(lambda: {sym: make(sym) for sym in symbols})
+    # 新版：每個 session 只保留精簡紀錄（先跑一輪並丟棄：報表查詢在原 DataFrame 索引上建立的快取屬於資料包，不算在紀錄上）
+    _traced(lambda: [TickerRecord.from_bundle(b) for b in bundles.values()])
+    records, record_bytes = _traced(lambda: {sym: TickerRecord.from_bundle(b) for sym, b in bundles.items()})
+    tracemalloc.stop()
+
+    n, s = len(symbols), args.sessions
+    pickled_bundle = sum(len(pickle.dumps(b, protocol=pickle.HIGHEST_PROTOCOL)) for b in bundles.values()) / n
+    pickled_record = sum(len(pickle.dumps(r, protocol=pickle.HIGHEST_PROTOCOL)) for r in records.values()) / n
+    mib = 1024 * 1024
+    rows = [
+        ("每 session（TickerBundle）", bundle_bytes / mib, bundle_bytes / n / 1024),
+        ("每 session（TickerRecord）", record_bytes / mib, record_bytes / n / 1024),
+        (f"{s} 個 session 合計（舊）", s * bundle_bytes / mib, s * bundle_bytes / n / 1024),
+        (f"{s} 個 session 合計（新）", s * record_bytes / mib, s * record_bytes / n / 1024),
+    ]
+    print(f"{n} 檔股票（{'Yahoo 實際資料' if args.symbols else '合成資料'}）")
+    print(pd.DataFrame(rows, columns=["項目", "MiB", "KiB/檔"]).round(2).to_string(index=False))
+    print(f"結果庫序列化大小：TickerBundle {pickled_bundle / 1024:.1f} KiB/檔 → TickerRecord {pickled_record / 1024:.2f} KiB/檔")
+
+
+if __name__ == "__main__":
+    main()
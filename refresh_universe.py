@@ -0,0 +1,8 @@
+# refresh_universe.py
+# 股票池批次更新服務入口（獨立程序，不經 Streamlit）：
+#   python refresh_universe.py --universe universe.txt [--workers 4] [--at 02:00]
+
+from stock_core.universe_refresh import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# stock_core/__init__.py
+# 股票分析核心套件：資料下載、指標與評分、回測、報告；Streamlit 介面在 stock_core.ui
+# 常用名稱以延遲載入的方式提供（PEP 562），import stock_core 不會載入 yfinance / reportlab / matplotlib / streamlit
+
+import importlib
+
+_EXPORTS = {
+    "analyze_stock": "analysis",
+    "TickerBundle": "ticker_bundle",
+    "fetch_ticker_bundle": "ticker_bundle",
+    "TickerRecord": "ticker_bundle",
+    "AsyncYahooClient": "async_yahoo",
+    "RuleSet": "scoring_rules",
+    "load_rule_set": "scoring_rules",
+    "rescore": "scoring_rules",
+    "SectorTable": "sector_percentiles",
+    "build_sector_table": "sector_percentiles",
+    "load_sector_table": "sector_percentiles",
+    "refresh_sector_table": "sector_percentiles",
+    "WhatIfResult": "whatif",
+    "run_whatif": "whatif",
+    "results_table": "result_export",
+    "append_to_dataset": "result_export",
+    "read_dataset": "result_export",
+    "AlignedPanel": "price_panel",
+    "PanelStore": "price_panel",
+    "download_close_panel": "price_panel",
+    "CorrelationTracker": "correlation",
+    "run_backtest": "backtest",
+    "weights_from_scores": "backtest",
+    "build_pdf_report": "pdf_report",
+    "write_pdf_report": "pdf_report",
+    "build_pdf_reports_batch": "pdf_report",
+    "yearly_with_ytd": "statements",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'stock_core' has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
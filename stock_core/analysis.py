@@ -0,0 +1,285 @@
+# stock_core/analysis.py
+# 單檔股票的指標計算與評分（EPS、ROE、P/E、P/B、淨利率 → A–F 評級、總分與投資建議）
+# 不依賴 Streamlit；資料來源為 ticker_bundle 一次抓齊的 TickerBundle
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from .scoring_rules import load_rule_set
+from .ticker_bundle import TickerRecord, fetch_ticker_bundle
+
+
+def classify_mode(eps, pe, pb):
+    """股型分類（簡單啟發式；可傳入純量或同形狀陣列，缺值以 None / NaN 表示）。
+
+    來源：以 P/E、P/B、EPS 三項當期年度化指標粗略判斷
+    - VALUE：P/E < 20、P/B < 2、EPS > 3（符合 ≥2 項）
+    - GROWTH：P/E > 40、P/B > 4、EPS < 1（符合 ≥2 項）
+    其餘視為 MIX。
+    註：僅供快速篩選，非嚴謹財務定義；可依需求調整閾值。
+    """
+    eps, pe, pb = (np.asarray(x, dtype=float) for x in (eps, pe, pb))
+    value_score = (pe < 20).astype(np.int8) + (pb < 2) + (eps > 3)
+    growth_score = (pe > 40).astype(np.int8) + (pb > 4) + (eps < 1)
+    return np.where(value_score >= 2, "VALUE", np.where(growth_score >= 2, "GROWTH", "MIX"))
+
+
+def analyze_stock(ticker, bundle=None):
+    # 一次抓齊所需的 Yahoo 端點（平行、經過限流層）；之後的分析、詳細圖表與 PDF 都讀這份資料包
+    # bundle：已預先抓好的資料包（例如非同步資料層一次抓齊多檔），傳入時不再連網
+    stock = bundle if bundle is not None else fetch_ticker_bundle(ticker)
+
+    # 抓年度財報與資產負債表
+    fin = stock.financials  # annual income statement
+    bs = stock.balance_sheet  # annual balance sheet
+
+    def _get_last_close() -> float | None:
+        try:
+            h = stock.recent_history
+            if not h.empty:
+                return float(h["Close"].dropna().iloc[-1])
+        except Exception:
+            pass
+        return None
+
+    def _pick(df: pd.DataFrame, candidates: list[str]):
+        if df is None or df.empty:
+            return None, None
+        col = df.columns.max() if len(df.columns) else None
+        if col is None:
+            return None, None
+        for name in candidates:
+            if name in df.index:
+                try:
+                    return float(df.loc[name, col]), col
+                except Exception:
+                    continue
+        return None, col
+
+    # 取最近年度數據
+    net_income, fin_col = _pick(fin, [
+        "Net Income",
+        "Net Income Common Stockholders",
+    ])
+    total_revenue, _ = _pick(fin, [
+        "Total Revenue",
+        "Revenue",
+    ])
+    equity_curr, bs_col = _pick(bs, [
+        "Total Stockholder Equity",
+        "Total Stockholders Equity",
+        "Total Equity Gross Minority Interest",
+    ])
+    # 前一年股東權益（用來計算平均權益）
+    equity_prev = None
+    try:
+        if bs is not None and not bs.empty and bs_col in bs.columns:
+            prev_idx = list(bs.columns).index(bs_col) - 1
+            if prev_idx >= 0:
+                for name in [
+                    "Total Stockholder Equity",
+                    "Total Stockholders Equity",
+                    "Total Equity Gross Minority Interest",
+                ]:
+                    if name in bs.index:
+                        equity_prev = float(bs.iloc[bs.index.get_loc(name), prev_idx])
+                        break
+    except Exception:
+        equity_prev = None
+
+    # 股數與基本資訊（優先用 info，若無再嘗試財報中的 Shares）
+    shares_outstanding = None
+    info = {}
+    try:
+        info = stock.info or {}
+        shares_outstanding = info.get("sharesOutstanding")
+    except Exception:
+        shares_outstanding = None
+    if not shares_outstanding and fin is not None and not fin.empty:
+        for cand in [
+            "Basic Average Shares",
+            "Diluted Average Shares",
+            "Weighted Average Shares",
+        ]:
+            v, _ = _pick(fin, [cand])
+            if v:
+                shares_outstanding = v
+                break
+
+    price = _get_last_close()
+    price_currency = (info or {}).get("currency")
+    financial_currency = (info or {}).get("financialCurrency")
+
+    # 統一年度化計算
+    # EPS 優先使用 Yahoo 提供之 trailingEps（與價格同幣別，避免 ADR/幣別不一致）
+    eps = None
+    eps_source = None  # 'TTM' (trailingEps), 'NTM' (forwardEps), or 'FY' (derived annual)
+    try:
+        teps = info.get("trailingEps")
+        if isinstance(teps, (int, float)) and math.isfinite(teps):
+            eps = float(teps)
+            eps_source = "TTM"
+        else:
+            feps = info.get("forwardEps")
+            if isinstance(feps, (int, float)) and math.isfinite(feps):
+                eps = float(feps)
+                eps_source = "NTM"
+    except Exception:
+        pass
+    # 後備：用年度淨利/流通股數（幣別=財報幣別；後續計算 P/E 時需注意幣別不一致）
+    if eps is None and net_income is not None and shares_outstanding:
+        try:
+            eps = float(net_income) / float(shares_outstanding)
+            eps_source = "FY"
+        except Exception:
+            eps = None
+
+    # 平均權益（若缺前一年，退回當年）
+    avg_equity = None
+    try:
+        if equity_curr is not None:
+            if equity_prev is not None:
+                avg_equity = (float(equity_curr) + float(equity_prev)) / 2.0
+            else:
+                avg_equity = float(equity_curr)
+    except Exception:
+        avg_equity = None
+
+    roe = None
+    try:
+        if net_income is not None and avg_equity and avg_equity != 0:
+            roe = float(net_income) / float(avg_equity)
+    except Exception:
+        roe = None
+
+    # 每股淨值：優先用最近季 (MRQ) 權益；退回最近年度 (FY)
+    bvps = None
+    bvps_basis = None  # 'MRQ' or 'FY'
+    try:
+        equity_mrq = None
+        try:
+            qbs = stock.quarterly_balance_sheet if hasattr(stock, 'quarterly_balance_sheet') else pd.DataFrame()
+        except Exception:
+            qbs = pd.DataFrame()
+        if qbs is not None and not qbs.empty:
+            # 取最近一季的股東權益
+            cand_idx = None
+            for name in [
+                "Total Stockholder Equity",
+                "Total Stockholders Equity",
+                "Total Equity Gross Minority Interest",
+            ]:
+                if name in qbs.index:
+                    cand_idx = name
+                    break
+            if cand_idx is not None and len(qbs.columns) > 0:
+                try:
+                    col = qbs.columns.max()
+                except Exception:
+                    col = qbs.columns[0]
+                try:
+                    equity_mrq = float(qbs.loc[cand_idx, col])
+                except Exception:
+                    equity_mrq = None
+        if equity_mrq is not None and shares_outstanding:
+            bvps = float(equity_mrq) / float(shares_outstanding)
+            bvps_basis = "MRQ"
+        elif equity_curr is not None and shares_outstanding:
+            bvps = float(equity_curr) / float(shares_outstanding)
+            bvps_basis = "FY"
+    except Exception:
+        bvps = None
+        bvps_basis = None
+
+    pb = None
+    try:
+        if price is not None and bvps and bvps > 0:
+            pb = float(price) / float(bvps)
+    except Exception:
+        pb = None
+
+    pe = None
+    pe_basis = None  # 'TTM' | 'NTM' | 'FY'
+    try:
+        if price is not None and eps and eps != 0:
+            # 若 EPS 來自 trailingEps/forwardEps，幣別與價格一致；否則需幣別相同才計算
+            if eps_source in {"TTM", "NTM"} or (price_currency and financial_currency and price_currency == financial_currency):
+                pe = float(price) / float(eps)
+                pe_basis = eps_source if eps_source in {"TTM", "NTM"} else "FY"
+            else:
+                pe = None
+    except Exception:
+        pe = None
+        pe_basis = None
+
+    profit_margin = None
+    try:
+        if net_income is not None and total_revenue and total_revenue != 0:
+            profit_margin = float(net_income) / float(total_revenue)
+    except Exception:
+        profit_margin = None
+
+    mode = classify_mode(eps, pe, pb).item()
+
+    def explain(name, val, grade, mode, basis):
+        if val is None:
+            return ""
+        if name == "EPS":
+            if basis == "TTM":
+                return f"EPS (TTM) ≈ {val:.2f}（來源: Yahoo trailingEps；與股價同幣別）"
+            if basis == "NTM":
+                return f"EPS (NTM) ≈ {val:.2f}（來源: Yahoo forwardEps；未來12個月預估）"
+            # FY
+            src = "年度淨利/流通股數"
+            if price_currency and financial_currency and price_currency != financial_currency:
+                src += "；幣別與股價不同，P/E 為避免誤差可能不計"
+            return f"EPS (FY) ≈ {val:.2f}（{src}）"
+        if name == "ROE":
+            return f"ROE (FY) ≈ {val:.2%}（年度淨利/平均權益）"
+        if name == "P/E":
+            tag = basis or "—"
+            label = {"TTM": "Trailing", "NTM": "Forward", "FY": "FY"}.get(tag, tag)
+            return f"{label} P/E ({tag}) ≈ {val:.2f}（股價/對應口徑 EPS）"
+        if name == "P/B":
+            tag = basis or "—"
+            return f"P/B ({tag}) ≈ {val:.2f}（股價/每股淨值）"
+        if name == "淨利率":
+            return f"淨利率 (FY) ≈ {val:.2%}（年度淨利/年度營收）"
+        return ""
+
+    # 評分表：數值欄保留原始 float（缺值為 None），格式化留到顯示時處理
+    details = []
+    basis_map = {
+        "EPS": eps_source or "FY",
+        "ROE": "FY",
+        "P/E": pe_basis or (eps_source or "FY"),
+        "P/B": bvps_basis or "FY",
+        "淨利率": "FY",
+    }
+    # 評分門檻來自規則檔（scoring_rules），介面可再以其他規則重新評分
+    metrics = {"EPS": eps, "ROE": roe, "P/E": pe, "P/B": pb, "淨利率": profit_margin}
+    grades, scores, total_score, suggestion = load_rule_set().score_one(metrics, mode)
+    for name, val in metrics.items():
+        grade = grades.get(name, "N/A")
+        explanation = explain(name, val, grade, mode, basis_map.get(name))
+        details.append([name, basis_map.get(name), float(val) if val is not None else None, grade, explanation])
+
+    # 即時報價模式用：只需價格即可重算 P/E、P/B 的基本面數值
+    fundamentals = {
+        "price": price,
+        "eps": eps,
+        "eps_basis": eps_source,
+        "pe_comparable": eps_source in {"TTM", "NTM"} or bool(price_currency and financial_currency and price_currency == financial_currency),
+        "bvps": bvps,
+        "bvps_basis": bvps_basis,
+        "currency": price_currency,
+        "metrics": metrics,
+        "sector": info.get("sector"),
+        # 新聞搜尋關鍵字用，免得爬蟲再查一次 info
+        "name": info.get("longName") or info.get("shortName"),
+    }
+
+    # 結果只保留精簡紀錄，不讓每個 session 各自持有整份資料包
+    return details, total_score, suggestion, mode, TickerRecord.from_bundle(stock), scores, fundamentals
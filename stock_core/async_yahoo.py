@@ -0,0 +1,339 @@
+# stock_core/async_yahoo.py
+# 非同步 Yahoo 資料層：以單一連線池（HTTP keep-alive）的非同步客戶端呼叫 yfinance 使用的同一組 JSON 端點
+# （quoteSummary 基本資料、fundamentals-timeseries 財報、chart 日線、search 新聞），在一個事件迴圈上同時抓取所有股票；
+# 回傳與 yf.Ticker 相同形狀的資料（TickerBundle），並經過同一個限流層。預設關閉，YAHOO_ASYNC=1 啟用
+
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from . import perf
+from . import rate_limit
+from . import telemetry
+from .ticker_bundle import BUNDLE_FRAMES, RECENT_HISTORY, TickerBundle
+
+ENABLED = os.environ.get("YAHOO_ASYNC", "0") == "1"
+# 端點位址可改指向本機的回放伺服器（離線測試用）
+BASE_URL = os.environ.get("YAHOO_BASE_URL", "https://query2.finance.yahoo.com")
+COOKIE_URL = os.environ.get("YAHOO_COOKIE_URL", "https://fc.yahoo.com")
+# 連線池大小：所有股票、所有端點共用這些連線
+MAX_CONNECTIONS = int(os.environ.get("YAHOO_ASYNC_CONNECTIONS", "10"))
+TIMEOUT = 30
+
+# 與 yf.Ticker.info 相同的 quoteSummary 模組
+INFO_MODULES = ("financialData", "quoteType", "defaultKeyStatistics", "assetProfile", "summaryDetail", "price")
+# TickerBundle 欄位 -> (報表種類, 期間)
+STATEMENTS = {
+    "financials": ("financials", "annual"),
+    "balance_sheet": ("balance-sheet", "annual"),
+    "quarterly_financials": ("financials", "quarterly"),
+    "quarterly_balance_sheet": ("balance-sheet", "quarterly"),
+}
+# 項目名稱轉為標題格式時保留的縮寫（同 yf.Ticker 各報表的 pretty=True）
+STATEMENT_ACRONYMS = {"financials": ["EBIT", "EBITDA", "EPS", "NI"], "balance-sheet": ["PPE"]}
+# 與 yfinance 相同：Yahoo 最多回傳 4 年 / 5 季，起點固定即可
+STATEMENT_START = pd.Timestamp("2016-12-31", tz="UTC")
+DAILY_INTERVALS = ("1d", "5d", "1wk", "1mo", "3mo")
+
+ASYNC_REQUESTS = telemetry.counter(
+    "async_yahoo_requests_total",
+    "非同步資料層的 HTTP 請求數（status 為 HTTP 狀態碼或 error）",
+    ("endpoint", "status"),
+)
+
+
+def _session_class():
+    try:
+        from curl_cffi.requests import AsyncSession
+    except ImportError as e:
+        raise RuntimeError("非同步資料層需要 curl_cffi（yfinance 的相依套件）") from e
+    return AsyncSession
+
+
+class YahooHTTPError(RuntimeError):
+    """Yahoo 回應錯誤狀態碼（429 的訊息含 Too Many Requests，交由限流層重試）。"""
+
+    def __init__(self, endpoint: str, status: int, detail: str = ""):
+        reason = "Too Many Requests" if status == 429 else (detail or "HTTP error")
+        super().__init__(f"Yahoo {endpoint} HTTP {status}: {reason}")
+        self.status = status
+
+
+def _raw(value):
+    # quoteSummary 的數值可能是 {"raw": 1.2, "fmt": "1.20"}；空 dict 代表缺值
+    if isinstance(value, dict):
+        if "raw" in value:
+            return value["raw"]
+        if not value:
+            return None
+    return value
+
+
+def _error_detail(payload) -> str:
+    if isinstance(payload, dict):
+        for v in payload.values():
+            if isinstance(v, dict) and isinstance(v.get("error"), dict):
+                return v["error"].get("description") or v["error"].get("code") or ""
+    return ""
+
+
+class AsyncYahooClient:
+    """共用一個連線池的非同步 Yahoo 客戶端；以 async with 使用，離開時關閉所有連線。
+
+    crumb（quoteSummary 需要）每個客戶端只取得一次，所有並行請求共用。
+    """
+
+    def __init__(self, base_url: str | None = None, cookie_url: str | None = None,
+                 max_connections: int = MAX_CONNECTIONS, timeout: float = TIMEOUT):
+        self.base_url = (base_url or BASE_URL).rstrip("/")
+        self.cookie_url = cookie_url or COOKIE_URL
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._session = None
+        self._crumb = None
+        self._crumb_lock = None
+
+    async def __aenter__(self):
+        self._session = _session_class()(max_clients=self.max_connections, timeout=self.timeout, impersonate="chrome")
+        self._crumb_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    async def _crumb_value(self, refresh: bool = False) -> str:
+        async with self._crumb_lock:
+            if self._crumb is None or refresh:
+                try:
+                    await self._session.get(self.cookie_url, allow_redirects=True)
+                except Exception:
+                    pass  # fc.yahoo.com 可能被擋（DNS / 廣告阻擋清單），仍可能直接取得 crumb
+                resp = await self._session.get(f"{self.base_url}/v1/test/getcrumb", allow_redirects=True)
+                ASYNC_REQUESTS.inc(endpoint="crumb", status=str(resp.status_code))
+                text = resp.text.strip()
+                if resp.status_code != 200 or not text or "<html" in text.lower() or "Too Many Requests" in text:
+                    raise YahooHTTPError("crumb", resp.status_code)
+                self._crumb = text
+            return self._crumb
+
+    async def _get(self, path: str, params: dict, endpoint: str, crumb: bool):
+        query = dict(params)
+        if crumb:
+            query["crumb"] = await self._crumb_value()
+        resp = await self._session.get(f"{self.base_url}{path}", params=query)
+        if resp.status_code == 401 and crumb:
+            # crumb 失效：重新取得一次
+            query["crumb"] = await self._crumb_value(refresh=True)
+            resp = await self._session.get(f"{self.base_url}{path}", params=query)
+        ASYNC_REQUESTS.inc(endpoint=endpoint, status=str(resp.status_code))
+        if resp.status_code >= 400:
+            try:
+                detail = _error_detail(resp.json())
+            except Exception:
+                detail = ""
+            raise YahooHTTPError(endpoint, resp.status_code, detail)
+        return resp.json()
+
+    async def get_json(self, path: str, params: dict | None = None, endpoint: str = "json", crumb: bool = False):
+        """GET 一個 JSON 端點（經過限流層；429 時退避重試）。"""
+        try:
+            return await rate_limit.acall(self._get, path, params or {}, endpoint, crumb, endpoint=endpoint)
+        except (YahooHTTPError, rate_limit.ThrottledError):
+            raise
+        except Exception:
+            ASYNC_REQUESTS.inc(endpoint=endpoint, status="error")
+            raise
+
+    # ===== 端點 =====
+    async def info(self, symbol: str) -> dict:
+        """同 yf.Ticker.info：各模組的欄位攤平成一個 dict（數值取 raw）。"""
+        data = await self.get_json(
+            f"/v10/finance/quoteSummary/{symbol}",
+            {"modules": ",".join(INFO_MODULES), "formatted": "false", "corsDomain": "finance.yahoo.com", "symbol": symbol},
+            endpoint="info",
+            crumb=True,
+        )
+        result = (data.get("quoteSummary") or {}).get("result") or []
+        if not result:
+            raise ValueError(f"{symbol}: {_error_detail(data) or 'quoteSummary 無資料'}")
+        info = {}
+        for module in result[0].values():
+            if isinstance(module, dict):
+                info.update({k: _raw(v) for k, v in module.items() if k != "maxAge"})
+        return info
+
+    async def statement(self, symbol: str, kind: str = "financials", freq: str = "annual") -> pd.DataFrame:
+        """同 yf.Ticker 的財報屬性：列為項目（Net Income…）、欄為期末日（新到舊）。"""
+        from yfinance import const, utils
+
+        keys = const.fundamentals_keys[kind]
+        data = await self.get_json(
+            f"/ws/fundamentals-timeseries/v1/finance/timeseries/{symbol}",
+            {
+                "symbol": symbol,
+                "type": ",".join(freq + k for k in keys),
+                "period1": int(STATEMENT_START.timestamp()),
+                "period2": int(pd.Timestamp.now(tz="UTC").ceil("D").timestamp()),
+            },
+            endpoint=f"{freq}.{kind}",
+        )
+        rows = {}
+        for item in (data.get("timeseries") or {}).get("result") or []:
+            for key, values in item.items():
+                if key in ("meta", "timestamp") or not values:
+                    continue
+                # 期末日以 epoch 秒為鍵，欄位與 yfinance 相同由 to_datetime(unit="s") 建立（時間解析度一致）
+                rows[key[len(freq):]] = {
+                    int(pd.Timestamp(v["asOfDate"], tz="UTC").timestamp()): float(v["reportedValue"]["raw"])
+                    for v in values if v and v.get("reportedValue")
+                }
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame.from_dict(rows, orient="index", dtype=float)
+        df = df.reindex([k for k in keys if k in df.index])
+        df = df[sorted(df.columns, reverse=True)]
+        df.columns = pd.to_datetime(df.columns, unit="s")
+        df.index = utils.camel2title(list(df.index), sep=" ", acronyms=STATEMENT_ACRONYMS.get(kind, []))
+        return df
+
+    async def history(self, symbol: str, period: str = "1mo", interval: str = "1d", auto_adjust: bool = True) -> pd.DataFrame:
+        """同 yf.Ticker.history：Open / High / Low / Close / Volume / Dividends / Stock Splits，索引為交易所時區。"""
+        data = await self.get_json(
+            f"/v8/finance/chart/{symbol}",
+            {"range": period, "interval": interval, "includePrePost": "false", "events": "div,splits"},
+            endpoint="history",
+        )
+        result = (data.get("chart") or {}).get("result") or []
+        if not result or not result[0].get("timestamp"):
+            return pd.DataFrame()
+        res = result[0]
+        tz = (res.get("meta") or {}).get("exchangeTimezoneName") or "UTC"
+        index = pd.to_datetime(res["timestamp"], unit="s", utc=True).tz_convert(tz)
+        if interval in DAILY_INTERVALS:
+            index = index.normalize()
+        quote = res["indicators"]["quote"][0]
+        df = pd.DataFrame(
+            {col.capitalize(): pd.to_numeric(pd.Series(quote.get(col), dtype=object), errors="coerce").to_numpy(dtype=float)
+             for col in ("open", "high", "low", "close", "volume")},
+            index=index,
+        )
+        adj = (res["indicators"].get("adjclose") or [{}])[0].get("adjclose")
+        if auto_adjust and adj is not None:
+            ratio = pd.to_numeric(pd.Series(adj, dtype=object), errors="coerce").to_numpy(dtype=float) / df["Close"].to_numpy()
+            for col in ("Open", "High", "Low", "Close"):
+                df[col] = df[col].to_numpy() * ratio
+        events = res.get("events") or {}
+        df["Dividends"] = 0.0
+        df["Stock Splits"] = 0.0
+        for ev in (events.get("dividends") or {}).values():
+            when = pd.Timestamp(ev["date"], unit="s", tz="UTC").tz_convert(tz)
+            df.loc[df.index == (when.normalize() if interval in DAILY_INTERVALS else when), "Dividends"] = float(ev["amount"])
+        for ev in (events.get("splits") or {}).values():
+            when = pd.Timestamp(ev["date"], unit="s", tz="UTC").tz_convert(tz)
+            ratio = float(ev["numerator"]) / float(ev["denominator"])
+            df.loc[df.index == (when.normalize() if interval in DAILY_INTERVALS else when), "Stock Splits"] = ratio
+        df.index.name = "Date" if interval in DAILY_INTERVALS else "Datetime"
+        df = df.dropna(subset=["Close"])
+        df["Volume"] = df["Volume"].fillna(0).astype("int64")
+        return df
+
+    async def news(self, symbol: str, count: int = 5) -> list[tuple[str, str]] | None:
+        """Yahoo 搜尋 API 的新聞：[(標題, 連結), ...]；沒有新聞時回傳 None（與新聞爬蟲相同）。"""
+        data = await self.get_json(
+            "/v1/finance/search",
+            {"q": symbol, "quotesCount": 0, "newsCount": count, "enableFuzzyQuery": "false"},
+            endpoint="news",
+        )
+        items = [(n.get("title", "").strip(), n.get("link")) for n in data.get("news") or []]
+        return [(t, u) for t, u in items if t and u][:count] or None
+
+    async def bundle(self, symbol: str) -> TickerBundle:
+        """與 fetch_ticker_bundle 相同的資料包；各端點同時發出。全部失敗時拋出第一個錯誤。"""
+        async def run(name, coro):
+            with perf.span(f"yf.{name}", provider="yahoo", endpoint=name, ticker=symbol, transport="async"):
+                return await coro
+
+        jobs = {name: self.statement(symbol, *STATEMENTS[name]) for name in BUNDLE_FRAMES}
+        jobs["info"] = self.info(symbol)
+        jobs["recent_history"] = self.history(symbol, **RECENT_HISTORY)
+        outcomes = await asyncio.gather(*(run(name, coro) for name, coro in jobs.items()), return_exceptions=True)
+        results, errors = {}, {}
+        for name, out in zip(jobs, outcomes):
+            (errors if isinstance(out, BaseException) else results)[name] = out
+        if not results:
+            raise next(iter(errors.values()))
+        frames = {}
+        for name in (*BUNDLE_FRAMES, "recent_history"):
+            df = results.get(name)
+            frames[name] = df if isinstance(df, pd.DataFrame) else pd.DataFrame()
+        return TickerBundle(
+            symbol=symbol,
+            info=dict(results.get("info") or {}),
+            errors={name: f"{type(e).__name__}: {e}" for name, e in errors.items()},
+            **frames,
+        )
+
+
+@dataclass
+class Prefetch:
+    """prefetch 的結果；失敗的股票不在對應的 dict 中，原因記在 errors。"""
+
+    bundles: dict = field(default_factory=dict)  # symbol -> TickerBundle
+    closes: dict = field(default_factory=dict)  # symbol -> 收盤價 Series（時區已移除，同 yf.download）
+    news: dict = field(default_factory=dict)  # symbol -> [(title, url), ...]
+    errors: dict = field(default_factory=dict)  # (symbol, 項目) -> 錯誤訊息
+
+
+async def prefetch_async(symbols, period: str | None = None, news: bool = False, client: AsyncYahooClient | None = None) -> Prefetch:
+    """在目前的事件迴圈上同時抓取所有股票的資料包、收盤價（period 不為 None 時）與新聞（news=True）。"""
+    symbols = list(dict.fromkeys(symbols))
+    out = Prefetch()
+
+    async def one(kind, symbol, coro):
+        try:
+            value = await coro
+        except Exception as e:
+            out.errors[(symbol, kind)] = f"{type(e).__name__}: {e}"
+            return
+        if kind == "bundle":
+            out.bundles[symbol] = value
+        elif kind == "close":
+            series = value["Close"].dropna() if not value.empty else value
+            if len(series):
+                series.index = series.index.tz_localize(None)
+                out.closes[symbol] = series.rename(symbol)
+        elif value:
+            out.news[symbol] = value
+
+    async def run(c: AsyncYahooClient):
+        tasks = [one("bundle", s, c.bundle(s)) for s in symbols]
+        if period is not None:
+            tasks += [one("close", s, c.history(s, period=period, interval="1d")) for s in symbols]
+        if news:
+            tasks += [one("news", s, c.news(s)) for s in symbols]
+        await asyncio.gather(*tasks)
+
+    if client is not None:
+        await run(client)
+    else:
+        async with AsyncYahooClient() as c:
+            await run(c)
+    return out
+
+
+def prefetch(symbols, period: str | None = None, news: bool = False) -> Prefetch:
+    """prefetch_async 的同步入口：開一個事件迴圈跑完全部請求後關閉連線池。"""
+    coro_args = (list(symbols), period, news)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(prefetch_async(*coro_args))
+    # 呼叫端已在事件迴圈中（如 notebook）：改在另一個執行緒跑自己的迴圈
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="async-yahoo") as pool:
+        ctx = contextvars.copy_context()
+        return pool.submit(ctx.run, asyncio.run, prefetch_async(*coro_args)).result()
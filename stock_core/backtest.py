@@ -0,0 +1,161 @@
+# stock_core/backtest.py
+# 投資組合回測：以 analyze_stock 的總分決定權重，依再平衡頻率模擬組合淨值
+# 全部運算皆對「日期 × 股票」矩陣向量化，500 檔 × 5 年也只需數秒內完成
+
+import numpy as np
+import pandas as pd
+
+# 再平衡頻率 → pandas Period 頻率（None 代表每日再平衡）
+REBALANCE_FREQS = {
+    "D": None,
+    "W": "W",
+    "M": "M",
+    "Q": "Q",
+    "Y": "Y",
+}
+
+
+def weights_from_scores(all_details: dict, scheme: str = "score", suggestions: list[str] | None = None) -> pd.Series:
+    """由各股 total_score 產生目標權重（總和為 1）。
+
+    scheme: "score" 依總分加權；"equal" 等權重。
+    suggestions: 只納入投資建議在此清單中的股票（None 代表全部）。
+    """
+    scores = {}
+    for symbol, data in all_details.items():
+        if suggestions is not None and data.get("suggestion") not in suggestions:
+            continue
+        scores[symbol] = float(data.get("total_score") or 0)
+    s = pd.Series(scores, dtype=float)
+    if s.empty:
+        return s
+    if scheme == "equal":
+        raw = pd.Series(1.0, index=s.index)
+    elif scheme == "score":
+        raw = s.clip(lower=0)
+    else:
+        raise ValueError(f"未知的權重方式: {scheme}")
+    total = raw.sum()
+    if total <= 0:
+        return pd.Series(1.0 / len(raw), index=raw.index)
+    return raw / total
+
+
+def _rebalance_flags(index: pd.DatetimeIndex, rebalance: str | None) -> np.ndarray:
+    flags = np.zeros(len(index), dtype=bool)
+    if len(index) == 0:
+        return flags
+    flags[0] = True
+    if rebalance is None:
+        return flags
+    if rebalance not in REBALANCE_FREQS:
+        raise ValueError(f"未知的再平衡頻率: {rebalance}")
+    freq = REBALANCE_FREQS[rebalance]
+    if freq is None:
+        flags[:] = True
+        return flags
+    periods = index.to_period(freq)
+    flags[1:] = periods[1:] != periods[:-1]
+    return flags
+
+
+def run_backtest(
+    close_df: pd.DataFrame,
+    weights: pd.Series,
+    rebalance: str | None = "M",
+    initial_value: float = 1.0,
+    periods_per_year: int = 252,
+) -> dict:
+    """以收盤價面板回測固定目標權重的投資組合。
+
+    每個再平衡日（期初第一個交易日收盤）將持股調回目標權重；尚未上市（首個報價之前）的
+    股票當期不持有，其權重按比例分配給其他股票。兩次再平衡之間權重隨價格漂移。
+
+    回傳 dict：value（組合淨值）、returns（日報酬）、weights（各再平衡日目標權重）、
+    turnover（各再平衡日換手率）、stats（總報酬、年化報酬、年化波動、最大回撤、換手率）。
+    """
+    cols = [c for c in weights.index if c in close_df.columns]
+    if not cols:
+        raise ValueError("權重中的股票皆不在價格資料內")
+    prices = close_df[cols].sort_index()
+    prices = prices[prices.notna().any(axis=1)]
+    if len(prices) < 2:
+        raise ValueError("價格資料不足，無法回測")
+    w = weights[cols].to_numpy(dtype=float)
+
+    # 缺值（各交易所休市日不同、外部聯集的日期）以前值補齊，跨過缺口的價格變動計入缺口後第一天；
+    # 只有首個有效報價之前（尚未上市）仍為 NaN，報酬記為 0
+    px_arr = prices.ffill().to_numpy(dtype=float)
+    rets = np.zeros_like(px_arr)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rets[1:] = px_arr[1:] / px_arr[:-1] - 1.0
+    rets[~np.isfinite(rets)] = 0.0
+
+    # 再平衡日的目標權重（只在有報價的股票間分配）
+    flags = _rebalance_flags(prices.index, rebalance)
+    reb_rows = np.flatnonzero(flags)
+    avail = np.isfinite(px_arr[reb_rows])
+    target = np.where(avail, w, 0.0)
+    sums = target.sum(axis=1, keepdims=True)
+    target = np.divide(target, sums, out=np.zeros_like(target), where=sums > 0)
+
+    # 第 t 日的報酬屬於「t-1 日（含）之前最近一次再平衡」的持有區段
+    seg = np.zeros(len(prices), dtype=int)
+    seg[1:] = np.cumsum(flags)[:-1] - 1
+    # 區段內各股累積成長倍數（區段起點 = 1）
+    growth_log = np.log1p(rets)
+    growth_log[0] = 0.0
+    csum = np.cumsum(growth_log, axis=0)
+    seg_start = np.searchsorted(seg, np.arange(len(reb_rows)), side='left')
+    base_rows = csum[np.clip(seg_start - 1, 0, None)]
+    base_rows[seg_start == 0] = 0.0
+    base = base_rows[seg]
+    growth = np.exp(csum - base)
+    growth[0] = 1.0
+
+    seg_w = target[seg]
+    cash = 1.0 - seg_w.sum(axis=1)
+    factor = cash + (seg_w * growth).sum(axis=1)
+    factor[0] = 1.0
+
+    # 串接各區段：區段起始淨值 = 前一區段最後一天的淨值
+    seg_end = np.r_[seg_start[1:] - 1, len(prices) - 1]
+    end_factor = factor[seg_end]
+    start_value = initial_value * np.r_[1.0, np.cumprod(end_factor)[:-1]]
+    value = start_value[seg] * factor
+    value[0] = initial_value
+
+    # 換手率：再平衡前的漂移權重與新目標權重差距的一半
+    drift = seg_w[seg_end] * growth[seg_end]
+    drift_tot = (drift.sum(axis=1) + cash[seg_end])[:, None]
+    drift = np.divide(drift, drift_tot, out=np.zeros_like(drift), where=drift_tot > 0)
+    turnover = np.zeros(len(reb_rows))
+    turnover[1:] = 0.5 * np.abs(target[1:] - drift[:-1]).sum(axis=1)
+
+    value_s = pd.Series(value, index=prices.index, name="組合淨值")
+    daily = value_s.pct_change().fillna(0.0)
+    n_days = max(len(prices) - 1, 1)
+    total_return = float(value[-1] / initial_value - 1.0)
+    years = n_days / periods_per_year
+    ann_return = float((1.0 + total_return) ** (1.0 / years) - 1.0) if years > 0 and total_return > -1 else float("nan")
+    ann_vol = float(daily.iloc[1:].std(ddof=1) * np.sqrt(periods_per_year)) if n_days > 1 else float("nan")
+    drawdown = value_s / value_s.cummax() - 1.0
+    reb_index = prices.index[reb_rows]
+    turnover_s = pd.Series(turnover, index=reb_index, name="換手率")
+
+    return {
+        "value": value_s,
+        "returns": daily,
+        "drawdown": drawdown,
+        "weights": pd.DataFrame(target, index=reb_index, columns=cols),
+        "turnover": turnover_s,
+        "stats": {
+            "total_return": total_return,
+            "annual_return": ann_return,
+            "annual_volatility": ann_vol,
+            "max_drawdown": float(drawdown.min()),
+            "total_turnover": float(turnover.sum()),
+            "annual_turnover": float(turnover.sum() / years) if years > 0 else float("nan"),
+            "rebalances": int(len(reb_rows) - 1),
+        },
+    }
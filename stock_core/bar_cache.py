@@ -0,0 +1,331 @@
+# stock_core/bar_cache.py
+# 分時 K 線（1m/5m/15m/1h）快取：每檔股票 × 每種間隔一個固定容量的環狀緩衝區
+# - 只追加新 K 棒、超過容量即淘汰最舊的資料，rerun 時只下載上次之後的增量
+# - 新 K 棒只追加寫入磁碟（快照 npz + 追加檔），程序重啟後可直接從磁碟接續，不必重抓整段視窗
+
+import contextlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from . import perf
+from . import rate_limit
+
+INTRADAY_INTERVALS = ["1h", "15m", "5m", "1m"]
+
+# Yahoo 對各間隔可回溯的最長期間
+INTRADAY_MAX_PERIOD = {"1m": "7d", "5m": "60d", "15m": "60d", "1h": "730d"}
+
+# 正規交易時段每日 K 棒數（美股 6.5 小時）
+BARS_PER_DAY = {"1m": 390, "5m": 78, "15m": 26, "1h": 7, "1d": 1}
+
+# 環狀緩衝區容量：約為 Yahoo 可回溯期間的 K 棒數再留一點餘裕
+DEFAULT_CAPACITY = {"1m": 3000, "5m": 5000, "15m": 2000, "1h": 5200}
+
+# 同一檔股票兩次增量下載的最短間隔（秒）
+MIN_REFRESH_SECONDS = {"1m": 30, "5m": 60, "15m": 120, "1h": 300}
+
+BAR_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+_PERIOD_DAYS = {"1d": 1, "5d": 5, "7d": 7, "1mo": 31, "3mo": 92, "6mo": 183, "60d": 60, "1y": 366, "2y": 731, "730d": 730, "5y": 1827}
+
+SPILL_DIR = os.path.join(".cache", "bars")
+
+# 追加檔的每筆紀錄：時間戳 + OHLCV
+_TAIL_DTYPE = np.dtype([("ts", "<i8"), ("bars", "<f8", (len(BAR_FIELDS),))])
+
+logger = logging.getLogger(__name__)
+
+
+def clamp_period(period: str, interval: str) -> str:
+    """將查詢期間限制在 Yahoo 對該分時間隔允許的範圍內。"""
+    limit = INTRADAY_MAX_PERIOD.get(interval)
+    if limit is None:
+        return period
+    if period == "max" or _PERIOD_DAYS.get(period, 10**6) > _PERIOD_DAYS[limit]:
+        return limit
+    return period
+
+
+class BarRing:
+    """固定容量的 K 棒環狀緩衝區（時間戳 + OHLCV），只允許依時間順序追加。"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ts = np.zeros(capacity, dtype="int64")
+        self._bars = np.full((capacity, len(BAR_FIELDS)), np.nan)
+        self._head = 0  # 最舊一筆的位置
+        self._size = 0
+        self.fetched_at = 0.0
+        # 已完整抓取的視窗起點（ns）；查詢期間的起點早於此時需重抓整段視窗
+        self.covered_from: int | None = None
+        self._tail_rows = 0  # 快照之後追加檔中的筆數
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def first_ts(self) -> int | None:
+        if self._size == 0:
+            return None
+        return int(self._ts[self._head])
+
+    @property
+    def last_ts(self) -> int | None:
+        if self._size == 0:
+            return None
+        return int(self._ts[(self._head + self._size - 1) % self.capacity])
+
+    def append(self, ts: np.ndarray, bars: np.ndarray) -> int:
+        """追加比目前最後一筆更新的 K 棒；回傳實際追加的筆數。"""
+        last = self.last_ts
+        if last is not None:
+            # 最後一根 K 棒可能仍在形成中：同一時間戳的新資料直接覆寫
+            same = ts == last
+            if same.any():
+                self._bars[(self._head + self._size - 1) % self.capacity] = bars[same][-1]
+            keep = ts > last
+            ts, bars = ts[keep], bars[keep]
+        n = len(ts)
+        if n == 0:
+            return 0
+        if n >= self.capacity:
+            ts, bars = ts[-self.capacity:], bars[-self.capacity:]
+            self._ts[:] = ts
+            self._bars[:] = bars
+            self._head, self._size = 0, self.capacity
+            return n
+        pos = (self._head + self._size + np.arange(n)) % self.capacity
+        self._ts[pos] = ts
+        self._bars[pos] = bars
+        overflow = max(0, self._size + n - self.capacity)
+        self._head = (self._head + overflow) % self.capacity
+        self._size = min(self.capacity, self._size + n)
+        return n
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        order = (self._head + np.arange(self._size)) % self.capacity
+        return self._ts[order], self._bars[order]
+
+    def to_frame(self) -> pd.DataFrame:
+        ts, bars = self.arrays()
+        return pd.DataFrame(bars, index=pd.to_datetime(ts, utc=True), columns=BAR_FIELDS)
+
+    def save(self, path: str) -> None:
+        """寫入整份快照並清空追加檔。"""
+        ts, bars = self.arrays()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        covered = self.covered_from if self.covered_from is not None else -1
+        np.savez(tmp, ts=ts, bars=bars, fetched_at=np.array([self.fetched_at]), covered_from=np.array([covered], dtype="int64"))
+        os.replace(tmp, path)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path + ".tail")
+        self._tail_rows = 0
+
+    def spill(self, path: str, ts: np.ndarray, bars: np.ndarray) -> None:
+        """把剛追加的 K 棒寫入磁碟：只寫到追加檔尾端；沒有快照或追加檔累積超過容量時才重寫整份快照。"""
+        if not os.path.exists(path) or self._tail_rows + len(ts) >= self.capacity:
+            self.save(path)
+            return
+        rec = np.empty(len(ts), dtype=_TAIL_DTYPE)
+        rec["ts"] = ts
+        rec["bars"] = bars
+        with open(path + ".tail", "ab") as f:
+            f.write(rec.tobytes())
+        self._tail_rows += len(ts)
+
+    @classmethod
+    def load(cls, path: str, capacity: int) -> "BarRing":
+        ring = cls(capacity)
+        with np.load(path) as z:
+            ring.append(z["ts"], z["bars"])
+            ring.fetched_at = float(z["fetched_at"][0]) if "fetched_at" in z else 0.0
+            covered = int(z["covered_from"][0]) if "covered_from" in z else -1
+        # 舊版檔案沒有記錄視窗起點：以最早一根 K 棒代替
+        ring.covered_from = covered if covered >= 0 else ring.first_ts
+        if os.path.exists(path + ".tail"):
+            with open(path + ".tail", "rb") as f:
+                raw = f.read()
+            # 寫到一半中斷的最後一筆直接捨棄
+            rec = np.frombuffer(raw[: len(raw) - len(raw) % _TAIL_DTYPE.itemsize], dtype=_TAIL_DTYPE)
+            ring.append(rec["ts"], rec["bars"])
+            ring._tail_rows = len(rec)
+        return ring
+
+
+def _frame_to_arrays(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    df = df.dropna(subset=["Close"]).sort_index()
+    idx = pd.DatetimeIndex(df.index)
+    idx = idx.tz_localize("UTC") if idx.tz is None else idx.tz_convert("UTC")
+    bars = df.reindex(columns=BAR_FIELDS).to_numpy(dtype=float)
+    return idx.as_unit("ns").asi8.astype("int64"), bars
+
+
+class IntradayBarCache:
+    """單一分時間隔的 K 棒快取（所有 session 共用）。"""
+
+    def __init__(self, interval: str, capacity: int | None = None, spill_dir: str | None = SPILL_DIR):
+        if interval not in INTRADAY_MAX_PERIOD:
+            raise ValueError(f"不支援的分時間隔: {interval}")
+        self.interval = interval
+        self.capacity = capacity or DEFAULT_CAPACITY[interval]
+        self.spill_dir = spill_dir
+        self._rings: dict[str, BarRing] = {}
+        self._failed_at: dict[str, float] = {}  # 下載失敗的時間；min_gap 內不再重試
+        self._lock = threading.Lock()
+        self._symbol_locks: dict[str, threading.Lock] = {}  # 每檔股票一把下載鎖
+
+    def _spill_path(self, symbol: str) -> str | None:
+        if not self.spill_dir:
+            return None
+        return os.path.join(self.spill_dir, self.interval, f"{symbol}.npz")
+
+    def _ring(self, symbol: str) -> BarRing:
+        ring = self._rings.get(symbol)
+        if ring is None:
+            path = self._spill_path(symbol)
+            try:
+                ring = BarRing.load(path, self.capacity) if path and os.path.exists(path) else BarRing(self.capacity)
+            except Exception:
+                ring = BarRing(self.capacity)
+            self._rings[symbol] = ring
+        return ring
+
+    def _download(self, tickers: list[str], **kwargs) -> dict[str, pd.DataFrame]:
+        with perf.span("yf.download", provider="yahoo", endpoint="download", tickers=len(tickers), interval=self.interval) as sp:
+            data = rate_limit.download(tickers, interval=self.interval, auto_adjust=True, progress=False, group_by='ticker', threads=True, **kwargs)
+            sp.add_bytes(perf.frame_nbytes(data))
+        if data is None or data.empty:
+            return {}
+        if isinstance(data.columns, pd.MultiIndex):
+            level0 = data.columns.get_level_values(0)
+            return {sym: data[sym] for sym in tickers if sym in level0}
+        return {tickers[0]: data}
+
+    def refresh(self, tickers: list[str], period: str = "max", min_gap: float | None = None) -> None:
+        """補齊 K 棒：空的緩衝區一次批次抓整段視窗，其餘只抓上次之後的增量（同樣一次批次）。
+
+        已抓取的視窗不涵蓋本次期間起點（例如先查 1d 後查 7d）或最後一根 K 棒已超出 Yahoo 可回溯期間時，
+        視同空的緩衝區重抓整段視窗。
+
+        min_gap 為同一檔股票兩次增量下載的最短間隔（秒），預設依間隔而定。
+        多個 session 同時查詢同一檔股票時依序執行：後到者等前一批下載完成後，K 棒已在有效期內便不再重抓；
+        查詢不同股票的 session 互不等待。
+        """
+        tickers = list(dict.fromkeys(tickers))
+        with self._lock:
+            locks = [self._symbol_locks.setdefault(sym, threading.Lock()) for sym in sorted(tickers)]
+        # 依代號順序取得各檔的鎖，避免互相等待
+        with contextlib.ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            self._refresh(tickers, period, min_gap)
+
+    def _refresh(self, tickers: list[str], period: str, min_gap: float | None) -> None:
+        now = time.time()
+        now_ns = int(now * 1e9)
+        if min_gap is None:
+            min_gap = MIN_REFRESH_SECONDS.get(self.interval, 60)
+        window = clamp_period(period, self.interval)
+        days = _PERIOD_DAYS.get(window)
+        need_from = now_ns - int(days * 86400 * 1e9) if days is not None else None
+        # Yahoo 可回溯的最早時間：最後一根 K 棒早於此時，增量下載必定失敗
+        lookback_from = now_ns - int(_PERIOD_DAYS[INTRADAY_MAX_PERIOD[self.interval]] * 86400 * 1e9)
+        with self._lock:
+            rings = {}
+            for sym in tickers:
+                ring = self._ring(sym)
+                if len(ring) and ring.last_ts < lookback_from:
+                    ring = self._rings[sym] = BarRing(self.capacity)
+                rings[sym] = ring
+        retry_ok = {sym: now - self._failed_at.get(sym, 0.0) >= min_gap for sym in rings}
+        # 冷啟動：緩衝區為空，或已抓取的視窗不涵蓋本次查詢期間的起點（例如先查 1d、後查 7d）
+        cold = [
+            sym for sym, r in rings.items()
+            if retry_ok[sym] and (len(r) == 0 or (need_from is not None and r.covered_from is not None and r.covered_from > need_from))
+        ]
+        warm = [sym for sym, r in rings.items() if retry_ok[sym] and sym not in cold and now - r.fetched_at >= min_gap]
+        # 命中：緩衝區仍在有效期內、本次完全不需下載的股票
+        perf.note(hits=len(rings) - len(cold) - len(warm), misses=len(cold) + len(warm))
+
+        batches = []
+        if cold:
+            batches.append((cold, {"period": window}, True))
+        if warm:
+            start = pd.Timestamp(min(rings[sym].last_ts for sym in warm), unit="ns", tz="UTC")
+            batches.append((warm, {"start": start.to_pydatetime()}, False))
+
+        for syms, kwargs, full in batches:
+            try:
+                frames = self._download(syms, **kwargs)
+            except Exception as e:
+                logger.warning("分時資料下載失敗（%s，%s）: %s", self.interval, ", ".join(syms), e)
+                with self._lock:
+                    for sym in syms:
+                        self._failed_at[sym] = now
+                continue
+            with self._lock:
+                for sym in syms:
+                    self._failed_at.pop(sym, None)
+                    ring = rings[sym]
+                    df = frames.get(sym)
+                    added = 0
+                    if df is not None and not df.empty:
+                        ts, bars = _frame_to_arrays(df)
+                        if full:
+                            # 整段視窗重抓：以新緩衝區取代（舊資料只是其中一段）
+                            ring = self._rings[sym] = BarRing(self.capacity)
+                        last = ring.last_ts
+                        added = ring.append(ts, bars)
+                    if full and (added or len(ring)):
+                        ring.covered_from = need_from if need_from is not None else ring.first_ts
+                    ring.fetched_at = now
+                    path = self._spill_path(sym)
+                    if path and added:
+                        try:
+                            if full:
+                                ring.save(path)
+                            else:
+                                # 增量：只追加新 K 棒（含覆寫的最後一根）
+                                new = ts >= last if last is not None else slice(None)
+                                ring.spill(path, ts[new], bars[new])
+                        except Exception as e:
+                            logger.warning("分時資料寫入磁碟失敗 %s: %s", sym, e)
+
+    def close_panel(self, tickers: list[str], period: str, min_gap: float | None = None) -> pd.DataFrame:
+        """回傳查詢期間內的收盤價面板（欄為股票代碼，索引為不帶時區的 UTC 時間）。"""
+        self.refresh(tickers, period, min_gap=min_gap)
+        days = _PERIOD_DAYS.get(clamp_period(period, self.interval))
+        series = {}
+        with self._lock:
+            for sym in tickers:
+                ring = self._rings.get(sym)
+                if ring is None or len(ring) == 0:
+                    continue
+                ts, bars = ring.arrays()
+                if days is not None:
+                    cutoff = ts[-1] - int(days * 86400 * 1e9)
+                    keep = ts >= cutoff
+                    ts, bars = ts[keep], bars[keep]
+                series[sym] = pd.Series(bars[:, BAR_FIELDS.index("Close")], index=pd.to_datetime(ts))
+        if not series:
+            return pd.DataFrame()
+        return pd.concat(series, axis=1)
+
+
+_caches: dict[str, IntradayBarCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_bar_cache(interval: str) -> IntradayBarCache:
+    """取得（必要時建立）該間隔的全程序共用快取。"""
+    with _caches_lock:
+        cache = _caches.get(interval)
+        if cache is None:
+            cache = IntradayBarCache(interval)
+            _caches[interval] = cache
+        return cache
@@ -0,0 +1,145 @@
+# stock_core/correlation.py
+# 多檔股票的相關係數 / 共變異數矩陣（以日報酬計算）
+# - 初次建立時以矩陣乘法一次算出所有配對統計量（無 O(n²) 的 Python 迴圈）
+# - 之後新增 / 移除一檔股票時只增刪對應的一列一欄，不重新計算整個矩陣
+
+import numpy as np
+import pandas as pd
+
+
+def _pair_stats(xa: np.ndarray, ma: np.ndarray, xb: np.ndarray, mb: np.ndarray):
+    """回傳 a 與 b 各欄兩兩重疊期間的 (筆數, Σa, Σb, Σa², Σb², Σab)。
+
+    xa/xb 為已將缺值補 0 的報酬矩陣，ma/mb 為對應的有效值遮罩（float）。
+    結果皆為 (a 欄數 × b 欄數) 的矩陣。
+    """
+    n = ma.T @ mb
+    sa = xa.T @ mb
+    sb = ma.T @ xb
+    saa = (xa * xa).T @ mb
+    sbb = ma.T @ (xb * xb)
+    sab = xa.T @ xb
+    return n, sa, sb, saa, sbb, sab
+
+
+class CorrelationTracker:
+    """維護一組股票報酬的配對統計量，可逐檔增刪並即時取得 corr / cov 矩陣。
+
+    缺值採 pairwise 處理（與 pandas 的 DataFrame.corr() / cov() 一致），
+    因此上市較晚的股票不會截短其他股票的歷史。
+    """
+
+    def __init__(self, min_periods: int = 2):
+        self.min_periods = min_periods
+        self._rets = pd.DataFrame()
+        self._symbols: list[str] = []
+        # 配對統計量：S_x[i, j] = Σ x_i（只計 i、j 皆有值的日期），其餘同理
+        self._n = np.zeros((0, 0))
+        self._sx = np.zeros((0, 0))
+        self._sxx = np.zeros((0, 0))
+        self._sxy = np.zeros((0, 0))
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self._symbols)
+
+    @staticmethod
+    def _to_returns(close_df: pd.DataFrame) -> pd.DataFrame:
+        return close_df.sort_index().pct_change(fill_method=None).iloc[1:]
+
+    @staticmethod
+    def _arrays(rets: pd.DataFrame):
+        values = rets.to_numpy(dtype=float)
+        mask = np.isfinite(values)
+        return np.where(mask, values, 0.0), mask.astype(float)
+
+    def rebuild(self, close_df: pd.DataFrame) -> None:
+        """以整個收盤價面板重新計算所有配對統計量。"""
+        rets = self._to_returns(close_df)
+        x, m = self._arrays(rets)
+        n, sx, _, sxx, _, sxy = _pair_stats(x, m, x, m)
+        self._rets = rets
+        self._symbols = list(rets.columns)
+        self._n, self._sx, self._sxx, self._sxy = n, sx, sxx, sxy
+
+    def add(self, symbol: str, close: pd.Series) -> None:
+        """加入一檔股票：只計算新的一列 / 一欄。"""
+        if symbol in self._symbols:
+            self.remove(symbol)
+        ret = close.sort_index().pct_change(fill_method=None).iloc[1:].rename(symbol)
+        idx = self._rets.index.union(ret.index)
+        base = self._rets.reindex(idx)
+        new = ret.reindex(idx).to_frame()
+
+        xb, mb = self._arrays(base)
+        xn, mn = self._arrays(new)
+        n, s_old, s_new, ss_old, ss_new, sxy = _pair_stats(xb, mb, xn, mn)
+        # 新股票自身的統計量
+        n0, s0, _, ss0, _, sxy0 = _pair_stats(xn, mn, xn, mn)
+
+        k = len(self._symbols)
+        grow = lambda a: np.pad(a, ((0, 1), (0, 1)))
+        self._n, self._sx, self._sxx, self._sxy = grow(self._n), grow(self._sx), grow(self._sxx), grow(self._sxy)
+        # 欄 k：既有股票 i 與新股票重疊期間的統計；列 k：新股票與既有股票 j 重疊期間的統計
+        self._n[:k, k], self._n[k, :k], self._n[k, k] = n[:, 0], n[:, 0], n0[0, 0]
+        self._sx[:k, k], self._sx[k, :k], self._sx[k, k] = s_old[:, 0], s_new[:, 0], s0[0, 0]
+        self._sxx[:k, k], self._sxx[k, :k], self._sxx[k, k] = ss_old[:, 0], ss_new[:, 0], ss0[0, 0]
+        self._sxy[:k, k], self._sxy[k, :k], self._sxy[k, k] = sxy[:, 0], sxy[:, 0], sxy0[0, 0]
+
+        self._rets = pd.concat([base, new], axis=1)
+        self._symbols.append(symbol)
+
+    def remove(self, symbol: str) -> None:
+        """移除一檔股票：刪除對應的一列 / 一欄。"""
+        if symbol not in self._symbols:
+            return
+        i = self._symbols.index(symbol)
+        drop = lambda a: np.delete(np.delete(a, i, axis=0), i, axis=1)
+        self._n, self._sx, self._sxx, self._sxy = drop(self._n), drop(self._sx), drop(self._sxx), drop(self._sxy)
+        self._symbols.pop(i)
+        self._rets = self._rets.drop(columns=[symbol]).dropna(how='all')
+
+    def sync(self, close_df: pd.DataFrame) -> None:
+        """讓追蹤器與目前的收盤價面板一致。
+
+        僅增刪股票時採增量更新；若既有股票的資料本身有變（例如新的交易日），則整體重算。
+        """
+        wanted = [c for c in close_df.columns if close_df[c].notna().sum() > 1]
+        kept = [s for s in self._symbols if s in wanted]
+        if kept:
+            fresh = self._to_returns(close_df[kept]).dropna(how='all')
+            old = self._rets[kept].dropna(how='all')
+            same = fresh.index.equals(old.index) and np.allclose(
+                fresh.to_numpy(dtype=float), old.to_numpy(dtype=float), equal_nan=True
+            )
+            if not same:
+                self.rebuild(close_df[wanted])
+                return
+        added = [s for s in wanted if s not in self._symbols]
+        if not kept or len(added) > len(kept):
+            # 從零開始（或新增的比保留的多）時，一次矩陣乘法比逐檔增加更快
+            self.rebuild(close_df[wanted])
+            return
+
+        for sym in [s for s in self._symbols if s not in wanted]:
+            self.remove(sym)
+        for sym in added:
+            self.add(sym, close_df[sym])
+
+    def covariance(self) -> pd.DataFrame:
+        n = self._n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self._sxy - self._sx * self._sx.T / n) / (n - 1)
+        cov[n < max(self.min_periods, 2)] = np.nan
+        return pd.DataFrame(cov, index=self._symbols, columns=self._symbols)
+
+    def correlation(self) -> pd.DataFrame:
+        n = self._n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            num = self._sxy - self._sx * self._sx.T / n
+            var_a = self._sxx - self._sx ** 2 / n
+            var_b = var_a.T
+            corr = np.clip(num / np.sqrt(var_a * var_b), -1.0, 1.0)
+        corr[n < max(self.min_periods, 2)] = np.nan
+        np.fill_diagonal(corr, np.where(np.diag(n) >= max(self.min_periods, 2), 1.0, np.nan))
+        return pd.DataFrame(corr, index=self._symbols, columns=self._symbols)
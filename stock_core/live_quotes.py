@@ -0,0 +1,78 @@
+# stock_core/live_quotes.py
+# 即時報價：定時輪詢最新的 1 分鐘 K 棒（所有股票一次批次、只抓增量），
+# 併入主走勢圖的收盤價面板，並以記憶體中的 EPS / 每股淨值重新計算綜合評分表的 P/E、P/B，不必重跑 analyze_stock
+
+import numpy as np
+import pandas as pd
+
+from .bar_cache import get_bar_cache
+
+LIVE_INTERVAL = "1m"
+
+
+def poll_latest_bars(tickers: list[str], min_gap: float = 0.0) -> pd.DataFrame:
+    """回傳當日 1 分鐘收盤價面板；第一次抓當日資料，之後每次只抓上次之後的新 K 棒。"""
+    return get_bar_cache(LIVE_INTERVAL).close_panel(tickers, "1d", min_gap=min_gap)
+
+
+def live_quote_table(fundamentals: dict[str, dict], bars: pd.DataFrame) -> pd.DataFrame:
+    """以最新價格與快取的基本面計算即時報價表（向量化，欄位順序同 fundamentals）。"""
+    symbols = list(fundamentals.keys())
+    last = bars.ffill().iloc[-1].reindex(symbols) if not bars.empty else pd.Series(np.nan, index=symbols)
+    updated = bars.apply(pd.Series.last_valid_index).reindex(symbols) if not bars.empty else pd.Series(pd.NaT, index=symbols)
+
+    fund = pd.DataFrame.from_dict(fundamentals, orient="index").reindex(symbols)
+    base_price = pd.to_numeric(fund["price"], errors="coerce")
+    # 尚未取得當日 K 棒的股票沿用分析時的價格
+    price = last.astype(float).fillna(base_price)
+    eps = pd.to_numeric(fund["eps"], errors="coerce").where(fund["pe_comparable"].fillna(False).astype(bool))
+    bvps = pd.to_numeric(fund["bvps"], errors="coerce")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pe = (price / eps).where(eps != 0)
+        pb = (price / bvps).where(bvps > 0)
+        change = (price / base_price - 1.0) * 100.0
+
+    return pd.DataFrame({
+        "股票代碼": symbols,
+        "最新價": price.round(2).values,
+        "較分析時 (%)": change.round(2).values,
+        "P/E (即時)": pe.round(2).values,
+        "P/B (即時)": pb.round(2).values,
+        "更新時間 (UTC)": updated.values,
+    })
+
+
+def merge_live_bars(close: pd.DataFrame, bars: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """把最新的 1 分鐘收盤價併入主走勢圖的收盤價面板（同一時段以即時價格為準）。
+
+    日線：以最新價格更新（或新增）當日那一列；分時：依走勢圖的間隔取樣（對齊最後一根 K 棒），
+    更新最後一根並接上之後的新 K 棒。
+    """
+    if bars.empty or close.empty:
+        return close
+    bars = bars.reindex(columns=close.columns).dropna(how="all")
+    if bars.empty:
+        return close
+    last = close.index[-1]
+    if interval == "1d":
+        live = bars.ffill().iloc[[-1]]
+        live.index = live.index.normalize()
+    else:
+        freq = interval.replace("m", "min")
+        live = bars[bars.index >= last].resample(freq, origin=last).last().dropna(how="all")
+    live = live[live.index >= last]
+    if live.empty:
+        return close
+    return live.combine_first(close)
+
+
+def apply_live_metrics(summary: pd.DataFrame, fundamentals: dict[str, dict], bars: pd.DataFrame) -> pd.DataFrame:
+    """以最新價格重算綜合評分表的 P/E、P/B 欄（其他欄不變；無法重算的格維持分析時的數值）。"""
+    quotes = live_quote_table(fundamentals, bars).set_index("股票代碼")
+    out = summary.copy()
+    for col in ("P/E", "P/B"):
+        if col in out:
+            live = quotes[f"{col} (即時)"].reindex(out["股票代碼"]).to_numpy(dtype=float)
+            out[col] = np.where(np.isfinite(live), live, out[col].to_numpy(dtype=float))
+    return out
@@ -1,20 +1,29 @@
-# news_scraper.py (純淨版)
+# stock_core/news_scraper.py (純淨版)
+
+import time
 
-import yfinance as yf
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from . import perf
+from . import telemetry
+from .rate_limit import LimitedTicker
+
 # 智慧關鍵字生成函式
-def get_search_keyword_from_ticker(ticker: str) -> str:
+# company_name：呼叫端已有的公司名（資料包 info 的 longName / shortName）；未提供時才另外查詢 info
+def get_search_keyword_from_ticker(ticker: str, company_name: str | None = None) -> str:
     ticker_upper = ticker.upper()
     special_cases = {"TSM": "台積電", "AVGO": "博通", "UMC": "聯電"}
     if ticker_upper in special_cases:
         return special_cases[ticker_upper]
     try:
-        info = yf.Ticker(ticker_upper).info
-        name = info.get('longName')
+        name = company_name
+        if not name:
+            with perf.span("yf.info", provider="yahoo", endpoint="info", ticker=ticker_upper):
+                info = LimitedTicker(ticker_upper).info
+            name = info.get('longName')
         if name:
             for suffix in [" Corporation", " Inc.", ", Inc.", " Incorporated", " Ltd.", " Platforms", " Co."]:
                 if name.endswith(suffix):
@@ -24,11 +33,12 @@ def get_search_keyword_from_ticker(ticker: str) -> str:
     except:
         return ticker_upper
 
-def scrape_news_headlines(ticker: str, max_articles: int = 5):
+def scrape_news_headlines(ticker: str, max_articles: int = 5, company_name: str | None = None):
     """
     接收一個股票代碼，自動用公司名或特殊對應名搜尋 Yahoo 新聞標題和連結。
+    已有公司名（company_name）時直接使用，不再另外查詢。
     """
-    search_keyword = get_search_keyword_from_ticker(ticker)
+    search_keyword = get_search_keyword_from_ticker(ticker, company_name)
     print(f"啟動 Yahoo 新聞爬蟲，搜尋關鍵字: '{search_keyword}' (原始: '{ticker}')")
     url = f'https://tw.news.search.yahoo.com/search?p={search_keyword}'
 
@@ -38,8 +48,11 @@ def scrape_news_headlines(ticker: str, max_articles: int = 5):
     options.add_argument('--disable-gpu')
 
     driver = None
+    result = "error"
+    t0 = time.perf_counter()
     try:
         driver = uc.Chrome(options=options, use_subprocess=True)
+        telemetry.BROWSER_INSTANCES.inc()
         driver.get(url)
 
         wait = WebDriverWait(driver, 15)
@@ -57,9 +70,11 @@ def scrape_news_headlines(ticker: str, max_articles: int = 5):
 
         if not article_links:
             print("在 Yahoo 新聞找不到相關標題。")
+            result = "empty"
             return None
 
         print(f"成功爬取 {len(article_links)} 則新聞標題。")
+        result = "ok"
         return article_links
 
     except Exception as e:
@@ -67,4 +82,9 @@ def scrape_news_headlines(ticker: str, max_articles: int = 5):
         return None
     finally:
         if driver:
-            driver.quit()
\ No newline at end of file
+            try:
+                driver.quit()
+            finally:
+                telemetry.BROWSER_INSTANCES.dec()
+        telemetry.NEWS_SCRAPES.inc(result=result)
+        telemetry.NEWS_SCRAPE_SECONDS.observe(time.perf_counter() - t0, result=result)
\ No newline at end of file
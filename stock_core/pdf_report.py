@@ -0,0 +1,364 @@
+# stock_core/pdf_report.py
+# PDF 報告產生：reportlab 模組、中文字體註冊、段落與表格樣式在每個程序只初始化一次，
+# 之後每次 build_pdf_report 直接重用（避免重複 import、探測字體路徑、解析數 MB 的 TTC 字體檔）
+
+import glob
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from .report_charts import ticker_chart_data, ticker_chart_png
+from .scoring_rules import RuleSet, load_rule_set
+from .ticker_bundle import as_record
+
+# 可顯示中文的字體候選（名稱, 路徑, TTC 子字體索引）；依序嘗試，第一個註冊成功者勝出
+# 註：reportlab 只支援 TrueType 輪廓，CFF 版的 Noto CJK (.ttc/.otf) 會註冊失敗並自動略過
+FONT_CANDIDATES = [
+    ("MSJH", r"C:\\Windows\\Fonts\\msjh.ttc", 0),  # 微軟正黑體
+    ("MSYH", r"C:\\Windows\\Fonts\\msyh.ttc", 0),  # 微軟雅黑體
+    ("MINGLIU", r"C:\\Windows\\Fonts\\mingliu.ttc", 0),  # 細明體
+    ("SIMSUN", r"C:\\Windows\\Fonts\\simsun.ttc", 0),  # 宋體
+    ("NotoSansTC", "/usr/share/fonts/truetype/noto/NotoSansTC-Regular.ttf", 0),
+    ("NotoSansCJK", "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc", 0),
+    ("NotoSansCJK", "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc", 0),
+    ("NotoSansCJK", "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc", 0),
+    ("WQYZenHei", "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc", 0),
+    ("WQYMicroHei", "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 0),
+    ("DroidSansFallback", "/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf", 0),
+    ("ArialUnicode", "/Library/Fonts/Arial Unicode.ttf", 0),
+]
+
+# 固定路徑都找不到時，在這些目錄下以檔名樣式搜尋（各發行版安裝位置不同）
+FONT_SEARCH_DIRS = ["/usr/share/fonts", "/usr/local/share/fonts", os.path.expanduser("~/.fonts"), os.path.expanduser("~/.local/share/fonts")]
+FONT_SEARCH_PATTERNS = ["NotoSans*TC*.tt[fc]", "NotoSerif*TC*.tt[fc]", "Noto*CJK*.tt[fc]", "wqy-*.tt[fc]", "DroidSansFallback*.ttf"]
+
+# 沒有任何 TTF 字體時使用 reportlab 內建的 CID 字體（繁體中文），最後才退回 Helvetica
+CID_FALLBACK_FONT = "MSung-Light"
+
+
+class ReportlabMissingError(RuntimeError):
+    """環境未安裝 reportlab（或其模組無法匯入）。"""
+
+
+class PdfContext:
+    """每個程序共用一份的 PDF 產生環境：reportlab 類別、已註冊的字體與樣式。"""
+
+    def __init__(self):
+        # 將 reportlab 的 import 放在這裡，避免環境未安裝時造成全域匯入錯誤
+        try:
+            import importlib
+            self.A4 = importlib.import_module('reportlab.lib.pagesizes').A4
+            self.colors = importlib.import_module('reportlab.lib.colors')
+            styles_mod = importlib.import_module('reportlab.lib.styles')
+            self.pdfmetrics = importlib.import_module('reportlab.pdfbase.pdfmetrics')
+            self.TTFont = importlib.import_module('reportlab.pdfbase.ttfonts').TTFont
+            self.UnicodeCIDFont = importlib.import_module('reportlab.pdfbase.cidfonts').UnicodeCIDFont
+            platypus = importlib.import_module('reportlab.platypus')
+        except ImportError as e:
+            raise ReportlabMissingError("reportlab 未安裝，無法生成 PDF") from e
+        self.SimpleDocTemplate = platypus.SimpleDocTemplate
+        self.Paragraph = platypus.Paragraph
+        self.Spacer = platypus.Spacer
+        self.Table = platypus.Table
+        self.TableStyle = platypus.TableStyle
+        self.Image = platypus.Image
+
+        self.font_name = self._register_cjk_font()
+
+        styles = styles_mod.getSampleStyleSheet()
+        ParagraphStyle = styles_mod.ParagraphStyle
+        styles.add(ParagraphStyle(name="TitleCJK", parent=styles["Title"], fontName=self.font_name))
+        styles.add(ParagraphStyle(name="BodyCJK", parent=styles["BodyText"], fontName=self.font_name, leading=14))
+        styles.add(ParagraphStyle(name="HeadingCJK", parent=styles["Heading2"], fontName=self.font_name))
+        self.styles = styles
+
+        colors = self.colors
+        self.summary_table_style = self.TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), self.font_name),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.darkgray),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.gray),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.lightgrey])
+        ])
+        self.detail_table_style = self.TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), self.font_name),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#333333')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.gray),
+        ])
+
+    @staticmethod
+    def _font_paths():
+        override = os.environ.get("PDF_CJK_FONT")
+        if override:
+            yield ("CustomCJK", override, 0)
+        yield from FONT_CANDIDATES
+        for base in FONT_SEARCH_DIRS:
+            if not os.path.isdir(base):
+                continue
+            for pattern in FONT_SEARCH_PATTERNS:
+                for path in sorted(glob.glob(os.path.join(base, "**", pattern), recursive=True)):
+                    name = os.path.splitext(os.path.basename(path))[0].replace("-", "").replace(" ", "")
+                    yield (name, path, 0)
+
+    def _register_cjk_font(self) -> str:
+        for name, path, index in self._font_paths():
+            try:
+                if os.path.exists(path):
+                    self.pdfmetrics.registerFont(self.TTFont(name, path, subfontIndex=index))
+                    return name
+            except Exception:
+                continue
+        try:
+            self.pdfmetrics.registerFont(self.UnicodeCIDFont(CID_FALLBACK_FONT))
+            return CID_FALLBACK_FONT
+        except Exception:
+            return "Helvetica"
+
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def get_pdf_context() -> PdfContext:
+    """取得（第一次呼叫時建立）程序共用的 PdfContext。"""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = PdfContext()
+    return _context
+
+
+# 報告中每個股票代表的欄位（不含 yf.Ticker 等無法跨程序傳遞的物件）
+REPORT_FIELDS = ("details", "total_score", "suggestion", "mode")
+
+# 每檔股票圖表列的最大寬高（pt）；A4 扣除邊界約 523pt 寬
+CHART_BOX = (523, 160)
+
+# 綜合評分表每幾列切成一個表格，讓大型清單可以邊產生邊排版
+SUMMARY_ROWS_PER_TABLE = 40
+
+
+class _StreamingStory(list):
+    """供 doc.build() 使用的 flowable 清單：只在快用完時才從產生器補充下一批。
+
+    reportlab 會從清單前端逐一取出 flowable 排版，因此整份報告不必事先全部建立在記憶體中。
+    """
+
+    def __init__(self, flowables, chunk: int = 32):
+        super().__init__()
+        self._source = iter(flowables)
+        self._chunk = chunk
+        self._exhausted = False
+        self._refill()
+
+    def _refill(self):
+        while not self._exhausted and list.__len__(self) < self._chunk:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._exhausted = True
+
+    def __len__(self):
+        self._refill()
+        return list.__len__(self)
+
+
+def _cell(value) -> str:
+    """表格儲存格文字：數值欄（原始 float）在此才格式化為兩位小數，缺值顯示 N/A。"""
+    if isinstance(value, float):
+        return "N/A" if value != value else f"{value:.2f}"
+    return str(value)
+
+
+def _score_scale(rules: RuleSet | None) -> tuple[int, int]:
+    """評分規則的 (單項滿分, 總分滿分)；未指定規則時用預設規則。"""
+    rules = rules or load_rule_set()
+    return rules.max_score, rules.max_total
+
+
+def _chart_row(ctx: PdfContext, data: dict, max_score: int):
+    png = ticker_chart_png(ticker_chart_data(data, max_score))
+    return ctx.Image(io.BytesIO(png), width=CHART_BOX[0], height=CHART_BOX[1], kind='proportional', hAlign='LEFT')
+
+
+def _story(ctx: PdfContext, all_details: dict, summary_df: pd.DataFrame, include_charts: bool, scale: tuple[int, int]):
+    max_score, max_total = scale
+    styles = ctx.styles
+    Paragraph, Spacer, Table = ctx.Paragraph, ctx.Spacer, ctx.Table
+
+    yield Paragraph("股票分析報告", styles["TitleCJK"])
+    yield Paragraph(pd.Timestamp.now().strftime("分析日期：%Y-%m-%d"), styles["BodyCJK"])
+    yield Paragraph("分析標的：" + ", ".join(all_details.keys()), styles["BodyCJK"])
+    yield Spacer(1, 12)
+
+    # 綜合評分表
+    yield Paragraph("綜合評分比較", styles["HeadingCJK"])
+    if not summary_df.empty:
+        header = list(summary_df.columns)
+        for start in range(0, len(summary_df), SUMMARY_ROWS_PER_TABLE):
+            chunk = summary_df.iloc[start:start + SUMMARY_ROWS_PER_TABLE]
+            tbl = Table([header] + [[_cell(v) for v in row] for row in chunk.itertuples(index=False)], hAlign='LEFT', repeatRows=1)
+            tbl.setStyle(ctx.summary_table_style)
+            yield tbl
+    yield Spacer(1, 12)
+
+    # 個股詳情
+    yield Paragraph("個股詳細分析", styles["HeadingCJK"])
+    for symbol, data in all_details.items():
+        yield Spacer(1, 6)
+        yield Paragraph(symbol, styles["HeadingCJK"])
+        yield Paragraph(f"總分：{data['total_score']} / {max_total}", styles["BodyCJK"])
+        yield Paragraph(f"投資建議：{data['suggestion']}", styles["BodyCJK"])
+        yield Paragraph(f"股組類型：{data['mode']}", styles["BodyCJK"])
+        # details now includes basis column
+        df = pd.DataFrame(data["details"], columns=["指標", "口徑", "數值", "評級", "解釋"])
+        df["數值"] = pd.to_numeric(df["數值"], errors="coerce").astype(float)
+        table_data = [list(df.columns)] + [[_cell(v) for v in row] for row in df.itertuples(index=False)]
+        tbl = Table(table_data, hAlign='LEFT', colWidths=[60, 40, 60, 40, None])
+        tbl.setStyle(ctx.detail_table_style)
+        yield tbl
+        if include_charts:
+            try:
+                yield Spacer(1, 4)
+                yield _chart_row(ctx, data, max_score)
+            except Exception as e:
+                yield Paragraph(f"圖表繪製失敗：{e}", styles["BodyCJK"])
+
+
+def _render(target, all_details: dict, summary_df: pd.DataFrame, include_charts: bool, scale: tuple[int, int]) -> int:
+    """將報告排版輸出到 target（檔案路徑或可寫入的檔案物件），回傳頁數；scale 為 (單項滿分, 總分滿分)。"""
+    ctx = get_pdf_context()
+    doc = ctx.SimpleDocTemplate(target, pagesize=ctx.A4, leftMargin=36, rightMargin=36, topMargin=36, bottomMargin=36)
+    doc.build(_StreamingStory(_story(ctx, all_details, summary_df, include_charts, scale)))
+    return doc.page
+
+
+def build_pdf_report(all_details: dict, summary_df: pd.DataFrame, include_charts: bool = False, rules: RuleSet | None = None) -> bytes:
+    """產生 PDF 報告；include_charts=True 時每檔股票附上雷達圖與財務長條圖。
+
+    rules 為評分時使用的規則（決定總分與雷達圖的滿分），未指定時用預設規則。
+    """
+    buffer = io.BytesIO()
+    _render(buffer, all_details, summary_df, include_charts, _score_scale(rules))
+    return buffer.getvalue()
+
+
+def write_pdf_report(all_details: dict, summary_df: pd.DataFrame, path: str, include_charts: bool = False, rules: RuleSet | None = None) -> dict:
+    """將多檔股票的報告直接寫入檔案（不經過記憶體中的 bytes），回傳頁數與 pages/sec。"""
+    t0 = time.perf_counter()
+    pages = _render(path, all_details, summary_df, include_charts, _score_scale(rules))
+    seconds = time.perf_counter() - t0
+    return {"path": path, "pages": pages, "seconds": seconds, "pages_per_sec": pages / seconds if seconds > 0 else float("nan")}
+
+
+def _report_payload(data: dict, include_charts: bool, max_score: int) -> dict:
+    payload = {k: data[k] for k in REPORT_FIELDS if k in data}
+    if include_charts:
+        # 圖表資料在主程序先從報表取出，worker 只拿到純資料
+        payload["chart_data"] = ticker_chart_data(data, max_score)
+    return payload
+
+
+def _write_single(job) -> tuple[str, str, int]:
+    symbol, data, summary_df, path, include_charts, scale = job
+    pages = _render(path, {symbol: data}, summary_df, include_charts, scale)
+    return symbol, path, pages
+
+
+def build_pdf_reports_batch(all_details: dict, summary_df: pd.DataFrame, out_dir: str, max_workers: int | None = None, include_charts: bool = False, rules: RuleSet | None = None) -> dict:
+    """每檔股票各產生一份 PDF，以多個 worker 程序平行排版。
+
+    回傳 dict：files（股票 → 檔案路徑）、failed（股票 → 錯誤訊息）、pages、seconds、pages_per_sec。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    scale = _score_scale(rules)
+    key_col = "股票代碼" if "股票代碼" in summary_df.columns else None
+    jobs = []
+    for symbol, data in all_details.items():
+        rows = summary_df[summary_df[key_col] == symbol] if key_col else summary_df.iloc[0:0]
+        jobs.append((symbol, _report_payload(data, include_charts, scale[0]), rows, os.path.join(out_dir, f"{symbol}.pdf"), include_charts, scale))
+
+    files, failed, pages = {}, {}, 0
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=get_pdf_context) as pool:
+        futures = {pool.submit(_write_single, job): job[0] for job in jobs}
+        for fut in as_completed(futures):
+            symbol = futures[fut]
+            try:
+                _, path, n = fut.result()
+                files[symbol] = path
+                pages += n
+            except Exception as e:
+                failed[symbol] = str(e)
+    seconds = time.perf_counter() - t0
+    return {
+        "files": files,
+        "failed": failed,
+        "pages": pages,
+        "seconds": seconds,
+        "pages_per_sec": pages / seconds if seconds > 0 else float("nan"),
+    }
+
+
+# ===== 背景產生與結果快取（供 Streamlit 下載按鈕使用） =====
+MAX_CACHED_REPORTS = 16
+
+_report_jobs: OrderedDict[str, Future] = OrderedDict()
+_report_jobs_lock = threading.Lock()
+_report_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-report")
+
+
+def _chart_fingerprint(data: dict) -> dict:
+    """圖表用到的資料（各項得分 + 財報表格）：財報更新但評分不變時不能沿用舊的附圖 PDF。"""
+    try:
+        record = as_record(data.get("stock"))
+    except Exception:
+        record = None
+    tables = [getattr(record, key, None) for key in ("income", "balance")]
+    return {
+        "scores": data.get("scores"),
+        "statements": [None if t is None else (t.periods, t.items, t.values) for t in tables],
+    }
+
+
+def report_cache_key(all_details: dict, summary_df: pd.DataFrame, include_charts: bool = False, rules: RuleSet | None = None) -> str:
+    """以報告內容（各股評分明細 + 綜合評分表 + 評分滿分，附圖表時再加圖表資料）計算雜湊，作為 PDF 快取鍵。"""
+    content = {
+        "scale": _score_scale(rules),
+        "details": {sym: {k: data.get(k) for k in REPORT_FIELDS} for sym, data in all_details.items()},
+        "summary": summary_df.to_csv(index=False),
+        "charts": {sym: _chart_fingerprint(data) for sym, data in all_details.items()} if include_charts else False,
+    }
+    raw = json.dumps(content, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def submit_pdf_report(all_details: dict, summary_df: pd.DataFrame, include_charts: bool = False, rules: RuleSet | None = None) -> tuple[str, Future]:
+    """在背景執行緒產生 PDF；相同內容只產生一次，之後直接回傳同一個 Future。
+
+    失敗的工作不會留在快取中，下一次呼叫會重新嘗試。
+    """
+    key = report_cache_key(all_details, summary_df, include_charts, rules)
+    with _report_jobs_lock:
+        job = _report_jobs.get(key)
+        if job is not None and not (job.done() and job.exception() is not None):
+            _report_jobs.move_to_end(key)
+            return key, job
+        job = _report_executor.submit(build_pdf_report, dict(all_details), summary_df.copy(), include_charts, rules)
+        _report_jobs[key] = job
+        while len(_report_jobs) > MAX_CACHED_REPORTS:
+            _report_jobs.popitem(last=False)
+    return key, job
@@ -0,0 +1,167 @@
+# stock_core/perf.py
+# 輕量的分段計時：以 span（context manager / decorator）包住每個處理階段與逐檔呼叫，
+# 記錄耗時、快取命中 / 未命中與下載位元組數，供側邊欄效能面板顯示與匯出 JSON
+# 沒有進行中的 run 時只更新程序層級的指標（telemetry），可放心留在程式碼中
+
+import functools
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import pandas as pd
+
+from . import telemetry
+
+# 效能面板匯出時保留的最近執行次數
+HISTORY_RUNS = 20
+
+
+class Span:
+    """單一計時區段；在 with 區塊內可用 hit() / miss() / add_bytes() 補充資訊。"""
+
+    __slots__ = ("name", "attrs", "parent", "start_ms", "duration_ms", "hits", "misses", "nbytes", "error")
+
+    def __init__(self, name: str, attrs: dict, parent: str | None, start_ms: float):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.start_ms = start_ms
+        self.duration_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self.error = None
+
+    def hit(self, n: int = 1) -> None:
+        self.hits += n
+
+    def miss(self, n: int = 1) -> None:
+        self.misses += n
+
+    def add_bytes(self, n: int) -> None:
+        self.nbytes += int(n)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "start_ms": round(self.start_ms, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "bytes": self.nbytes,
+            "error": self.error,
+            **{k: v for k, v in self.attrs.items()},
+        }
+
+
+class PerfRun:
+    """一次頁面執行（rerun）收集到的所有 span。"""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: list[Span] = []
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame([s.to_dict() for s in self.spans])
+
+    def summary(self) -> pd.DataFrame:
+        """依階段名稱彙總：次數、總耗時 / 平均 / 最大（毫秒）、快取命中與位元組數，依總耗時排序。"""
+        df = self.to_frame()
+        if df.empty:
+            return df
+        out = df.groupby("name").agg(
+            次數=("duration_ms", "size"),
+            總耗時_ms=("duration_ms", "sum"),
+            平均_ms=("duration_ms", "mean"),
+            最大_ms=("duration_ms", "max"),
+            快取命中=("cache_hits", "sum"),
+            快取未命中=("cache_misses", "sum"),
+            位元組=("bytes", "sum"),
+        )
+        return out.sort_values("總耗時_ms", ascending=False).round(1).reset_index().rename(columns={"name": "階段"})
+
+    def to_dict(self) -> dict:
+        return {
+            "label": self.label,
+            "started_at": pd.Timestamp(self.started_at, unit="s", tz="UTC").isoformat(),
+            "total_ms": round(self.elapsed_ms(), 3),
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+_current_run: ContextVar[PerfRun | None] = ContextVar("perf_run", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("perf_span", default=None)
+
+
+def start_run(label: str = "") -> PerfRun:
+    """開始新的一次計時；之後同一執行緒內的 span 都記錄到這個 run。"""
+    run = PerfRun(label)
+    _current_run.set(run)
+    _current_span.set(None)
+    return run
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """計時一個區段；巢狀使用時會記錄上層區段名稱。"""
+    run = _current_run.get()
+    parent = _current_span.get()
+    s = Span(name, attrs, parent.name if parent is not None else None, run.elapsed_ms() if run is not None else 0.0)
+    token = _current_span.set(s)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.duration_ms = (time.perf_counter() - t0) * 1000.0
+        _current_span.reset(token)
+        if run is not None:
+            run.spans.append(s)
+        telemetry.record_span(name, attrs, s.duration_ms / 1000.0, s.hits, s.misses, s.nbytes, s.error is not None)
+
+
+def timed(name: str | None = None):
+    """decorator 版本的 span；預設以函式名稱為階段名稱。"""
+    def deco(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def note(hits: int = 0, misses: int = 0, nbytes: int = 0) -> None:
+    """把快取命中 / 未命中與位元組數記到目前最內層的 span（沒有 span 時忽略）。"""
+    s = _current_span.get()
+    if s is None:
+        return
+    s.hits += hits
+    s.misses += misses
+    s.nbytes += int(nbytes)
+
+
+def frame_nbytes(df) -> int:
+    """下載結果的資料量（以解碼後 DataFrame 的記憶體大小估算，yfinance 不提供原始傳輸量）。"""
+    if df is None:
+        return 0
+    try:
+        return int(df.memory_usage(index=True, deep=False).sum())
+    except Exception:
+        return 0
+
+
+def export_json(runs: list[dict]) -> str:
+    """將多次執行的 span 紀錄輸出為 JSON（供離線分析）。"""
+    return json.dumps({"runs": runs}, ensure_ascii=False, indent=2, default=str)
@@ -0,0 +1,151 @@
+# stock_core/price_panel.py
+# 收盤價面板：批次下載（只對缺少的股票批次重試）、保留各股完整歷史的對齊面板，以及跨 rerun 的面板快取
+# - 不再以 dropna(how='any') 截到最短的共同歷史；上市較晚的股票只在自己的期間有值
+# - 報酬率可從各股自己的首個有效日，或使用者指定的共同基準日重新起算（純向量運算）
+
+import time
+
+import numpy as np
+import pandas as pd
+from . import perf
+from . import rate_limit
+from .shared_cache import get_shared_cache
+
+
+def _extract_close(data: pd.DataFrame, tickers: list[str]) -> pd.DataFrame:
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if isinstance(data.columns, pd.MultiIndex):
+        level0 = data.columns.get_level_values(0)
+        close_df = pd.concat({sym: data[sym]['Close'] for sym in tickers if sym in level0}, axis=1)
+    else:
+        close_df = data['Close'].to_frame(tickers[0])
+    close_df = close_df.dropna(how='all', axis=1)
+    if not isinstance(close_df.index, pd.DatetimeIndex):
+        close_df.index = pd.to_datetime(close_df.index)
+    return close_df
+
+
+# 批次結果中缺少的股票再合併成一個較小的批次重試的次數
+RETRY_ROUNDS = 1
+
+
+def download_close_panel(tickers: list[str], period: str, interval: str = "1d"):
+    """批次下載收盤價；保留批次中成功的欄位，只把缺少或失敗的股票合併成一個較小的批次重試。
+
+    回傳 (close_df, error)：close_df 欄為股票代碼、保留各股完整歷史（不同長度以 NaN 補齊）；
+    error 為重試後仍有股票缺少資料時的原因（全部成功時為 None）。持續限流時不再重試。
+    """
+    frames = []
+    pending = list(tickers)
+    error = None
+    for _ in range(1 + RETRY_ROUNDS):
+        try:
+            with perf.span("yf.download", provider="yahoo", endpoint="download", tickers=len(pending), interval=interval) as sp:
+                data = rate_limit.download(pending, period=period, interval=interval, auto_adjust=True, progress=False, group_by='ticker', threads=True)
+                sp.add_bytes(perf.frame_nbytes(data))
+            close_df = _extract_close(data, pending)
+        except rate_limit.ThrottledError as e:
+            error = e
+            break
+        except Exception as e:
+            error = e
+            continue
+        if not close_df.empty:
+            frames.append(close_df)
+        pending = [t for t in pending if t not in close_df.columns]
+        if not pending:
+            return pd.concat(frames, axis=1), None
+    if pending and not isinstance(error, rate_limit.ThrottledError):
+        error = ValueError(f"無法取得股價資料: {', '.join(pending)}" + (f"（{error}）" if error else ""))
+    close_df = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+    return close_df, error
+
+
+class AlignedPanel:
+    """對齊後的收盤價面板（外部聯集日期、保留各股完整歷史）。
+
+    建立時即預先計算各股首個有效值與向前補值陣列，之後切換報酬率基準只是一次陣列除法。
+    """
+
+    def __init__(self, close_df: pd.DataFrame):
+        close = close_df.sort_index()
+        if not isinstance(close.index, pd.DatetimeIndex):
+            close.index = pd.to_datetime(close.index)
+        close = close[close.notna().any(axis=1)]
+        self.close = close
+        self._values = close.to_numpy(dtype=float)
+        self._ffill = close.ffill().to_numpy(dtype=float)
+        self.first_valid = close.apply(pd.Series.first_valid_index)
+        self._first_values = close.bfill().iloc[0].to_numpy(dtype=float) if len(close) else np.array([])
+
+    @property
+    def symbols(self) -> list[str]:
+        return list(self.close.columns)
+
+    def rebase(self, anchor=None) -> pd.DataFrame:
+        """回傳報酬率（小數）面板。
+
+        anchor 為 None 時，各股以自己的首個有效收盤價為基準；
+        指定日期時，以該日（或之前最近一個交易日）的收盤價為共同基準，
+        該日尚未有報價的股票則退回自己的首個有效日。
+        """
+        base = self._first_values
+        if anchor is not None and len(self.close):
+            pos = int(self.close.index.searchsorted(pd.Timestamp(anchor), side='right')) - 1
+            if pos >= 0:
+                at_anchor = self._ffill[pos]
+                base = np.where(np.isfinite(at_anchor), at_anchor, base)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rets = self._values / base - 1.0
+        return pd.DataFrame(rets, index=self.close.index, columns=self.close.columns)
+
+
+class PanelStore:
+    """以股票為單位保存收盤價序列，讓 rerun / 增減股票時只下載缺少或過期的部分。
+
+    缺少的序列先向跨 session 的共用快取取得；多個 session 同時缺同一檔股票時只會下載一次。
+    """
+
+    def __init__(self, period: str, interval: str = "1d", ttl: float = 900.0):
+        self.period = period
+        self.interval = interval
+        self.ttl = ttl
+        self.last_error = None
+        self._series: dict[str, pd.Series] = {}
+        self._fetched_at: dict[str, float] = {}
+        self._panel = None
+        self._panel_cols = None
+
+    def get(self, tickers: list[str]) -> AlignedPanel | None:
+        now = time.time()
+        self.last_error = None
+        for sym in [s for s, ts in self._fetched_at.items() if now - ts > self.ttl]:
+            self._series.pop(sym, None)
+            self._fetched_at.pop(sym, None)
+
+        missing = [t for t in tickers if t not in self._series]
+        perf.note(hits=len(tickers) - len(missing), misses=len(missing))
+        if missing:
+            shared = get_shared_cache(f"close:{self.period}:{self.interval}", ttl=self.ttl)
+
+            def fetch(syms):
+                close_df, err = download_close_panel(syms, self.period, self.interval)
+                self.last_error = err
+                out = {}
+                for sym in syms:
+                    if sym in close_df.columns:
+                        series = close_df[sym].dropna()
+                        if not series.empty:
+                            out[sym] = series
+                return out
+
+            for sym, series in shared.get_many(missing, fetch).items():
+                self._series[sym] = series
+                self._fetched_at[sym] = now
+
+        cols = [t for t in tickers if t in self._series]
+        if missing or cols != self._panel_cols:
+            self._panel = AlignedPanel(pd.concat({t: self._series[t] for t in cols}, axis=1)) if cols else None
+            self._panel_cols = cols
+        return self._panel
@@ -0,0 +1,215 @@
+# stock_core/rate_limit.py
+# 所有 Yahoo 請求（yf.download、yf.Ticker 屬性與方法、新聞關鍵字查詢、非同步資料層）共用的限流層：
+# - 權杖桶（token bucket）控制整個程序的請求速率，多個 session 一起排隊而不是一起衝
+# - 遇到限流（429 / YFRateLimitError）時以指數退避 + 抖動重試，並暫停整個權杖桶，
+#   讓吞吐量平緩下降，而不是觸發逐檔 fallback 造成更多請求
+
+import asyncio
+import functools
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from . import telemetry
+
+# 每秒請求數與可累積的突發量，可用環境變數調整
+YAHOO_RATE = float(os.environ.get("YAHOO_RATE_PER_SEC", "5"))
+YAHOO_BURST = float(os.environ.get("YAHOO_BURST", "20"))
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+THROTTLE_EVENTS = telemetry.counter("provider_throttle_events_total", "上游回應限流的次數", ("provider", "endpoint"))
+RETRIES = telemetry.counter("provider_retries_total", "因限流而重試的次數", ("provider", "endpoint"))
+THROTTLE_GIVEUPS = telemetry.counter("provider_throttle_giveups_total", "重試後仍被限流而放棄的次數", ("provider", "endpoint"))
+LIMIT_WAIT_SECONDS = telemetry.histogram("rate_limit_wait_seconds", "請求在權杖桶中等待的時間", ("provider",))
+
+# 只比對明確的限流字樣：裸的「429」會誤判代號（如 1429.TW）或其他數字
+_THROTTLE_TEXT = re.compile(r"too many requests|\bhttp(?: error)? 429\b", re.IGNORECASE)
+
+
+class ThrottledError(RuntimeError):
+    """重試後上游仍持續限流。"""
+
+
+class TokenBucket:
+    """執行緒安全的權杖桶；權杖不足時預約並在鎖外等待，先到先服務。"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """預約權杖但不等待；回傳呼叫端應等待的秒數（非同步呼叫端以 asyncio.sleep 等待）。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """取得權杖；回傳等待的秒數。"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, seconds: float) -> None:
+        """被限流時暫停整個桶 seconds 秒：之後的所有請求都會一起往後排。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+YAHOO_BUCKET = TokenBucket(YAHOO_RATE, YAHOO_BURST)
+
+
+def is_throttle_message(msg: str) -> bool:
+    return bool(_THROTTLE_TEXT.search(msg))
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """依例外型別（YFRateLimitError、狀態碼 429）判斷是否被限流；其他例外只看明確的限流字樣。"""
+    if type(exc).__name__ in ("YFRateLimitError", "_DownloadThrottled"):
+        return True
+    # YahooHTTPError.status；requests / curl_cffi 的 HTTPError 帶 response.status_code
+    if getattr(exc, "status", None) == 429 or getattr(getattr(exc, "response", None), "status_code", None) == 429:
+        return True
+    return is_throttle_message(str(exc))
+
+
+def call(func, *args, endpoint: str = "call", provider: str = "yahoo", retries: int = MAX_RETRIES, **kwargs):
+    """經由權杖桶呼叫上游；限流時以指數退避（含抖動）重試，其他錯誤直接拋出。"""
+    for attempt in range(retries + 1):
+        waited = YAHOO_BUCKET.acquire()
+        if waited:
+            LIMIT_WAIT_SECONDS.observe(waited, provider=provider)
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if not is_throttle_error(e):
+                raise
+            THROTTLE_EVENTS.inc(provider=provider, endpoint=endpoint)
+            if attempt == retries:
+                THROTTLE_GIVEUPS.inc(provider=provider, endpoint=endpoint)
+                raise ThrottledError(f"{provider} {endpoint} 持續限流（已重試 {retries} 次）: {e}") from e
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            RETRIES.inc(provider=provider, endpoint=endpoint)
+            YAHOO_BUCKET.penalize(delay)
+
+
+async def acall(func, *args, endpoint: str = "call", provider: str = "yahoo", retries: int = MAX_RETRIES, **kwargs):
+    """call 的非同步版本：func 為 coroutine function，在權杖桶中等待時不阻塞事件迴圈。"""
+    for attempt in range(retries + 1):
+        waited = YAHOO_BUCKET.reserve()
+        if waited > 0:
+            LIMIT_WAIT_SECONDS.observe(waited, provider=provider)
+            await asyncio.sleep(waited)
+        try:
+            return await func(*args, **kwargs)
+        except Exception as e:
+            if not is_throttle_error(e):
+                raise
+            THROTTLE_EVENTS.inc(provider=provider, endpoint=endpoint)
+            if attempt == retries:
+                THROTTLE_GIVEUPS.inc(provider=provider, endpoint=endpoint)
+                raise ThrottledError(f"{provider} {endpoint} 持續限流（已重試 {retries} 次）: {e}") from e
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+            RETRIES.inc(provider=provider, endpoint=endpoint)
+            YAHOO_BUCKET.penalize(delay)
+
+
+class _DownloadThrottled(Exception):
+    pass
+
+
+# yf.download 結束時記錄的失敗行：「['AAPL', 'MSFT']: YFRateLimitError('Too Many Requests…')」
+_FAILED_LINE = re.compile(r"^\s*\[([^\]]*)\]:\s*(.*)$", re.DOTALL)
+
+
+class _DownloadErrors(logging.Handler):
+    """在 yf.download 期間收集 yfinance logger 回報的逐檔錯誤（新版 yfinance 不再寫入 shared._ERRORS）。"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.errors: dict[str, str] = {}
+
+    def emit(self, record):
+        m = _FAILED_LINE.match(record.getMessage())
+        if m:
+            for sym in re.findall(r"'([^']+)'", m.group(1)):
+                self.errors[sym.upper()] = m.group(2)
+
+
+def _requested(args, kwargs) -> set[str]:
+    tickers = kwargs.get("tickers", args[0] if args else ())
+    if isinstance(tickers, str):
+        tickers = tickers.replace(",", " ").split()
+    return {str(t).upper() for t in tickers}
+
+
+def _download_errors(tickers: set[str], captured: dict) -> list[str]:
+    """本次呼叫的代號的錯誤訊息；shared._ERRORS 為整個程序共用，其他代號（其他 session）的錯誤不算。"""
+    errors = dict(captured)
+    try:
+        from yfinance import shared
+        errors.update(getattr(shared, "_ERRORS", {}))
+    except Exception:
+        pass
+    return [str(v) for k, v in errors.items() if str(k).upper() in tickers]
+
+
+def _checked_download(*args, **kwargs):
+    # yf.download 遇到限流時不拋例外，只回傳空表並記錄逐檔錯誤
+    import yfinance as yf
+    handler = _DownloadErrors()
+    yf_logger = logging.getLogger("yfinance")
+    yf_logger.addHandler(handler)
+    try:
+        data = yf.download(*args, **kwargs)
+    finally:
+        yf_logger.removeHandler(handler)
+    if data is None or data.empty:
+        throttled = [m for m in _download_errors(_requested(args, kwargs), handler.errors) if is_throttle_message(m)]
+        if throttled:
+            raise _DownloadThrottled(throttled[0])
+    return data
+
+
+def download(*args, **kwargs):
+    """限流版 yf.download（參數相同）。"""
+    return call(_checked_download, *args, endpoint="download", **kwargs)
+
+
+class LimitedTicker:
+    """yf.Ticker 的包裝：會連網的屬性第一次讀取時經過限流並保留結果，方法呼叫每次都經過限流。"""
+
+    def __init__(self, symbol: str):
+        import yfinance as yf
+        self.ticker = symbol
+        self._ticker = yf.Ticker(symbol)
+        self._values = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._values:
+            return self._values[name]
+        if isinstance(getattr(type(self._ticker), name, None), property):
+            value = call(getattr, self._ticker, name, endpoint=name)
+            self._values[name] = value
+            return value
+        value = getattr(self._ticker, name)
+        if callable(value):
+            return functools.partial(call, value, endpoint=name)
+        return value
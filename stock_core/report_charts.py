@@ -0,0 +1,170 @@
+# stock_core/report_charts.py
+# PDF 報告用的靜態圖（雷達圖、營收/淨利、資產/負債長條圖），以 matplotlib 在本機無頭繪製
+# 圖片以內容雜湊為鍵快取（記憶體 LRU + 磁碟），資料沒變就不重新繪製
+
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .scoring_rules import load_rule_set
+from .ticker_bundle import as_record
+
+RADAR_CATEGORIES = ["EPS", "ROE", "P/E", "P/B", "淨利率"]
+# 圖內文字一律用 ASCII，避免 matplotlib 在沒有中文字體的伺服器上顯示方塊
+RADAR_LABELS = ["EPS", "ROE", "P/E", "P/B", "Margin"]
+
+CHART_COLOR = "#1f77b4"
+CHART_DPI = 110
+CHART_CACHE_DIR = os.path.join(".cache", "charts")
+MAX_CACHED_CHARTS = 512
+
+_png_cache: OrderedDict[str, bytes] = OrderedDict()
+_png_lock = threading.Lock()
+
+
+def _content_key(kind: str, payload) -> str:
+    raw = json.dumps([kind, payload], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _cached_png(kind: str, payload, render) -> bytes:
+    key = _content_key(kind, payload)
+    with _png_lock:
+        png = _png_cache.get(key)
+        if png is not None:
+            _png_cache.move_to_end(key)
+            return png
+    path = os.path.join(CHART_CACHE_DIR, f"{key}.png") if CHART_CACHE_DIR else None
+    if path and os.path.exists(path):
+        with open(path, "rb") as f:
+            png = f.read()
+    else:
+        png = render()
+        if path:
+            try:
+                os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(png)
+                os.replace(tmp, path)
+            except Exception:
+                pass
+    with _png_lock:
+        _png_cache[key] = png
+        while len(_png_cache) > MAX_CACHED_CHARTS:
+            _png_cache.popitem(last=False)
+    return png
+
+
+def _new_figure(width: float, height: float):
+    # 直接使用 Figure + Agg canvas，不經過 pyplot（無全域狀態，可在背景執行緒使用）
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=(width, height), dpi=CHART_DPI)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _to_png(fig) -> bytes:
+    buf = io.BytesIO()
+    # 不使用 bbox_inches="tight"（會多繪製一次）；版面已由 subplots_adjust 固定
+    fig.savefig(buf, format="png", dpi=CHART_DPI, pil_kwargs={"compress_level": 1})
+    return buf.getvalue()
+
+
+def _draw_radar(ax, values: list[float], color: str, max_score: float):
+    # 以一般座標軸手繪雷達圖（比 polar 投影快許多）；分數依規則的單項滿分縮放到半徑 4
+    import numpy as np
+    angles = np.pi / 2 - np.linspace(0, 2 * np.pi, len(values), endpoint=False)
+    ux, uy = np.cos(angles), np.sin(angles)
+    for ring in (1, 2, 3, 4):  # 滿分的 1/4 ~ 4/4
+        ax.plot(np.r_[ux, ux[:1]] * ring, np.r_[uy, uy[:1]] * ring, color="#cccccc", linewidth=0.5)
+    for x, y in zip(ux, uy):
+        ax.plot([0, x * 4], [0, y * 4], color="#cccccc", linewidth=0.5)
+    vals = np.clip(np.asarray(values, dtype=float), 0, max_score) / max_score * 4
+    px, py = np.r_[ux * vals, ux[:1] * vals[:1]], np.r_[uy * vals, uy[:1] * vals[:1]]
+    ax.fill(px, py, color=color, alpha=0.18)
+    ax.plot(px, py, color=color, linewidth=1.6)
+    for x, y, label in zip(ux, uy, RADAR_LABELS):
+        ax.text(x * 4.7, y * 4.7, label, fontsize=7, ha="center", va="center")
+    ax.set_xlim(-5.2, 5.2)
+    ax.set_ylim(-5.2, 5.2)
+    ax.set_aspect("equal")
+    ax.axis("off")
+
+
+def _draw_bars(ax, labels: list[str], series: dict, color: str):
+    import numpy as np
+    x = np.arange(len(labels))
+    width = 0.8 / max(len(series), 1)
+    for i, (name, vals) in enumerate(series.items()):
+        ys = [np.nan if v is None else v for v in vals]
+        ax.bar(x + (i - (len(series) - 1) / 2) * width, ys, width, label=name,
+               color=color, alpha=0.55 if i == 0 else 0.25, edgecolor=color, linewidth=0.8)
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels, fontsize=6)
+    ax.tick_params(axis="y", labelsize=6)
+    ax.set_ylabel("USD bn", fontsize=6)
+    ax.legend(fontsize=5, frameon=False)
+    for side in ("top", "right"):
+        ax.spines[side].set_visible(False)
+
+
+def _bar_payload(df: pd.DataFrame | None):
+    if df is None or df.empty:
+        return None
+    labels = [str(x) for x in df.index]
+    series = {str(c): [None if pd.isna(v) else float(v) for v in df[c].values] for c in df.columns}
+    return {"labels": labels, "series": series}
+
+
+def ticker_chart_png(chart_data: dict, color: str = CHART_COLOR) -> bytes:
+    """單檔股票的圖表列（雷達圖、營收/淨利、資產/負債並排）繪成一張 PNG。
+
+    每檔股票只繪製一次；相同資料再次請求時直接取用快取。
+    """
+    scores = chart_data.get("scores") or {}
+    payload = {
+        "radar": [float(scores.get(cat) or 0) for cat in RADAR_CATEGORIES],
+        "max_score": float(chart_data.get("max_score") or load_rule_set().max_score),
+        "income": _bar_payload(chart_data.get("income")),
+        "balance": _bar_payload(chart_data.get("balance")),
+        "color": color,
+    }
+
+    def render():
+        panels = [k for k in ("income", "balance") if payload[k] is not None]
+        fig = _new_figure(2.4 + 2.6 * len(panels), 2.2)
+        n = 1 + len(panels)
+        ax = fig.add_subplot(1, n, 1)
+        _draw_radar(ax, payload["radar"], color, payload["max_score"])
+        for i, key in enumerate(panels, start=2):
+            ax = fig.add_subplot(1, n, i)
+            _draw_bars(ax, payload[key]["labels"], payload[key]["series"], color)
+        fig.subplots_adjust(left=0.05, right=0.98, bottom=0.14, top=0.9, wspace=0.45)
+        return _to_png(fig)
+
+    return _cached_png("ticker_charts", payload, render)
+
+
+def ticker_chart_data(data: dict, max_score: float | None = None) -> dict:
+    """從單一股票的分析結果取出繪圖所需的純資料（可跨程序傳遞）；max_score 為評分規則的單項滿分（未指定時用預設規則）。"""
+    if "chart_data" in data:
+        return data["chart_data"]
+    out = {"scores": dict(data.get("scores") or {}), "max_score": max_score, "income": None, "balance": None}
+    try:
+        record = as_record(data.get("stock"))
+    except Exception:
+        return out
+    if record is None:
+        return out
+    for key in ("income", "balance"):
+        table = getattr(record, key)
+        if table is not None and table.values:
+            out[key] = table.to_frame() / 1e9
+    return out
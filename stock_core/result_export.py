@@ -0,0 +1,163 @@
+# stock_core/result_export.py
+# 分析結果的欄式匯出（Arrow / Parquet）：固定、具型別的長表結構（每檔股票 × 每項指標一列），
+# 字串欄以字典編碼；可依日期分區逐次附加到本機資料集，供下游量化分析查詢歷史結果
+
+import hashlib
+import io
+import os
+
+import pandas as pd
+
+RESULTS_DATASET_DIR = os.environ.get("RESULTS_DATASET_DIR", os.path.join(".cache", "results_dataset"))
+SCHEMA_VERSION = 1
+
+# (欄位, 型別, 說明)；型別以字串描述，實際的 Arrow 型別在 result_schema() 中建立
+RESULT_FIELDS = [
+    ("as_of", "date", "分析日期（分區欄）"),
+    ("ticker", "dict", "股票代碼"),
+    ("metric", "dict", "指標名稱（EPS、ROE、P/E、P/B、淨利率）"),
+    ("value", "float64", "指標原始數值（缺值為 null）"),
+    ("basis", "dict", "口徑（TTM / NTM / FY / MRQ）"),
+    ("grade", "dict", "評級（A–F、N/A）"),
+    ("points", "int8", "該項得分（缺值為 null）"),
+    ("mode", "dict", "股型（VALUE / GROWTH / MIX）"),
+    ("total_score", "int16", "總分"),
+    ("suggestion", "dict", "投資建議"),
+    ("rule_set", "dict", "評分規則名稱"),
+    ("computed_at", "timestamp", "匯出時間（UTC）；同一天多次匯出時取最新"),
+]
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("pyarrow 未安裝，無法匯出 Parquet / Arrow") from e
+    return pa, ds, pq
+
+
+def result_schema():
+    pa, _, _ = _arrow()
+    types = {
+        "date": pa.date32(),
+        "dict": pa.dictionary(pa.int32(), pa.string()),
+        "float64": pa.float64(),
+        "int8": pa.int8(),
+        "int16": pa.int16(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+    }
+    return pa.schema(
+        [pa.field(name, types[kind], metadata={"description": desc}) for name, kind, desc in RESULT_FIELDS],
+        metadata={"schema_version": str(SCHEMA_VERSION)},
+    )
+
+
+def results_frame(all_details: dict, as_of=None, rule_set: str = "") -> pd.DataFrame:
+    """all_details → 長表 DataFrame（欄位同 RESULT_FIELDS；數值為 float，不經過 fmt 字串）。"""
+    as_of = pd.Timestamp(as_of if as_of is not None else pd.Timestamp.now(tz="UTC").date()).date()
+    computed_at = pd.Timestamp.now(tz="UTC").floor("ms")
+    rows = []
+    for symbol, data in all_details.items():
+        metrics = data["fundamentals"].get("metrics") or {}
+        scores = data.get("scores") or {}
+        for name, basis, _, grade, *_ in data["details"]:
+            value = metrics.get(name)
+            points = scores.get(name)
+            rows.append({
+                "as_of": as_of,
+                "ticker": symbol,
+                "metric": name,
+                "value": float(value) if value is not None else None,
+                "basis": basis,
+                "grade": grade,
+                "points": int(points) if points is not None else None,
+                "mode": data["mode"],
+                "total_score": int(data["total_score"]),
+                "suggestion": data["suggestion"],
+                "rule_set": rule_set,
+                "computed_at": computed_at,
+            })
+    return pd.DataFrame(rows, columns=[f[0] for f in RESULT_FIELDS])
+
+
+def results_table(all_details: dict, as_of=None, rule_set: str = ""):
+    """all_details → 符合 result_schema() 的 Arrow Table。"""
+    pa, _, _ = _arrow()
+    frame = results_frame(all_details, as_of=as_of, rule_set=rule_set)
+    schema = result_schema()
+    arrays = []
+    for field in schema:
+        col = frame[field.name]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(col.astype(object).where(col.notna(), None), type=pa.string()).dictionary_encode())
+        elif pa.types.is_integer(field.type):
+            arrays.append(pa.array(col.astype(object).where(col.notna(), None), type=field.type))
+        else:
+            arrays.append(pa.array(col, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def to_parquet_bytes(table) -> bytes:
+    _, _, pq = _arrow()
+    buf = io.BytesIO()
+    pq.write_table(table, buf, compression="zstd")
+    return buf.getvalue()
+
+
+def to_arrow_bytes(table) -> bytes:
+    """Arrow IPC 檔案格式（.arrow / Feather v2）。"""
+    pa, _, _ = _arrow()
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def append_to_dataset(table, root: str | None = None) -> list[str]:
+    """依 as_of 分區（Hive 格式：as_of=YYYY-MM-DD/）附加到本機 Parquet 資料集，回傳寫入的檔案。
+
+    檔名取自內容雜湊：同一份結果重複匯出只會覆寫同一個檔案，不會產生重複列。
+    """
+    pa, ds, _ = _arrow()
+    root = root or RESULTS_DATASET_DIR
+    if table.num_rows == 0:
+        return []
+    content = table.drop_columns(["computed_at"]).to_pandas().to_csv(index=False)
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+    written = []
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("as_of", pa.date32())]), flavor="hive"),
+        basename_template=f"results-{digest}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_visitor=lambda f: written.append(f.path),
+    )
+    return written
+
+
+def read_dataset(root: str | None = None, start=None, end=None, tickers=None) -> pd.DataFrame:
+    """讀取歷史結果；日期條件只掃描對應的分區。同一天同一檔股票、同一套評分規則有多次匯出時只保留最新一次。"""
+    pa, ds, _ = _arrow()
+    root = root or RESULTS_DATASET_DIR
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=[f[0] for f in RESULT_FIELDS])
+    dataset = ds.dataset(root, format="parquet", partitioning=ds.partitioning(pa.schema([("as_of", pa.date32())]), flavor="hive"))
+    cond = None
+    for expr in (
+        ds.field("as_of") >= pa.scalar(pd.Timestamp(start).date(), pa.date32()) if start is not None else None,
+        ds.field("as_of") <= pa.scalar(pd.Timestamp(end).date(), pa.date32()) if end is not None else None,
+        ds.field("ticker").isin(list(tickers)) if tickers else None,
+    ):
+        if expr is not None:
+            cond = expr if cond is None else cond & expr
+    frame = dataset.to_table(filter=cond).to_pandas()
+    if frame.empty:
+        return frame
+    frame = frame[[f[0] for f in RESULT_FIELDS]]
+    # 不同評分規則的結果各自保留（同一天以兩套規則匯出不互相覆蓋）
+    latest = frame.groupby(["as_of", "ticker", "rule_set"], observed=True)["computed_at"].transform("max")
+    return frame[frame["computed_at"] == latest].reset_index(drop=True)
@@ -0,0 +1,310 @@
+# stock_core/scoring_rules.py
+# 宣告式評分規則：門檻寫在規則檔（JSON；有安裝 PyYAML 時也可用 YAML），
+# 載入時編譯成遞增的分界陣列，以 np.searchsorted 一次替所有股票評級；規則檔修改後下次載入即生效
+
+import json
+import os
+import threading
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .sector_percentiles import load_sector_table, percentile_frame
+
+RULES_DIR = os.path.join(os.path.dirname(__file__), "rules")
+DEFAULT_RULES = os.path.join(RULES_DIR, "default.json")
+# 各交易台自訂規則檔的目錄（未設定時只用套件內附的規則）
+USER_RULES_DIR = os.environ.get("SCORING_RULES_DIR", "")
+RULE_SUFFIXES = (".json", ".yaml", ".yml")
+# absolute：門檻套在原始指標；sector_percentile：門檻套在產業內百分位（0~100，越高越好）
+BASES = ("absolute", "sector_percentile")
+
+
+@dataclass(frozen=True)
+class Bands:
+    """一組分段：bounds[i] 為第 i+1 段的下界（已換算成「>= 即進入下一段」），values 為各段結果。"""
+
+    bounds: np.ndarray
+    values: np.ndarray
+    edges: tuple  # 原始下界 ((kind, x) 或 None)，供產生說明文字
+
+    def lookup(self, x: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.bounds, x, side="right")
+
+
+def _compile_bands(spec: list[dict], key: str, where: str) -> Bands:
+    """規則檔的分段（由低到高）→ Bands；第一段不設下界，其後每段需有 from（>=）或 above（>）之一。"""
+    if not spec:
+        raise ValueError(f"{where}: 至少需要一個分段")
+    edges, bounds = [], []
+    for i, band in enumerate(spec):
+        if key not in band:
+            raise ValueError(f"{where}: 第 {i + 1} 段缺少 {key}")
+        kinds = [k for k in ("from", "above") if k in band]
+        if i == 0:
+            if kinds:
+                raise ValueError(f"{where}: 第一段不可設定下界")
+            edges.append(None)
+            continue
+        if len(kinds) != 1:
+            raise ValueError(f"{where}: 第 {i + 1} 段需設定 from 或 above 其中之一")
+        x = float(band[kinds[0]])
+        edges.append((kinds[0], x))
+        # "> x" 等同 ">= x 之後的下一個浮點數"，兩種邊界因此能共用同一次 searchsorted
+        bounds.append(x if kinds[0] == "from" else np.nextafter(x, np.inf))
+    bounds = np.asarray(bounds, dtype=float)
+    if np.any(np.diff(bounds) <= 0):
+        raise ValueError(f"{where}: 分段下界必須遞增")
+    return Bands(bounds, np.asarray([band[key] for band in spec], dtype=object), tuple(edges))
+
+
+def _fmt_bound(x: float, unit: str) -> str:
+    if unit == "percent":
+        return f"{x * 100:g}%"
+    if unit == "percentile":
+        return f"PR{x:g}"
+    return f"{x:g}"
+
+
+def _describe_band(bands: Bands, i: int, unit: str) -> str:
+    lo = bands.edges[i]
+    hi = bands.edges[i + 1] if i + 1 < len(bands.edges) else None
+    if lo is None and hi is None:
+        return "全部"
+    if lo is None:
+        return ("<" if hi[0] == "from" else "≤") + _fmt_bound(hi[1], unit)
+    if hi is None:
+        return ("≥" if lo[0] == "from" else ">") + _fmt_bound(lo[1], unit)
+    left = "[" if lo[0] == "from" else "("
+    right = ")" if hi[0] == "from" else "]"
+    return f"{left}{_fmt_bound(lo[1], unit)}, {_fmt_bound(hi[1], unit)}{right}"
+
+
+class RuleSet:
+    """編譯後的評分規則；grade / score_frame 皆為向量化，可一次處理任意多檔股票。"""
+
+    def __init__(self, spec: dict, path: str = ""):
+        self.path = path
+        self.name = spec.get("name") or os.path.splitext(os.path.basename(path))[0]
+        self.description = spec.get("description", "")
+        self.basis = spec.get("basis", "absolute")
+        if self.basis not in BASES:
+            raise ValueError(f"未知的 basis: {self.basis}")
+        grades = spec.get("grades") or {}
+        if not grades:
+            raise ValueError("規則檔缺少 grades")
+        self.grade_scores = {g: int(v["score"]) for g, v in grades.items()}
+        self.grade_labels = {g: v.get("label", "") for g, v in grades.items()}
+        self.max_score = max(self.grade_scores.values())
+
+        # metric -> {None: 預設分段, mode: 該股型專用分段}
+        self.metrics: dict[str, dict] = {}
+        self.units: dict[str, str] = {}
+        self.directions: dict[str, str] = {}
+        self._band_scores: dict[tuple, np.ndarray] = {}
+        for metric, rule in (spec.get("metrics") or {}).items():
+            table = {None: _compile_bands(rule["bands"], "grade", metric)}
+            for mode, bands in (rule.get("by_mode") or {}).items():
+                table[mode] = _compile_bands(bands, "grade", f"{metric} ({mode})")
+            for mode, bands in table.items():
+                unknown = set(bands.values) - set(self.grade_scores)
+                if unknown:
+                    raise ValueError(f"{metric}: 未定義的評級 {sorted(unknown)}")
+            self.metrics[metric] = table
+            for mode, bands in table.items():
+                self._band_scores[metric, mode] = np.asarray([self.grade_scores[g] for g in bands.values], dtype=float)
+            self.units[metric] = rule.get("unit", "percentile" if self.basis == "sector_percentile" else "number")
+            self.directions[metric] = rule.get("direction", "higher")
+        if not self.metrics:
+            raise ValueError("規則檔缺少 metrics")
+        self.max_total = self.max_score * len(self.metrics)
+        self.suggestions = _compile_bands(spec.get("suggestions") or [], "label", "suggestions")
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        with open(path, encoding="utf-8") as f:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError as e:
+                    raise RuntimeError("讀取 YAML 規則檔需要安裝 PyYAML") from e
+                spec = yaml.safe_load(f)
+            else:
+                spec = json.load(f)
+        return cls(spec, path)
+
+    @property
+    def suggestion_ladder(self) -> list[str]:
+        """投資建議由高到低（總分越高越前面）。"""
+        return list(self.suggestions.values[::-1])
+
+    def _apply(self, metric: str, x: np.ndarray, modes):
+        """依股型挑選分段並二分搜尋；逐一產生 (股型, 遮罩, 段索引)。"""
+        table = self.metrics.get(metric)
+        if table is None:
+            return
+        valid = ~np.isnan(x)
+        special = [m for m in table if m is not None]
+        for mode, bands in table.items():
+            if mode is None:
+                mask = valid.copy()
+                if modes is not None:
+                    for m in special:
+                        mask &= modes != m
+            elif modes is None:
+                continue
+            else:
+                mask = valid & (modes == mode)
+            if mask.any():
+                yield mode, mask, bands.lookup(x[mask])
+
+    def grade(self, metric: str, values, modes=None) -> tuple[np.ndarray, np.ndarray]:
+        """回傳 (評級, 分數)；數值缺漏為 "N/A" / NaN。modes 與 values 等長，有股型專用分段時套用。"""
+        x = np.asarray(values, dtype=float).reshape(-1)
+        modes = np.asarray(modes).reshape(-1) if modes is not None else None
+        grades = np.full(x.shape, "N/A", dtype=object)
+        scores = np.full(x.shape, np.nan)
+        for mode, mask, idx in self._apply(metric, x, modes):
+            grades[mask] = self.metrics[metric][mode].values[idx]
+            scores[mask] = self._band_scores[metric, mode][idx]
+        return grades, scores
+
+    def score_array(self, metric: str, values, modes=None) -> np.ndarray:
+        """只算分數（不產生評級字串），供大量情境運算使用。"""
+        x = np.asarray(values, dtype=float).reshape(-1)
+        modes = np.asarray(modes).reshape(-1) if modes is not None else None
+        scores = np.full(x.shape, np.nan)
+        for mode, mask, idx in self._apply(metric, x, modes):
+            scores[mask] = self._band_scores[metric, mode][idx]
+        return scores
+
+    def suggest(self, totals) -> np.ndarray:
+        totals = np.asarray(totals, dtype=float).reshape(-1)
+        return self.suggestions.values[self.suggestions.lookup(totals)]
+
+    def score_frame(self, metrics: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
+        """metrics：每列一檔股票、每欄一項指標（可含 mode 欄）。回傳 (評級, 分數, 總分, 投資建議)。"""
+        modes = metrics["mode"].to_numpy(dtype=object) if "mode" in metrics else None
+        grades, scores = {}, {}
+        for metric in self.metrics:
+            col = metrics[metric] if metric in metrics else pd.Series(np.nan, index=metrics.index)
+            grades[metric], scores[metric] = self.grade(metric, pd.to_numeric(col, errors="coerce"), modes)
+        grades = pd.DataFrame(grades, index=metrics.index)
+        scores = pd.DataFrame(scores, index=metrics.index)
+        # 總分：直接加總有數值的項目（缺漏不計分）
+        total = scores.sum(axis=1, skipna=True).astype(int)
+        return grades, scores, total, pd.Series(self.suggest(total), index=metrics.index)
+
+    def score_one(self, metrics: dict, mode: str | None = None):
+        """單檔股票：回傳 ({指標: 評級}, {指標: 分數或 None}, 總分, 投資建議)。"""
+        frame = pd.DataFrame([{**metrics, "mode": mode}])
+        grades, scores, total, suggestion = self.score_frame(frame)
+        score_map = {m: (None if pd.isna(v) else int(v)) for m, v in scores.iloc[0].items()}
+        return grades.iloc[0].to_dict(), score_map, int(total.iloc[0]), suggestion.iloc[0]
+
+    def describe_metric(self, metric: str, mode: str | None = None) -> str:
+        bands = self.metrics[metric][mode]
+        parts: dict[str, list[str]] = {}
+        for i, g in enumerate(bands.values):
+            parts.setdefault(g, []).append(_describe_band(bands, i, self.units[metric]))
+        order = sorted(parts, key=lambda g: -self.grade_scores[g])
+        return ", ".join(f"{g}:{' 或 '.join(parts[g])}" for g in order)
+
+    def help_markdown(self) -> str:
+        """評級欄的說明文字（由規則產生，規則檔修改後自動一致）。"""
+        lines = [f"**評級標準（{self.name}）:**"]
+        if self.description:
+            lines.append(self.description + "\n")
+        for g, s in sorted(self.grade_scores.items(), key=lambda kv: -kv[1]):
+            lines.append(f"- **{g}:** {self.grade_labels.get(g, '')} ({s}分)")
+        lines.append("---")
+        for metric, table in self.metrics.items():
+            if len(table) == 1:
+                lines.append(f"**{metric}:** {self.describe_metric(metric)}\n")
+                continue
+            lines.append(f"**{metric} (其他股型):** {self.describe_metric(metric)}\n")
+            for mode in (m for m in table if m is not None):
+                lines.append(f"**{metric} ({mode}):** {self.describe_metric(metric, mode)}\n")
+        ladder = [f"{label} {_describe_band(self.suggestions, i, 'number')}" for i, label in enumerate(self.suggestions.values)]
+        lines.append("**投資建議（總分）:** " + ", ".join(reversed(ladder)))
+        return "\n".join(lines)
+
+
+# ===== 載入與熱更新 =====
+_loaded: dict[str, tuple] = {}  # 絕對路徑 -> ((mtime_ns, size), RuleSet)
+_load_lock = threading.Lock()
+
+
+def available_rule_sets() -> dict[str, str]:
+    """可選的規則檔 {名稱: 路徑}；預設規則排第一。"""
+    found = {"default": DEFAULT_RULES}
+    for folder in (RULES_DIR, USER_RULES_DIR):
+        if not folder or not os.path.isdir(folder):
+            continue
+        for fname in sorted(os.listdir(folder)):
+            stem, suffix = os.path.splitext(fname)
+            if suffix in RULE_SUFFIXES:
+                found.setdefault(stem, os.path.join(folder, fname))
+    return found
+
+
+def load_rule_set(path: str | None = None) -> RuleSet:
+    """載入並編譯規則檔；檔案未變動時直接回傳已編譯版本，變動後自動重新編譯。
+
+    重新載入失敗（例如檔案存到一半）時沿用上一版並發出 RuntimeWarning；從未成功載入過則拋出例外。
+    """
+    path = os.path.abspath(path or DEFAULT_RULES)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _load_lock:
+        cached = _loaded.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    try:
+        rules = RuleSet.from_file(path)
+    except (ValueError, KeyError, TypeError) as e:
+        if cached is None:
+            raise
+        warnings.warn(f"評分規則 {path} 重新載入失敗，沿用上一版: {e}", RuntimeWarning, stacklevel=2)
+        return cached[1]
+    with _load_lock:
+        _loaded[path] = (stamp, rules)
+    return rules
+
+
+def rescore(all_details: dict, rules: RuleSet) -> dict:
+    """以指定規則重新評分已分析的股票（只用記憶體中的原始指標，不重抓資料）。
+
+    產業百分位規則需要本機的百分位表，尚未建立時拋出 FileNotFoundError。
+    回傳新的 dict；原本的 details 列不會被修改（它們可能來自跨 session 共用的快取）。
+    """
+    if not all_details:
+        return {}
+    symbols = list(all_details)
+    frame = pd.DataFrame.from_dict(
+        {sym: all_details[sym]["fundamentals"].get("metrics", {}) for sym in symbols}, orient="index"
+    ).reindex(symbols)
+    frame["mode"] = [all_details[sym]["mode"] for sym in symbols]
+    if rules.basis == "sector_percentile":
+        # 先換算成產業內百分位（查本機預先計算的分位數表），再套同一套分段規則
+        sectors = [all_details[sym]["fundamentals"].get("sector") for sym in symbols]
+        frame = percentile_frame(frame, sectors, load_sector_table(), rules.directions).assign(mode=frame["mode"])
+    grades, scores, total, suggestion = rules.score_frame(frame)
+
+    out = {}
+    for sym in symbols:
+        data = all_details[sym]
+        rows = [list(row) for row in data["details"]]
+        for row in rows:
+            if row[0] in grades.columns:
+                row[3] = grades.at[sym, row[0]]
+        out[sym] = {
+            **data,
+            "details": rows,
+            "scores": {m: (None if pd.isna(v) else int(v)) for m, v in scores.loc[sym].items()},
+            "total_score": int(total[sym]),
+            "suggestion": suggestion[sym],
+        }
+    return out
@@ -0,0 +1,181 @@
+# stock_core/sector_percentiles.py
+# 產業相對評分用的百分位表：定期對整個股票池計算各產業、各指標的分位數並存到本機，
+# 評分時只需在該產業的分位數陣列上做二分搜尋（O(log n)），不必每次重算產業分布
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SECTOR_TABLE_PATH = os.environ.get("SECTOR_TABLE_PATH", os.path.join(".cache", "sector_percentiles.json"))
+METRICS = ["EPS", "ROE", "P/E", "P/B", "淨利率"]
+# 只有正值才有意義的指標（負 P/E、P/B 不參與分布，評分時視為最差）
+POSITIVE_ONLY = ("P/E", "P/B")
+# 產業內有效樣本少於此數時改用全市場分布
+MIN_SECTOR_SIZE = 5
+ALL_SECTORS = "_all"
+QUANTILE_GRID = np.linspace(0.0, 1.0, 101)
+
+
+@dataclass(frozen=True)
+class SectorTable:
+    """各產業、各指標的 0~100 百分位分界（每組 101 個遞增值）。"""
+
+    built_at: str
+    quantiles: dict  # sector -> {metric: np.ndarray}
+    counts: dict  # sector -> 股票數
+    positive_only: tuple = POSITIVE_ONLY
+
+    def lookup(self, sector: str | None, metric: str) -> np.ndarray | None:
+        q = self.quantiles.get(sector or ALL_SECTORS, {}).get(metric)
+        if q is None:
+            q = self.quantiles.get(ALL_SECTORS, {}).get(metric)
+        return q
+
+    def to_dict(self) -> dict:
+        return {
+            "built_at": self.built_at,
+            "counts": self.counts,
+            "positive_only": list(self.positive_only),
+            "quantiles": {s: {m: q.tolist() for m, q in table.items()} for s, table in self.quantiles.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "SectorTable":
+        quantiles = {
+            s: {m: np.asarray(q, dtype=float) for m, q in table.items()}
+            for s, table in (raw.get("quantiles") or {}).items()
+        }
+        return cls(raw.get("built_at", ""), quantiles, raw.get("counts") or {}, tuple(raw.get("positive_only") or POSITIVE_ONLY))
+
+
+def metrics_frame(fundamentals: dict) -> pd.DataFrame:
+    """{股票: analyze_stock 的 fundamentals} → 每列一檔的指標 + sector 表。"""
+    rows = {sym: {**(f.get("metrics") or {}), "sector": f.get("sector")} for sym, f in fundamentals.items()}
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def build_sector_table(frame: pd.DataFrame, built_at: str | None = None) -> SectorTable:
+    """frame：每列一檔股票，欄位為各指標原始值與 sector。"""
+    built_at = built_at or pd.Timestamp.now(tz="UTC").isoformat(timespec="seconds")
+    sectors = frame["sector"].fillna(ALL_SECTORS) if "sector" in frame else pd.Series(ALL_SECTORS, index=frame.index)
+    groups = [(ALL_SECTORS, frame)] + [(s, g) for s, g in frame.groupby(sectors) if s != ALL_SECTORS]
+
+    quantiles, counts = {}, {}
+    for sector, group in groups:
+        counts[sector] = int(len(group))
+        table = {}
+        for metric in METRICS:
+            if metric not in group:
+                continue
+            vals = pd.to_numeric(group[metric], errors="coerce").to_numpy(dtype=float)
+            vals = vals[~np.isnan(vals)]
+            if metric in POSITIVE_ONLY:
+                vals = vals[vals > 0]
+            if len(vals) >= MIN_SECTOR_SIZE:
+                table[metric] = np.quantile(vals, QUANTILE_GRID)
+        if table:
+            quantiles[sector] = table
+    return SectorTable(built_at, quantiles, counts)
+
+
+def percentile_frame(metrics: pd.DataFrame, sectors, table: SectorTable, directions: dict) -> pd.DataFrame:
+    """把原始指標換算成產業內的「好壞百分位」（0~100，越高越好）。
+
+    directions：{指標: "higher" 或 "lower"}，lower 代表數值越低越好（如 P/E），換算後會反轉。
+    查不到分布的指標為 NaN（評級顯示 N/A）。
+    """
+    sectors = pd.Series(list(sectors), index=metrics.index, dtype=object).fillna(ALL_SECTORS)
+    out = pd.DataFrame(np.nan, index=metrics.index, columns=list(directions))
+    for metric, direction in directions.items():
+        if metric not in metrics:
+            continue
+        values = pd.to_numeric(metrics[metric], errors="coerce")
+        for sector, idx in sectors.groupby(sectors).groups.items():
+            q = table.lookup(sector, metric)
+            if q is None:
+                continue
+            x = values.loc[idx].to_numpy(dtype=float)
+            out.loc[idx, metric] = percentile_values(q, x, direction, metric in table.positive_only)
+    return out
+
+
+def percentile_values(q: np.ndarray, x: np.ndarray, direction: str = "higher", positive_only: bool = False) -> np.ndarray:
+    """在單一分位數陣列 q 上查任意形狀的 x，回傳 0~100 的好壞百分位（NaN 保持 NaN）。"""
+    # 與分界相同的值取左右位置的中點，避免同值一律落在最高或最低
+    pos = (np.searchsorted(q, x, side="left") + np.searchsorted(q, x, side="right")) / 2.0
+    pct = np.clip(pos * 100.0 / (len(q) - 1), 0.0, 100.0)
+    if direction == "lower":
+        pct = 100.0 - pct
+    if positive_only:
+        pct = np.where(x <= 0, 0.0, pct)
+    return np.where(np.isnan(x), np.nan, pct)
+
+
+def save_sector_table(table: SectorTable, path: str | None = None) -> str:
+    path = path or SECTOR_TABLE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+_loaded: dict[str, tuple] = {}  # 絕對路徑 -> ((mtime_ns, size), SectorTable)
+_load_lock = threading.Lock()
+
+
+def load_sector_table(path: str | None = None) -> SectorTable:
+    """讀取本機百分位表（檔案更新後自動重新讀取）；尚未建立時拋出 FileNotFoundError。"""
+    path = os.path.abspath(path or SECTOR_TABLE_PATH)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _load_lock:
+        cached = _loaded.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with open(path, encoding="utf-8") as f:
+        table = SectorTable.from_dict(json.load(f))
+    with _load_lock:
+        _loaded[path] = (stamp, table)
+    return table
+
+
+def refresh_sector_table(tickers: list[str], path: str | None = None) -> SectorTable:
+    """對股票池逐檔分析後重建百分位表並寫入本機（建議以排程定期執行）。"""
+    from .analysis import analyze_stock
+
+    fundamentals = {}
+    for symbol in tickers:
+        try:
+            fundamentals[symbol] = analyze_stock(symbol)[-1]
+        except Exception as e:
+            print(f"{symbol} 分析失敗，略過: {e}")
+    if not fundamentals:
+        raise RuntimeError("股票池中沒有任何股票分析成功，未更新百分位表")
+    table = build_sector_table(metrics_frame(fundamentals))
+    save_sector_table(table, path)
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="重建產業百分位表")
+    parser.add_argument("tickers", nargs="*", help="股票代碼")
+    parser.add_argument("--universe", help="股票池檔案（每行一個代碼）")
+    parser.add_argument("--out", default=None, help=f"輸出路徑（預設 {SECTOR_TABLE_PATH}）")
+    args = parser.parse_args()
+
+    universe = [t.strip().upper() for t in args.tickers]
+    if args.universe:
+        with open(args.universe, encoding="utf-8") as f:
+            universe += [line.strip().upper() for line in f if line.strip() and not line.startswith("#")]
+    if not universe:
+        parser.error("請指定股票代碼或 --universe")
+    built = refresh_sector_table(list(dict.fromkeys(universe)), args.out)
+    print(f"已更新 {args.out or SECTOR_TABLE_PATH}：{built.counts.get(ALL_SECTORS, 0)} 檔、{len(built.counts) - 1} 個產業")
@@ -0,0 +1,131 @@
+# stock_core/shared_cache.py
+# 跨 session 共用的程序層級快取（含 single-flight 請求合併）：
+# 多位使用者同時查詢同一檔股票時，只有第一個請求真正呼叫上游，其餘等待同一個進行中的結果
+
+import threading
+import time
+from concurrent.futures import Future
+
+from . import perf
+from . import telemetry
+
+SHARED_REQUESTS = telemetry.counter(
+    "shared_cache_requests_total",
+    "跨 session 快取請求（result=hit/miss/coalesced）",
+    ("namespace", "result"),
+)
+
+# 上游未回傳資料的 key（不寫入快取，等待者也視為查無資料）
+_MISSING = object()
+
+
+class SharedCache:
+    """以 key 為單位的 TTL 快取；同一 key 同時只會有一個上游請求在進行。
+
+    上游失敗時不寫入快取，例外會傳給所有等待中的呼叫者。
+    """
+
+    def __init__(self, namespace: str, ttl: float = 900.0, max_entries: int = 2048):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._values: dict = {}  # key -> (stored_at, value)
+        self._inflight: dict = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    def _fresh(self, key, now: float):
+        entry = self._values.get(key)
+        if entry is not None and now - entry[0] <= self.ttl:
+            return entry
+        return None
+
+    def _count(self, hits: int, misses: int, coalesced: int) -> None:
+        perf.note(hits=hits + coalesced, misses=misses)
+        for result, n in (("hit", hits), ("miss", misses), ("coalesced", coalesced)):
+            if n:
+                SHARED_REQUESTS.inc(n, namespace=self.namespace, result=result)
+
+    def _store(self, key, value, now: float) -> None:
+        self._values[key] = (now, value)
+        if len(self._values) > self.max_entries:
+            # 先淘汰過期的，仍超過上限再淘汰最舊的
+            for k in [k for k, (ts, _) in self._values.items() if now - ts > self.ttl]:
+                self._values.pop(k, None)
+            while len(self._values) > self.max_entries:
+                self._values.pop(min(self._values, key=lambda k: self._values[k][0]))
+
+    def get_or_fetch(self, key, fetch):
+        """取得單一 key；快取沒有時呼叫 fetch()，同時的其他呼叫者等待同一結果。"""
+        return self.get_many([key], lambda keys: {keys[0]: fetch()})[key]
+
+    def get_many(self, keys: list, fetch_many) -> dict:
+        """批次版本：fetch_many(缺少的 keys) 回傳 {key: value}，未回傳的 key 視為查無資料。
+
+        已由其他呼叫者下載中的 key 不會重複請求，而是等待對方的結果。
+        """
+        now = time.time()
+        out, waiting, claimed = {}, {}, {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._fresh(key, now)
+                if entry is not None:
+                    out[key] = entry[1]
+                elif key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    claimed[key] = self._inflight[key] = Future()
+        self._count(len(out), len(claimed), len(waiting))
+
+        if claimed:
+            try:
+                fetched = fetch_many(list(claimed))
+            except BaseException as e:
+                with self._lock:
+                    for key, fut in claimed.items():
+                        self._inflight.pop(key, None)
+                        fut.set_exception(e)
+                raise
+            done_at = time.time()
+            with self._lock:
+                for key, fut in claimed.items():
+                    self._inflight.pop(key, None)
+                    if key in fetched:
+                        self._store(key, fetched[key], done_at)
+                        fut.set_result(fetched[key])
+                    else:
+                        fut.set_result(_MISSING)
+            out.update({k: fetched[k] for k in claimed if k in fetched})
+
+        for key, fut in waiting.items():
+            value = fut.result()
+            if value is not _MISSING:
+                out[key] = value
+        return out
+
+    def put_many(self, items: dict) -> None:
+        """直接寫入已取得的值（例如批次預先抓取的結果），之後的 get 會命中。"""
+        now = time.time()
+        with self._lock:
+            for key, value in items.items():
+                self._store(key, value, now)
+
+    def invalidate(self, key=None) -> None:
+        with self._lock:
+            if key is None:
+                self._values.clear()
+            else:
+                self._values.pop(key, None)
+
+
+_caches: dict[str, SharedCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_shared_cache(namespace: str, ttl: float = 900.0) -> SharedCache:
+    """取得（必要時建立）指定命名空間的全程序共用快取。"""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = SharedCache(namespace, ttl=ttl)
+            _caches[namespace] = cache
+        return cache
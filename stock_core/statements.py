@@ -0,0 +1,62 @@
+# stock_core/statements.py
+# 財報整理小工具：把 yfinance 的年度 / 季度報表整理成「最近三個完整年度 + 當年 YTD」
+
+import pandas as pd
+
+INCOME_BAR_ITEMS = ['Total Revenue', 'Net Income']
+BALANCE_BAR_ITEMS = ['Total Assets', 'Total Liabilities Net Minority Interest']
+
+
+def yearly_with_ytd(annual: pd.DataFrame, quarterly: pd.DataFrame | None, wanted: list[str], ytd: str = "sum", years: int = 3) -> pd.DataFrame:
+    """回傳最近 years 個完整年度加上當年 YTD 的數值（原始單位）。
+
+    ytd="sum"：當年各季合計（損益表）；ytd="last"：當年最近一季的快照（資產負債表）。
+    索引為期間標籤（"2023"、…、"2025 (YTD)"），欄為 wanted 中報表實際有的項目。
+    """
+    if annual is None or annual.empty:
+        return pd.DataFrame()
+    available = [w for w in wanted if w in annual.index]
+    if not available:
+        return pd.DataFrame()
+
+    df_plot = annual.loc[available].transpose()
+    try:
+        if not isinstance(df_plot.index, pd.DatetimeIndex):
+            df_plot.index = pd.to_datetime(df_plot.index, errors='coerce')
+        df_plot = df_plot[~df_plot.index.isna()]
+        annual_df = df_plot.groupby(df_plot.index.year).first()
+    except Exception:
+        annual_df = df_plot
+
+    current_year = pd.Timestamp.today().year
+    prev_years = sorted([int(y) for y in annual_df.index if str(y).isdigit() and int(y) < current_year])[-years:]
+
+    ytd_vals = {m: None for m in available}
+    if quarterly is not None and not quarterly.empty:
+        qdf = quarterly.loc[[m for m in available if m in quarterly.index]].transpose()
+        if not isinstance(qdf.index, pd.DatetimeIndex):
+            qdf.index = pd.to_datetime(qdf.index, errors='coerce')
+        qdf = qdf[~qdf.index.isna()]
+        cur = qdf[qdf.index.year == current_year]
+        if not cur.empty:
+            last_row = cur.sort_index().iloc[-1]
+            for m in available:
+                if m not in cur.columns:
+                    continue
+                try:
+                    ytd_vals[m] = float(cur[m].dropna().sum()) if ytd == "sum" else float(last_row.get(m, None))
+                except Exception:
+                    ytd_vals[m] = None
+
+    rows = {}
+    for y in prev_years:
+        row = {m: None for m in available}
+        if y in annual_df.index:
+            for m in available:
+                try:
+                    row[m] = float(annual_df.loc[y, m])
+                except Exception:
+                    row[m] = None
+        rows[str(y)] = row
+    rows[f"{current_year} (YTD)"] = ytd_vals
+    return pd.DataFrame(rows).transpose()[available].astype(float)
@@ -0,0 +1,281 @@
+# stock_core/telemetry.py
+# 程序層級的營運指標（Prometheus 文字格式）：計數器、量表、直方圖，
+# 並在本機 HTTP 端點 /metrics 提供，供多人同時使用時做容量規劃
+# 不依賴 prometheus_client；所有 session 共用同一份 REGISTRY
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 預設監聽埠，可用環境變數 METRICS_PORT 覆寫；設為 0 則不啟動端點
+DEFAULT_PORT = 9464
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要標籤 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """只增不減的計數器（名稱依慣例以 _total 結尾）。"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """可增可減的量表（例如目前開啟的瀏覽器數量）。"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """累積分桶直方圖（秒）。"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = []
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = f'le="{_fmt(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: tuple = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: tuple = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+# ===== 儀表板使用的指標 =====
+PAGE_RUNS = counter("dashboard_page_runs_total", "Streamlit 頁面執行（rerun）次數")
+PAGE_RUN_SECONDS = histogram("dashboard_page_run_seconds", "單次頁面執行耗時")
+STAGE_SECONDS = histogram("dashboard_stage_seconds", "各處理階段耗時", ("stage",))
+STAGE_ERRORS = counter("dashboard_stage_errors_total", "各處理階段拋出例外的次數", ("stage",))
+TICKER_STAGE_SECONDS = histogram("dashboard_ticker_stage_seconds", "逐檔處理階段耗時（含 analyze_stock）", ("stage", "ticker"))
+PROVIDER_SECONDS = histogram("provider_request_seconds", "外部資料來源請求延遲", ("provider", "endpoint"))
+PROVIDER_ERRORS = counter("provider_request_errors_total", "外部資料來源請求失敗次數", ("provider", "endpoint"))
+CACHE_LOOKUPS = counter("cache_lookups_total", "快取查詢次數（result=hit/miss）", ("cache", "result"))
+FETCHED_BYTES = counter("fetched_bytes_total", "下載資料量（以解碼後 DataFrame 大小估算）", ("stage",))
+NEWS_SCRAPE_SECONDS = histogram("news_scrape_seconds", "新聞爬取耗時", ("result",))
+NEWS_SCRAPES = counter("news_scrapes_total", "新聞爬取次數（result=ok/empty/error）", ("result",))
+BROWSER_INSTANCES = gauge("news_browser_instances", "目前開啟中的無頭瀏覽器數量")
+BROWSER_INSTANCES.set(0)
+
+
+def record_span(name: str, attrs: dict, seconds: float, hits: int, misses: int, nbytes: int, failed: bool) -> None:
+    """由 perf.span 結束時呼叫，將一個計時區段轉為對應的指標。"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    if failed:
+        STAGE_ERRORS.inc(stage=name)
+    if "ticker" in attrs:
+        TICKER_STAGE_SECONDS.observe(seconds, stage=name, ticker=attrs["ticker"])
+    if "provider" in attrs:
+        endpoint = attrs.get("endpoint", name)
+        PROVIDER_SECONDS.observe(seconds, provider=attrs["provider"], endpoint=endpoint)
+        if failed:
+            PROVIDER_ERRORS.inc(provider=attrs["provider"], endpoint=endpoint)
+    if hits:
+        CACHE_LOOKUPS.inc(hits, cache=name, result="hit")
+    if misses:
+        CACHE_LOOKUPS.inc(misses, cache=name, result="miss")
+    if nbytes:
+        FETCHED_BYTES.inc(nbytes, stage=name)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_failed = False  # 啟動失敗（例如埠已被占用）後不再於每次 rerun 重試
+_server_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def start_metrics_server(port: int | None = None, addr: str = "127.0.0.1") -> int | None:
+    """在背景執行緒啟動 /metrics 端點（每個程序只啟動一次）；回傳實際埠號，未啟動則回傳 None。"""
+    global _server, _server_failed
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+        if _server_failed:
+            return None
+        if port is None:
+            try:
+                port = int(os.environ.get("METRICS_PORT", DEFAULT_PORT))
+            except ValueError:
+                port = DEFAULT_PORT
+        if port <= 0:
+            return None
+        try:
+            _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+        except OSError as e:
+            _server_failed = True
+            logger.warning("指標端點無法啟動（%s:%s）: %s", addr, port, e)
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        return _server.server_address[1]
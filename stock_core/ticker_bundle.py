@@ -0,0 +1,137 @@
+# stock_core/ticker_bundle.py
+# 單檔股票的「一次抓齊」資料包：analyze_stock、個股詳細分析與 PDF 圖表需要的所有 Yahoo 端點
+# 只在建立時抓一次（可平行、經過限流層），之後所有使用者都讀這份不可變的資料，不再碰 yf.Ticker
+# 分析結果只保留精簡的 TickerRecord（繪圖用的數字），不保留完整財報
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from . import perf
+from . import rate_limit
+from .statements import BALANCE_BAR_ITEMS, INCOME_BAR_ITEMS, yearly_with_ytd
+
+# 資料包包含的 yf.Ticker 屬性
+BUNDLE_FRAMES = ("financials", "balance_sheet", "quarterly_financials", "quarterly_balance_sheet")
+
+# 最近收盤價用的短期日線
+RECENT_HISTORY = {"period": "5d", "interval": "1d", "auto_adjust": True}
+
+
+@dataclass(frozen=True)
+class TickerBundle:
+    """單檔股票的財報、基本資訊與近期日線（建立後不可再指派；DataFrame 請視為唯讀）。
+
+    errors 記錄個別端點的失敗原因；失敗的端點以空的 DataFrame / dict 代替。
+    """
+
+    symbol: str
+    financials: pd.DataFrame
+    balance_sheet: pd.DataFrame
+    quarterly_financials: pd.DataFrame
+    quarterly_balance_sheet: pd.DataFrame
+    info: dict
+    recent_history: pd.DataFrame
+    errors: dict = field(default_factory=dict)
+
+
+def fetch_ticker_bundle(symbol: str, parallel: bool = True) -> TickerBundle:
+    """抓齊單檔股票所需的所有端點（預設平行）；全部失敗時拋出第一個錯誤。"""
+    import yfinance as yf
+    ticker = yf.Ticker(symbol)
+    jobs = {name: (lambda name=name: getattr(ticker, name)) for name in BUNDLE_FRAMES}
+    jobs["info"] = lambda: ticker.info
+    jobs["recent_history"] = lambda: ticker.history(**RECENT_HISTORY)
+
+    def run(name):
+        with perf.span(f"yf.{name}", provider="yahoo", endpoint=name, ticker=symbol):
+            return rate_limit.call(jobs[name], endpoint=name)
+
+    results, errors = {}, {}
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix=f"bundle-{symbol}") as pool:
+            # 複製 context，讓各端點的計時 span 記到呼叫端這次的 perf run
+            futures = {name: pool.submit(contextvars.copy_context().run, run, name) for name in jobs}
+        for name, fut in futures.items():
+            try:
+                results[name] = fut.result()
+            except Exception as e:
+                errors[name] = e
+    else:
+        for name in jobs:
+            try:
+                results[name] = run(name)
+            except Exception as e:
+                errors[name] = e
+
+    if not results:
+        raise next(iter(errors.values()))
+
+    frames = {}
+    for name in (*BUNDLE_FRAMES, "recent_history"):
+        df = results.get(name)
+        frames[name] = df if isinstance(df, pd.DataFrame) else pd.DataFrame()
+    return TickerBundle(
+        symbol=symbol,
+        info=dict(results.get("info") or {}),
+        errors={name: f"{type(e).__name__}: {e}" for name, e in errors.items()},
+        **frames,
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class StatementTable:
+    """小型數值表（期間 × 項目），以 tuple 保存；需要時再轉回 DataFrame。"""
+
+    periods: tuple
+    items: tuple
+    values: tuple  # 每個期間一列
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "StatementTable":
+        return cls(
+            tuple(df.index.tolist()),
+            tuple(df.columns.tolist()),
+            tuple(tuple(float(v) for v in row) for row in df.to_numpy(dtype=float)),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(list(self.values), index=list(self.periods), columns=list(self.items), dtype=float)
+
+
+@dataclass(frozen=True, slots=True)
+class TickerRecord:
+    """分析結果中保留的單檔精簡紀錄：只有個股詳細分析與 PDF 圖表需要的數字，不含原始報表與 info。
+
+    income / balance 為近三個完整年度 + 當年 YTD（原始單位）；沒有對應的年度報表時為 None。
+    """
+
+    symbol: str
+    income: StatementTable | None
+    balance: StatementTable | None
+
+    @classmethod
+    def from_bundle(cls, bundle: TickerBundle) -> "TickerRecord":
+        """由資料包建立紀錄（只取近三年 + YTD 的繪圖數字）。"""
+        def table(annual, quarterly, items, ytd):
+            if annual is None or annual.empty:
+                return None
+            return StatementTable.from_frame(yearly_with_ytd(annual, quarterly, items, ytd=ytd))
+
+        return cls(
+            symbol=bundle.symbol,
+            income=table(bundle.financials, bundle.quarterly_financials, INCOME_BAR_ITEMS, "sum"),
+            balance=table(bundle.balance_sheet, bundle.quarterly_balance_sheet, BALANCE_BAR_ITEMS, "last"),
+        )
+
+
+def as_record(stock) -> TickerRecord | None:
+    """分析結果中的 "stock" 轉為 TickerRecord（相容結果庫中舊版的 TickerBundle）。
+
+    舊版資料包每次呼叫都會重新計算；呼叫端應在取得分析結果時轉換一次，而不是每次繪圖時才轉。
+    """
+    if stock is None or isinstance(stock, TickerRecord):
+        return stock
+    return TickerRecord.from_bundle(stock)
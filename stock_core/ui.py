@@ -0,0 +1,914 @@
+# stock_core/ui.py
+# Streamlit 介面：兩個進入點（dashboard_v2.py、Stock_analysis_dashboard.py）共用同一份頁面，
+# 只以 main() 的參數切換差異；資料、評分與報告都在 stock_core 的其他模組
+
+import math
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+from plotly.colors import qualitative
+
+from . import async_yahoo, perf, telemetry, watchlists
+from .analysis import analyze_stock
+from .backtest import run_backtest, weights_from_scores
+from .bar_cache import BARS_PER_DAY, INTRADAY_INTERVALS, INTRADAY_MAX_PERIOD, get_bar_cache
+from .correlation import CorrelationTracker
+from .live_quotes import apply_live_metrics, merge_live_bars, poll_latest_bars
+from .pdf_report import ReportlabMissingError, submit_pdf_report
+from .price_panel import AlignedPanel, PanelStore
+from .rate_limit import ThrottledError
+from .result_export import RESULTS_DATASET_DIR, append_to_dataset, results_table, to_arrow_bytes, to_parquet_bytes
+from .scoring_rules import available_rule_sets, load_rule_set, rescore
+from .sector_percentiles import ALL_SECTORS, load_sector_table
+from .shared_cache import get_shared_cache
+from .ticker_bundle import as_record
+from .whatif import run_whatif
+
+
+# 小工具：將 Hex 轉為 RGBA（用於雷達圖填色）
+def hex_to_rgba(hex_color: str, alpha: float) -> str:
+    try:
+        h = hex_color.lstrip('#')
+        r, g, b = int(h[0:2], 16), int(h[2:4], 16), int(h[4:6], 16)
+        return f"rgba({r},{g},{b},{alpha})"
+    except Exception:
+        return "rgba(31,119,180,0.25)"
+
+
+# 產生「漂亮」刻度：回傳 (tick_min, tick_max, ticks_list)
+def nice_ticks(vmin: float, vmax: float, nticks: int = 6):
+    try:
+        if not (isinstance(vmin, (int, float)) and isinstance(vmax, (int, float))):
+            raise ValueError("vmin/vmax must be numbers")
+        if not math.isfinite(vmin) or not math.isfinite(vmax):
+            vmin, vmax = 0.0, 1.0
+        if vmin == vmax:
+            eps = 1.0 if vmin == 0 else abs(vmin) * 0.05
+            vmin, vmax = vmin - eps, vmax + eps
+
+        span = abs(vmax - vmin)
+        N = max(nticks - 1, 1)
+        raw = span / N
+        magnitude = 10 ** math.floor(math.log10(raw))
+        nice_steps = [1, 2, 2.5, 5, 10]
+        step = nice_steps[-1] * magnitude
+        for nice in nice_steps:
+            cand = nice * magnitude
+            if raw <= cand:
+                step = cand
+                break
+
+        tick_min = math.floor(vmin / step) * step
+        tick_max = tick_min + N * step
+        if tick_max < vmax:
+            shift = math.ceil((vmax - tick_max) / step)
+            tick_min += shift * step
+            tick_max = tick_min + N * step
+
+        ticks = [tick_min + i * step for i in range(nticks)]
+
+        def _round(v):
+            if step == 0:
+                return v
+            dec = max(0, -int(math.floor(math.log10(abs(step)))) + 2)
+            return round(v, dec)
+
+        tick_min = _round(tick_min)
+        tick_max = _round(tick_max)
+        ticks = [_round(t) for t in ticks]
+        return tick_min, tick_max, ticks
+    except Exception:
+        a, b = float(vmin), float(vmax)
+        if a == b:
+            a, b = a - 1.0, b + 1.0
+        step = (b - a) / (nticks - 1)
+        ticks = [a + i * step for i in range(nticks)]
+        return a, b, ticks
+
+
+def _statement_bar_chart(df: pd.DataFrame, color: str, key: str, empty_msg: str):
+    """最近三年 + YTD 的分組長條圖（單位：十億美元）。"""
+    if df.empty:
+        st.info(empty_msg)
+        return
+    df_b = df / 1e9
+    fig = go.Figure()
+    for i, metric in enumerate(df_b.columns):
+        alpha = 0.50 if i == 0 else 0.25
+        fig.add_trace(go.Bar(
+            x=list(df_b.index),
+            y=df_b[metric].values,
+            name=metric,
+            marker=dict(color=hex_to_rgba(color, alpha), line=dict(color=color, width=1)),
+            hovertemplate=f"%{{x}}<br>{metric}: %{{y:.2f}}<extra></extra>",
+        ))
+    fig.update_layout(
+        barmode='group',
+        template='plotly_dark',
+        legend_title='指標',
+        xaxis_title='期間',
+        yaxis_title='金額 (十億美元)',
+        yaxis=dict(tickformat=',d'),
+        margin=dict(l=10, r=10, t=10, b=10)
+    )
+    st.plotly_chart(fig, width='stretch', config={"displayModeBar": False}, key=key)
+
+
+def render_statement_charts(symbol: str, record, color: str):
+    """並排顯示：左為營收 vs 淨利，右為總資產 vs 總負債（皆為最近三個完整年度 + 當年 YTD）。"""
+    record = as_record(record)
+    if record is None:
+        return
+    chart_col1, chart_col2 = st.columns([1, 1], gap="large")
+    with chart_col1:
+        if record.income is not None:
+            st.write("**營收 vs 淨利**")
+            _statement_bar_chart(record.income.to_frame(), color, f"bar_revenue_{symbol}", "近年無對應的營收/淨利資料")
+    with chart_col2:
+        if record.balance is not None:
+            st.write("**總資產 vs 總負債**")
+            _statement_bar_chart(record.balance.to_frame(), color, f"bar_balance_{symbol}", "近年無對應的資產/負債資料")
+
+
+def main(show_news: bool = True):
+    """繪製整個儀表板頁面（每次 Streamlit rerun 呼叫一次）。
+
+    show_news：個股詳細分析中是否爬取最新 Yahoo 新聞（需要 Chrome）。
+    """
+    st.set_page_config(page_title="股票分析儀表板", layout="wide", page_icon="📊")
+    st.markdown(
+        """
+        <style>
+        .block-container {padding-top: 1.75rem; padding-bottom: 1rem; max-width: 1400px;}
+        section.main > div {padding-top: 1rem;}
+        /* Reduce main title size a bit to avoid clipping on some displays */
+        .stApp h1 {font-size: 1.85rem; line-height: 1.2;}
+        .stDataFrame {padding-top: 0 !important;}
+        div[data-testid="stSidebar"] button {
+            text-align: center;
+            justify-content: center;
+        }
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
+    st.title("📊 股票分析儀表板")
+
+    # 本次執行的分段計時（結果顯示於側邊欄「效能」面板）；程序層級指標另由 /metrics 端點提供
+    perf_run = perf.start_run()
+    metrics_port = telemetry.start_metrics_server()
+
+    # 自選清單：由背景排程預先計算，開啟時直接讀取結果
+    watchlists.start_scheduler()
+    saved_lists = {wl.name: wl for wl in watchlists.list_watchlists()}
+    wl_choice = st.sidebar.selectbox("自選清單", ["（手動輸入）"] + list(saved_lists))
+    active_wl = saved_lists.get(wl_choice)
+
+    # Sidebar 輸入
+    symbols_str = st.sidebar.text_input(
+        "股票代碼（逗號分隔）",
+        value=", ".join(active_wl.symbols) if active_wl else "AAPL, MSFT, NVDA",
+        disabled=active_wl is not None,
+    )
+    time_period = st.sidebar.selectbox("查詢期間", ["1mo", "3mo", "6mo", "1y", "2y", "5y", "max"], index=3)
+    bar_interval = st.sidebar.selectbox(
+        "K 線間隔",
+        ["1d"] + INTRADAY_INTERVALS,
+        index=0,
+        help="分時資料受 Yahoo 回溯上限限制：" + "、".join(f"{k} 約 {v}" for k, v in INTRADAY_MAX_PERIOD.items()),
+    )
+    live_mode = st.sidebar.toggle("即時報價自動更新", value=False, help="只輪詢最新 K 棒並重算 P/E、P/B，不重新分析財報或爬取新聞")
+    live_every = st.sidebar.select_slider("更新頻率（秒）", options=[15, 30, 60, 120, 300], value=60, disabled=not live_mode)
+    rebase_mode = st.sidebar.radio("報酬率基準", ["各股首個交易日", "共同基準日"], horizontal=True)
+    rebase_anchor = None
+    if rebase_mode == "共同基準日":
+        rebase_anchor = st.sidebar.date_input("基準日", value=pd.Timestamp.today() - pd.DateOffset(months=6))
+    rule_files = available_rule_sets()
+    rule_choice = st.sidebar.selectbox(
+        "評分規則",
+        list(rule_files),
+        help="門檻定義於規則檔（" + "、".join(rule_files.values()) + "）；修改存檔後重新整理即套用，不需重新抓資料",
+    )
+
+    symbols = [s.strip().upper() for s in symbols_str.split(',') if s.strip()]
+
+    wl_snapshot = None
+    if active_wl is not None:
+        st.sidebar.caption(f"清單最後更新：{watchlists.age_text(active_wl.last_refreshed)}，每 {active_wl.refresh_minutes} 分鐘更新")
+        if active_wl.last_error:
+            st.sidebar.caption(f"上次更新有部分失敗：{active_wl.last_error[:200]}")
+        if st.sidebar.button("立即更新清單"):
+            with st.spinner("正在更新自選清單..."), perf.span("watchlist.refresh"):
+                watchlists.refresh_watchlist(active_wl.name)
+            st.rerun()
+        with perf.span("watchlist.load"):
+            wl_snapshot = watchlists.load_snapshot(active_wl)
+    with st.sidebar.expander("管理自選清單"):
+        wl_name = st.text_input("清單名稱", value=active_wl.name if active_wl else "")
+        wl_minutes = st.number_input("更新頻率（分鐘）", min_value=5, max_value=1440, step=5,
+                                     value=active_wl.refresh_minutes if active_wl else watchlists.DEFAULT_REFRESH_MINUTES)
+        wl_news = st.checkbox("一併預先爬取新聞", value=active_wl.include_news if active_wl else False, disabled=not show_news)
+        if st.button("儲存目前的股票代碼", disabled=not symbols):
+            try:
+                watchlists.save_watchlist(wl_name, symbols, period=time_period, refresh_minutes=wl_minutes, include_news=wl_news and show_news)
+                st.success(f"已儲存「{wl_name.strip()}」，背景排程將在 {watchlists.SCHEDULER_POLL_SECONDS} 秒內開始計算。")
+            except ValueError as e:
+                st.warning(str(e))
+        if active_wl is not None and st.button(f"刪除「{active_wl.name}」"):
+            watchlists.delete_watchlist(active_wl.name)
+            st.rerun()
+
+    if not symbols:
+        st.info("請在左側輸入至少一個股票代碼，例如：AAPL, MSFT")
+    else:
+        # 逐檔分析（跨 session 共用結果；多人同時查同一檔股票時只分析一次）
+        analysis_cache = get_shared_cache("analyze_stock", ttl=900)
+        if wl_snapshot is not None:
+            precomputed = wl_snapshot.analysis
+        else:
+            # 批次更新服務已算好的結果（期限內）直接採用
+            with perf.span("precomputed.load"):
+                precomputed = watchlists.load_results("analysis", symbols, max_age=watchlists.PRECOMPUTED_MAX_AGE)
+        # 預先計算結果的更新時間（顯示在綜合評分表下，避免把舊結果當成即時分析）
+        precomputed_at = watchlists.result_times("analysis", precomputed) if precomputed else {}
+        async_news = {}
+        if async_yahoo.ENABLED:
+            # 非同步資料層：快取中沒有的股票，其資料包、日線收盤價與新聞在同一個事件迴圈上一次抓齊，
+            # 寫入共用快取後，下面的逐檔流程與股價面板直接命中；失敗的股票照常逐檔重抓
+            def prefetch_many(syms):
+                with perf.span("async.prefetch", tickers=len(syms)):
+                    batch = async_yahoo.prefetch(syms, period=time_period if bar_interval == "1d" else None, news=show_news)
+                async_news.update(batch.news)
+                get_shared_cache(f"close:{time_period}:1d", ttl=900).put_many(batch.closes)
+                out = {}
+                for sym, bundle in batch.bundles.items():
+                    try:
+                        out[sym] = analyze_stock(sym, bundle=bundle)
+                    except Exception:
+                        pass  # 交給下面的逐檔流程重抓並顯示錯誤
+                return out
+
+            try:
+                analysis_cache.get_many([s for s in symbols if s not in precomputed], prefetch_many)
+            except Exception as e:
+                st.warning(f"非同步資料層抓取失敗，改為逐檔抓取: {e}")
+        all_details = {}
+        for symbol in symbols:
+            try:
+                with perf.span("analyze_stock", ticker=symbol):
+                    if symbol in precomputed:
+                        result = precomputed[symbol]
+                    else:
+                        result = analysis_cache.get_or_fetch(symbol, lambda: analyze_stock(symbol))
+                    details, total_score, suggestion, mode, stock, scores, fundamentals = result
+                all_details[symbol] = {
+                    "details": details,
+                    "total_score": total_score,
+                    "suggestion": suggestion,
+                    "mode": mode,
+                    # 結果庫中的舊版結果可能是整份資料包：在此轉換一次，繪圖與 PDF 直接使用紀錄
+                    "stock": as_record(stock),
+                    "scores": scores,
+                    "fundamentals": fundamentals,
+                }
+            except Exception as e:
+                st.error(f"無法分析股票 {symbol}: {e}")
+
+        # 以選定的規則重新評分（只用已計算的指標，向量化一次處理所有股票）
+        try:
+            rule_set = load_rule_set(rule_files[rule_choice])
+        except Exception as e:
+            st.warning(f"評分規則「{rule_choice}」載入失敗，改用預設規則: {e}")
+            rule_set = load_rule_set()
+        with perf.span("rescore"):
+            try:
+                all_details = rescore(all_details, rule_set)
+            except FileNotFoundError:
+                st.warning("尚未建立產業百分位表，暫以預設規則評分。請先執行：python -m stock_core.sector_percentiles --universe <股票池檔案>")
+                rule_set = load_rule_set()
+                all_details = rescore(all_details, rule_set)
+        if rule_set.basis == "sector_percentile":
+            sector_table = load_sector_table()
+            st.sidebar.caption(f"產業百分位表：{sector_table.built_at}，{sector_table.counts.get(ALL_SECTORS, 0)} 檔")
+
+        if not all_details:
+            st.warning("分析失敗，請更換股票代碼重試。")
+        else:
+            # 顏色對映
+            tickers = list(all_details.keys())
+            palette = qualitative.Plotly
+            color_map = {sym: palette[i % len(palette)] for i, sym in enumerate(tickers)}
+
+            # ===== 即時報價：定時輪詢最新 1 分鐘 K 棒，只重繪走勢圖與綜合評分表 =====
+            live_fundamentals = {sym: data["fundamentals"] for sym, data in all_details.items()}
+
+            def poll_live_bars() -> pd.DataFrame:
+                try:
+                    with perf.span("live_quotes.poll", tickers=len(live_fundamentals)):
+                        return poll_latest_bars(list(live_fundamentals.keys()), min_gap=live_every / 2)
+                except Exception as e:
+                    st.warning(f"即時報價更新失敗: {e}")
+                    return pd.DataFrame()
+
+            # ===== 股價走勢（可切換報酬率/價格） =====
+            hdr_left, hdr_right = st.columns([5, 3])
+            with hdr_right:
+                view_mode = st.radio(
+                    "切換視圖",
+                    ["報酬率", "價格"],
+                    horizontal=True,
+                    label_visibility="collapsed",
+                    key="price_returns_mode",
+                )
+            with hdr_left:
+                st.subheader("報酬率走勢" if view_mode == "報酬率" else "股價走勢")
+            close_panel = None
+            panel = None
+            try:
+                with perf.span("prices.load", interval=bar_interval, tickers=len(tickers)):
+                    if (
+                        wl_snapshot is not None
+                        and bar_interval == "1d"
+                        and time_period == active_wl.period
+                        and all(t in wl_snapshot.closes for t in tickers)
+                    ):
+                        # 自選清單已預先下載的收盤價
+                        panel = AlignedPanel(pd.concat({t: wl_snapshot.closes[t] for t in tickers}, axis=1))
+                    elif bar_interval == "1d":
+                        store_key = f"price_store_{time_period}"
+                        if store_key not in st.session_state:
+                            st.session_state[store_key] = PanelStore(period=time_period)
+                        price_store = st.session_state[store_key]
+                        panel = price_store.get(tickers)
+                        if isinstance(price_store.last_error, ThrottledError):
+                            st.warning("Yahoo 目前限流中，已停止重試；請稍後再重新整理。")
+                        elif price_store.last_error is not None:
+                            st.warning(f"部分股價資料下載失敗（已對缺少的股票批次重試）。原因: {price_store.last_error}")
+                    else:
+                        # 分時資料：共用的環狀緩衝區快取，只下載上次之後的新 K 棒
+                        intraday_df = get_bar_cache(bar_interval).close_panel(tickers, time_period)
+                        panel = AlignedPanel(intraday_df) if not intraday_df.empty else None
+                        st.caption(f"分時間隔 {bar_interval}（時間為 UTC）；期間上限 {INTRADAY_MAX_PERIOD[bar_interval]}")
+            except Exception as e:
+                st.warning(f"股價資料下載失敗: {e}")
+
+            def render_price_chart(panel: AlignedPanel):
+                try:
+                    with perf.span("chart.prices"):
+                        ret_df = panel.rebase(rebase_anchor) * 100.0
+                        px_df = panel.close
+
+                        # 以資料的實際最高/最低為基準決定報酬率軸範圍（避免被切掉）
+                        ret_min, ret_max = float(np.nanmin(ret_df.values)), float(np.nanmax(ret_df.values))
+                        rpad = (ret_max - ret_min) * 0.08 if ret_max > ret_min else 1.0
+                        r0, r1, ret_ticks = nice_ticks(ret_min - rpad, ret_max + rpad, nticks=6)
+                        ret_range = [r0, r1]
+
+                        # 價格軸同理：使用資料的最高/最低
+                        px_min, px_max = float(np.nanmin(px_df.values)), float(np.nanmax(px_df.values))
+                        ppad = (px_max - px_min) * 0.05 if px_max > px_min else 1.0
+                        p0, p1, px_ticks = nice_ticks(px_min - ppad, px_max + ppad, nticks=6)
+                        px_range = [p0, p1]
+
+                        fig = go.Figure()
+
+                        def add_set(df, is_returns: bool, visible: bool, show_legend: bool):
+                            for sym in df.columns:
+                                series = df[sym].dropna()
+                                if len(series) > 1:
+                                    ht = (f"{sym} : %{{y:.2f}}%<extra></extra>" if is_returns else f"{sym} : $%{{y:.2f}}<extra></extra>") if show_legend else None
+                                    hinfo = None if show_legend else 'skip'
+                                    fig.add_trace(go.Scatter(
+                                        x=series.index, y=series.values, name=sym,
+                                        mode='lines', connectgaps=True,
+                                        line=dict(color=color_map.get(sym)),
+                                        hovertemplate=ht,
+                                        visible=visible,
+                                        showlegend=show_legend,
+                                        hoverinfo=hinfo,
+                                    ))
+
+                        add_set(ret_df, True, True, True)
+                        add_set(px_df, False, False, False)
+
+                        yaxis_init = dict(
+                            title="變動 (%)",
+                            ticksuffix="%",
+                            tickformat=".2f",
+                            zeroline=True,
+                            zerolinecolor="#AAAAAA",
+                            title_standoff=12,
+                            automargin=False,
+                            autorange=False,
+                            fixedrange=True,
+                            range=ret_range,
+                            tickmode='array',
+                            tickvals=ret_ticks,
+                        )
+
+                        # 只計入實際畫出的序列（少於兩個點的股票不會有線）
+                        sym_list = [sym for sym in ret_df.columns if ret_df[sym].notna().sum() > 1]
+                        n = len(sym_list)
+                        ret_visible = [True]*n + [False]*n
+                        px_visible  = [False]*n + [True]*n
+                        ret_hoverinfo  = [None]*n + ['skip']*n
+                        px_hoverinfo   = ['skip']*n + [None]*n
+                        ret_legend     = [True]*n + [False]*n
+                        px_legend      = [False]*n + [True]*n
+                        ret_templates = [f"{sym} : %{{y:.2f}}%<extra></extra>" for sym in sym_list]
+                        px_templates  = [f"{sym} : $%{{y:.2f}}<extra></extra>" for sym in sym_list]
+                        ret_hovertmpl = ret_templates + [None]*n
+                        px_hovertmpl  = [None]*n + px_templates
+
+                        # Apply external toggle to figure instead of in-figure buttons
+                        show_returns = (view_mode == "報酬率")
+                        yaxis_cfg = (
+                            yaxis_init if show_returns else
+                            {"title": "股價 (USD)", "ticksuffix": "", "tickformat": ".2f", "zeroline": False, "title_standoff": 12, "automargin": False, "autorange": False, "fixedrange": True, "range": px_range, "tickmode": "array", "tickvals": px_ticks}
+                        )
+                        fig.update_layout(
+                            xaxis_title="日期",
+                            yaxis_title=yaxis_cfg.get("title"),
+                            legend_title="股票代碼",
+                            template="plotly_dark",
+                            hovermode="x unified",
+                            xaxis=dict(type='date', fixedrange=True),
+                            yaxis=yaxis_cfg,
+                            transition=dict(duration=0),
+                            uirevision="price_returns",
+                            margin=dict(l=80, r=20, t=40, b=40),
+                            dragmode='pan'
+                        )
+                        vis = ret_visible if show_returns else px_visible
+                        hoverinfo = ret_hoverinfo if show_returns else px_hoverinfo
+                        showlegend = ret_legend if show_returns else px_legend
+                        hovertmpl = ret_hovertmpl if show_returns else px_hovertmpl
+                        for i in range(len(fig.data)):
+                            fig.data[i].visible = vis[i]
+                            fig.data[i].hoverinfo = hoverinfo[i]
+                            fig.data[i].showlegend = showlegend[i]
+                            fig.data[i].hovertemplate = hovertmpl[i]
+                        st.plotly_chart(fig, width='stretch', config={"displayModeBar": False, "scrollZoom": False})
+                except Exception as e:
+                    st.warning(f"走勢圖繪製失敗: {e}")
+
+            if panel is not None and not panel.close.empty:
+                close_panel = panel.close
+                if live_mode:
+                    @st.fragment(run_every=live_every)
+                    def live_price_chart():
+                        # 最新 K 棒併入走勢圖（日線更新當日收盤，分時接上新 K 棒）
+                        render_price_chart(AlignedPanel(merge_live_bars(close_panel, poll_live_bars(), bar_interval)))
+                        st.caption(f"即時模式：每 {live_every} 秒併入最新 1 分鐘 K 棒。")
+
+                    live_price_chart()
+                else:
+                    render_price_chart(panel)
+
+            # ===== 相關係數 / 共變異數矩陣 =====
+            # 沿用走勢圖已批次下載的收盤價；追蹤器存於 session_state，增刪股票時只更新對應的列與欄
+            if close_panel is not None and close_panel.shape[1] >= 2:
+                st.subheader("相關係數矩陣")
+                try:
+                    with perf.span("correlation"):
+                        tracker_key = f"corr_tracker_{time_period}_{bar_interval}"
+                        if tracker_key not in st.session_state:
+                            st.session_state[tracker_key] = CorrelationTracker()
+                        tracker = st.session_state[tracker_key]
+                        tracker.sync(close_panel)
+                        order = [sym for sym in tickers if sym in tracker.symbols]
+                        corr_df = tracker.correlation().reindex(index=order, columns=order)
+                        cov_df = tracker.covariance().reindex(index=order, columns=order)
+                        corr_tab, cov_tab = st.tabs(["相關係數熱圖", "共變異數矩陣"])
+                        with corr_tab:
+                            heat_fig = go.Figure(go.Heatmap(
+                                z=corr_df.values,
+                                x=order,
+                                y=order,
+                                zmin=-1,
+                                zmax=1,
+                                colorscale="RdBu_r",
+                                texttemplate="%{z:.2f}" if len(order) <= 15 else None,
+                                hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>",
+                            ))
+                            heat_fig.update_layout(
+                                template="plotly_dark",
+                                yaxis=dict(autorange="reversed"),
+                                margin=dict(l=10, r=10, t=10, b=10),
+                                height=min(900, 160 + 28 * len(order)),
+                            )
+                            st.plotly_chart(heat_fig, width='stretch', config={"displayModeBar": False})
+                        with cov_tab:
+                            st.dataframe(cov_df.style.format("{:.6f}"), width='stretch')
+                            st.caption("以日報酬計算；缺值採兩兩配對（pairwise）處理。")
+                except Exception as e:
+                    st.warning(f"相關係數矩陣計算失敗: {e}")
+
+            # ===== 綜合評分比較 & 合併雷達比較（雙欄） =====
+            left, right = st.columns([1.2, 1])
+            with left:
+                st.subheader("綜合評分比較")
+                summary_data = []
+                for symbol, data in all_details.items():
+                    row = {"股票代碼": symbol, "總分": data["total_score"], "投資建議": data["suggestion"], "股組類型": data["mode"]}
+                    # details: [指標, 口徑, 數值, 評級, 解釋]
+                    for detail_item in data["details"]:
+                        try:
+                            row[detail_item[0]] = detail_item[2]
+                        except Exception:
+                            pass
+                    summary_data.append(row)
+                summary_df = pd.DataFrame(summary_data)
+                # 指標欄維持 float（舊版快取結果為字串，一併轉成數值），排序依數值；格式只在顯示時套用
+                metric_cols = [c for c in summary_df.columns if c not in ("股票代碼", "總分", "投資建議", "股組類型")]
+                summary_df[metric_cols] = summary_df[metric_cols].apply(pd.to_numeric, errors="coerce").astype(float)
+
+                def render_summary(df: pd.DataFrame):
+                    st.dataframe(
+                        df,
+                        width='stretch',
+                        height=min(400, 60 + 32 * len(df)),
+                        hide_index=True,
+                        column_config={
+                            "總分": st.column_config.NumberColumn("總分", format="%d"),
+                            **{c: st.column_config.NumberColumn(c, format="%.2f") for c in metric_cols},
+                        },
+                    )
+
+                if live_mode:
+                    @st.fragment(run_every=live_every)
+                    def live_summary():
+                        # 只重算 P/E、P/B 兩格；總分與評級維持分析時的結果
+                        render_summary(apply_live_metrics(summary_df, live_fundamentals, poll_live_bars()))
+                        st.caption("即時模式：P/E、P/B 以最新價格搭配分析時的 EPS / 每股淨值計算；總分與評級不變。")
+
+                    live_summary()
+                else:
+                    render_summary(summary_df)
+                stale = {sym: ts for sym, ts in precomputed_at.items() if sym in all_details}
+                if stale:
+                    st.caption(
+                        f"⏱ {len(stale)} 檔採用批次預先計算的結果（最舊：{watchlists.age_text(min(stale.values()))}）："
+                        + "、".join(stale)
+                    )
+
+                st.caption("""
+                **股組類型分類標準:** (符合以下任兩項)
+                - **VALUE (價值股):** P/E < 20, P/B < 2, EPS > 3
+                - **GROWTH (成長股):** P/E > 40, P/B > 4, EPS < 1
+                - **MIX (混合型):** 不完全符合上述任一標準的股票
+                """)
+
+                # 指標口徑說明
+                st.caption("""
+                **指標口徑說明:**
+                - **TTM (Trailing Twelve Months):** 近四季合計，最貼近「近一年」。
+                - **NTM (Next Twelve Months):** 未來十二個月預估（分析師預期）。
+                - **FY (Fiscal Year):** 最近完整會計年度。
+                - **MRQ (Most Recent Quarter):** 最近一季的時點數值（快照）。
+                """)
+
+            with right:
+                st.subheader("財務雷達比較（多股票疊加）")
+                try:
+                    with perf.span("chart.radar"):
+                        categories = ["EPS", "ROE", "P/E", "P/B", "淨利率"]
+                        radar_fig = go.Figure()
+                        traces_data = []
+                        for symbol, data in all_details.items():
+                            values = [data["scores"].get(cat) or 0 for cat in categories]
+                            total = sum(values)
+                            traces_data.append((total, symbol, values))
+                        traces_data.sort(reverse=True)
+                        for _, symbol, values in traces_data:
+                            col = color_map.get(symbol)
+                            radar_fig.add_trace(go.Scatterpolar(
+                                r=values + [values[0]],
+                                theta=categories + [categories[0]],
+                                fill='toself',
+                                name=symbol,
+                                line=dict(color=col, width=2.0),
+                                marker=dict(size=2, color=col),
+                                fillcolor=hex_to_rgba(col or '#1f77b4', 0.08)
+                            ))
+                        radar_fig.update_layout(
+                            polar=dict(
+                                domain={'x': [0.15, 0.85], 'y': [0.15, 0.85]},
+                                radialaxis=dict(visible=True, range=[0, rule_set.max_score], showticklabels=False, ticks=''),
+                                angularaxis=dict(ticks='', tickfont=dict(size=11))
+                            ),
+                            template="plotly_dark",
+                            showlegend=True,
+                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                            margin=dict(l=10, r=10, t=10, b=0),
+                            height=360
+                        )
+                        st.plotly_chart(radar_fig, width='stretch', config={"displayModeBar": False})
+                except Exception as e:
+                    st.warning(f"雷達圖比較繪製失敗: {e}")
+
+            # ===== PDF 報告（分析完成即在背景產生，依內容雜湊快取） =====
+            pdf_charts = st.sidebar.checkbox("PDF 附圖表", value=True)
+            try:
+                with perf.span("pdf.submit", charts=pdf_charts) as pdf_span:
+                    pdf_key, pdf_job = submit_pdf_report(all_details, summary_df, include_charts=pdf_charts, rules=rule_set)
+                    if pdf_job.done():
+                        pdf_span.hit()
+                    else:
+                        pdf_span.miss()
+                    if pdf_job.done() and pdf_job.exception() is not None:
+                        raise pdf_job.exception()
+                    st.sidebar.download_button(
+                        label="下載PDF報告" if pdf_job.done() else "下載PDF報告（背景產生中）",
+                        # 尚未完成時傳入 callable：點擊時才等待背景工作結果，不阻塞本次執行
+                        data=pdf_job.result() if pdf_job.done() else pdf_job.result,
+                        file_name=f"stock_analysis_report_{pd.Timestamp.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf",
+                        on_click="ignore",
+                        key=f"download_pdf_{pdf_key[:12]}",
+                    )
+            except ReportlabMissingError:
+                st.sidebar.error("需要安裝 reportlab 才能生成 PDF。")
+                st.sidebar.info("請在終端安裝: pip install reportlab")
+            except Exception as e:
+                st.sidebar.error(f"PDF 生成失敗: {e}")
+
+            # ===== 欄式匯出（Parquet / Arrow；數值保留原始精度，供下游分析） =====
+            try:
+                with perf.span("export.table", symbols=len(all_details)):
+                    result_tbl = results_table(all_details, rule_set=rule_set.name)
+                stamp = pd.Timestamp.now().strftime('%Y%m%d')
+                exp_c1, exp_c2 = st.sidebar.columns(2)
+                exp_c1.download_button(
+                    label="匯出 Parquet",
+                    data=lambda: to_parquet_bytes(result_tbl),
+                    file_name=f"stock_analysis_{stamp}.parquet",
+                    mime="application/vnd.apache.parquet",
+                    on_click="ignore",
+                )
+                exp_c2.download_button(
+                    label="匯出 Arrow",
+                    data=lambda: to_arrow_bytes(result_tbl),
+                    file_name=f"stock_analysis_{stamp}.arrow",
+                    mime="application/vnd.apache.arrow.file",
+                    on_click="ignore",
+                )
+                if st.sidebar.button("寫入歷史結果資料集", help=f"依日期分區附加到 {RESULTS_DATASET_DIR}（同一份結果重複寫入不會產生重複列）"):
+                    written = append_to_dataset(result_tbl)
+                    st.sidebar.success(f"已寫入 {result_tbl.num_rows} 列（{len(written)} 個檔案）")
+            except RuntimeError as e:
+                st.sidebar.error(str(e))
+                st.sidebar.info("請在終端安裝: pip install pyarrow")
+            except Exception as e:
+                st.sidebar.error(f"結果匯出失敗: {e}")
+
+            # ===== 投資組合回測 =====
+            if close_panel is not None and not close_panel.empty:
+                with st.expander("投資組合回測（依評分建立組合）"):
+                    ladder = rule_set.suggestion_ladder
+                    present = [sug for sug in ladder if any(d["suggestion"] == sug for d in all_details.values())]
+                    freq_map = {"每月": "M", "每季": "Q", "每週": "W", "每年": "Y", "每日": "D", "不再平衡": None}
+                    bt_c1, bt_c2, bt_c3 = st.columns([1, 1, 2])
+                    with bt_c1:
+                        bt_scheme = st.radio("權重方式", ["分數加權", "等權重"], horizontal=True, key="bt_scheme")
+                    with bt_c2:
+                        bt_freq = st.selectbox("再平衡頻率", list(freq_map.keys()), key="bt_freq")
+                    with bt_c3:
+                        bt_suggest = st.multiselect("納入的投資建議", present, default=present)
+                    try:
+                        with perf.span("backtest"):
+                            bt_weights = weights_from_scores(
+                                all_details,
+                                scheme="score" if bt_scheme == "分數加權" else "equal",
+                                suggestions=bt_suggest,
+                            )
+                            if bt_weights.empty:
+                                st.info("沒有符合條件的股票可建立組合。")
+                            else:
+                                bt = run_backtest(
+                                    close_panel,
+                                    bt_weights,
+                                    rebalance=freq_map[bt_freq],
+                                    periods_per_year=252 * BARS_PER_DAY.get(bar_interval, 1),
+                                )
+                                stats = bt["stats"]
+                                m1, m2, m3, m4, m5 = st.columns(5)
+                                m1.metric("總報酬", f"{stats['total_return']:.2%}")
+                                m2.metric("年化報酬", f"{stats['annual_return']:.2%}")
+                                m3.metric("年化波動", f"{stats['annual_volatility']:.2%}")
+                                m4.metric("最大回撤", f"{stats['max_drawdown']:.2%}")
+                                m5.metric("年化換手率", f"{stats['annual_turnover']:.2%}")
+                                bt_fig = go.Figure(go.Scatter(
+                                    x=bt["value"].index,
+                                    y=bt["value"].values,
+                                    mode='lines',
+                                    name="組合淨值",
+                                    hovertemplate="%{x|%Y-%m-%d} : %{y:.4f}<extra></extra>",
+                                ))
+                                bt_fig.update_layout(
+                                    template="plotly_dark",
+                                    xaxis_title="日期",
+                                    yaxis_title="組合淨值（期初 = 1）",
+                                    margin=dict(l=10, r=10, t=10, b=10),
+                                    height=320,
+                                )
+                                st.plotly_chart(bt_fig, width='stretch', config={"displayModeBar": False})
+                                st.caption("權重：" + "、".join(f"{sym} {wt:.1%}" for sym, wt in bt_weights.items()))
+                    except Exception as e:
+                        st.warning(f"回測失敗: {e}")
+
+            # ===== 情境分析（股價 × 盈餘衝擊） =====
+            with st.expander("情境分析（股價 × 盈餘衝擊）"):
+                wi_c1, wi_c2, wi_c3 = st.columns([2, 2, 1])
+                with wi_c1:
+                    wi_price = st.slider("股價衝擊範圍（%）", -90, 200, (-50, 50), step=5, key="wi_price")
+                with wi_c2:
+                    wi_earn = st.slider("盈餘衝擊範圍（%）", -90, 200, (-50, 50), step=5, key="wi_earn")
+                with wi_c3:
+                    wi_steps = st.select_slider("格點數", options=[11, 21, 51], value=21, key="wi_steps")
+                try:
+                    with perf.span("whatif"):
+                        wi = run_whatif(
+                            all_details,
+                            rule_set,
+                            price_shocks=np.linspace(wi_price[0], wi_price[1], wi_steps) / 100.0,
+                            earnings_shocks=np.linspace(wi_earn[0], wi_earn[1], wi_steps) / 100.0,
+                        )
+                    wi_x = [f"{v:+.0%}" for v in wi.price_shocks]
+                    wi_y = [f"{v:+.0%}" for v in wi.earnings_shocks]
+                    wi_tab1, wi_tab2 = st.tabs(["個股總分", "建議變化"])
+                    with wi_tab1:
+                        wi_sym = st.selectbox("股票", wi.tickers, key="wi_symbol")
+                        idx = wi.tickers.index(wi_sym)
+                        wi_fig = go.Figure(go.Heatmap(
+                            z=wi.total[idx],
+                            x=wi_x,
+                            y=wi_y,
+                            zmin=0,
+                            zmax=rule_set.max_total,
+                            colorscale="RdYlGn",
+                            customdata=wi.suggestions(wi_sym),
+                            hovertemplate="股價 %{x}、盈餘 %{y}<br>總分 %{z}<br>%{customdata}<extra></extra>",
+                        ))
+                        wi_fig.update_layout(
+                            template="plotly_dark",
+                            xaxis_title="股價衝擊",
+                            yaxis_title="盈餘衝擊",
+                            margin=dict(l=10, r=10, t=10, b=10),
+                            height=420,
+                        )
+                        st.plotly_chart(wi_fig, width='stretch', config={"displayModeBar": False})
+                        st.caption(f"基準：總分 {wi.base_total[idx]}、{wi.labels[wi.base_rank[idx]]}；盈餘衝擊視為淨利等比例變動（EPS、ROE、淨利率同步），股型依衝擊後指標重新分類。")
+                    with wi_tab2:
+                        chg_fig = go.Figure(go.Heatmap(
+                            z=wi.changed_count(),
+                            x=wi_x,
+                            y=wi_y,
+                            zmin=0,
+                            zmax=len(wi.tickers),
+                            colorscale="Oranges",
+                            hovertemplate="股價 %{x}、盈餘 %{y}<br>建議改變 %{z} 檔<extra></extra>",
+                        ))
+                        chg_fig.update_layout(
+                            template="plotly_dark",
+                            xaxis_title="股價衝擊",
+                            yaxis_title="盈餘衝擊",
+                            margin=dict(l=10, r=10, t=10, b=10),
+                            height=420,
+                        )
+                        st.plotly_chart(chg_fig, width='stretch', config={"displayModeBar": False})
+                        sc1, sc2 = st.columns(2)
+                        with sc1:
+                            pick_p = st.select_slider("股價衝擊", options=list(wi.price_shocks), value=wi.price_shocks[len(wi.price_shocks) // 2], format_func=lambda v: f"{v:+.0%}", key="wi_pick_p")
+                        with sc2:
+                            pick_e = st.select_slider("盈餘衝擊", options=list(wi.earnings_shocks), value=wi.earnings_shocks[len(wi.earnings_shocks) // 2], format_func=lambda v: f"{v:+.0%}", key="wi_pick_e")
+                        st.write("建議轉移（列：目前、欄：情境）")
+                        st.dataframe(wi.transitions(pick_e, pick_p), width='stretch')
+                except FileNotFoundError:
+                    st.info("產業百分位規則需要先建立百分位表，才能進行情境分析。")
+                except Exception as e:
+                    st.warning(f"情境分析失敗: {e}")
+
+            # ===== 個股詳細分析 =====
+            st.subheader("個股詳細分析")
+            for symbol, data in all_details.items():
+                with perf.span("detail", ticker=symbol), st.expander(f"查看 {symbol} 的詳細資料"):
+                    col1, col2 = st.columns(2)
+
+                    with col1:
+                        st.write(f"#### {symbol} 評分指標")
+                        df = pd.DataFrame(data["details"], columns=["指標", "口徑", "數值", "評級", "解釋"])
+                        df["數值"] = pd.to_numeric(df["數值"], errors="coerce").astype(float)
+                        st.dataframe(
+                            df,
+                            width='stretch',
+                            hide_index=True,
+                            column_config={
+                                "數值": st.column_config.NumberColumn("數值", format="%.2f"),
+                                "評級": st.column_config.TextColumn(
+                                    "評級",
+                                    help=rule_set.help_markdown(),
+                                )
+                            }
+                        )
+                        st.write(f"**✅ 總分: {data['total_score']} / {rule_set.max_total}**")
+                        st.write(f"**📝 投資建議: {data['suggestion']}**")
+                        st.write(f"**📈 股組類型: {data['mode']}**")
+
+                    with col2:
+                        st.write(f"#### {symbol} 財務雷達圖")
+                        try:
+                            categories = ["EPS", "ROE", "P/E", "P/B", "淨利率"]
+                            values = [data["scores"].get(cat) or 0 for cat in categories]
+                            fig2 = go.Figure()
+                            col = color_map.get(symbol, '#1f77b4')
+                            fig2.add_trace(go.Scatterpolar(
+                                r=values + [values[0]],
+                                theta=categories + [categories[0]],
+                                fill='toself',
+                                name=symbol,
+                                line=dict(width=2.6, color=col),
+                                marker=dict(size=4, color=col),
+                                fillcolor=hex_to_rgba(col, 0.18),
+                            ))
+                            fig2.update_layout(
+                                polar=dict(radialaxis=dict(visible=True, range=[0, rule_set.max_score], showticklabels=False, ticks='')),
+                                showlegend=False,
+                                template="plotly_dark",
+                            )
+                            st.plotly_chart(fig2, width='stretch', config={"displayModeBar": False, "staticPlot": True, "scrollZoom": False})
+                        except Exception as e:
+                            st.warning(f"無法繪製 {symbol} 的雷達圖: {e}")
+
+                    st.write("---")
+                    st.write(f"#### {symbol} 財務圖表")
+                    render_statement_charts(symbol, data["stock"], color_map.get(symbol, '#1f77b4'))
+
+                    if show_news:
+                        st.write("---")
+                        st.write(f"#### {symbol} 最新新聞 (Yahoo News)")
+                        if wl_snapshot is not None and symbol in wl_snapshot.news:
+                            news_list = wl_snapshot.news[symbol]
+                        elif symbol in async_news:
+                            news_list = async_news[symbol]
+                        else:
+                            from .news_scraper import scrape_news_headlines
+                            with st.spinner("正在爬取新聞..."), perf.span("news.scrape", ticker=symbol):
+                                news_list = scrape_news_headlines(symbol, company_name=data["fundamentals"].get("name"))
+                        if news_list:
+                            for idx, (title, url) in enumerate(news_list, 1):
+                                st.markdown(f"{idx}. [{title}]({url})")
+                        else:
+                            st.warning("找不到相關新聞或爬取失敗。")
+
+    # ===== 參考文獻 =====
+    with st.sidebar.expander("評分方法論與參考文獻"):
+        st.markdown("""
+        本儀表板的評分模型與財務指標分析，其方法論主要基於以下經典財務管理、投資學及證券分析文獻的理論框架。這些標準旨在提供一個快速、量化的篩選工具，而非取代深入的個案分析。
+
+        **核心理論依據:**
+        - **價值投資 (Value Investing):** 承襲葛拉漢 (Graham) 的概念，強調公司的內在價值，關注如低本益比 (P/E)、低股價淨值比 (P/B) 等指標，尋找價格被市場低估的標的。
+        - **成長投資 (Growth Investing):** 關注具有高成長潛力的公司，看重股東權益報酬率 (ROE)、淨利率 (Profit Margin) 等反映公司獲利能力與效率的指標。
+        - **財務報表分析 (Financial Statement Analysis):** 透過解析財務報表（損益表、資產負債表）的關鍵數據，評估公司的財務健康狀況與經營績效。
+
+        **參考書目 (References):**
+        - Brigham, E. F., & Ehrhardt, M. C. (2016). *Financial Management: Theory & Practice* (15th ed.). Cengage Learning.
+        - CFA Institute. (2020). *Equity Asset Valuation* (CFA Program Curriculum, Level II). Wiley.
+        - Damodaran, A. (2012). *Investment Valuation: Tools and Techniques for Determining the Value of Any Asset* (3rd ed.). Wiley.
+        - Graham, B. (1949). *The Intelligent Investor*. Harper & Brothers.
+        - Graham, B., & Dodd, D. L. (1934). *Security Analysis*. McGraw-Hill.
+        - Penman, S. H. (2012). *Financial Statement Analysis and Security Valuation* (5th ed.). McGraw-Hill.
+        - Subramanyam, K. R. (2014). *Financial Statement Analysis* (11th ed.). McGraw-Hill.
+        """)
+
+    # ===== 效能面板（各階段耗時、快取命中 / 未命中、下載量；可匯出 JSON） =====
+    perf_history = st.session_state.setdefault("perf_history", [])
+    perf_history.append(perf_run.to_dict())
+    telemetry.PAGE_RUNS.inc()
+    telemetry.PAGE_RUN_SECONDS.observe(perf_run.elapsed_ms() / 1000.0)
+    del perf_history[:-perf.HISTORY_RUNS]
+    with st.sidebar.expander("效能"):
+        st.metric("本次執行", f"{perf_run.elapsed_ms():.0f} ms")
+        perf_summary = perf_run.summary()
+        if perf_summary.empty:
+            st.caption("尚無計時資料")
+        else:
+            st.dataframe(perf_summary, width='stretch', hide_index=True)
+            slowest = perf_run.to_frame().nlargest(10, "duration_ms")
+            st.caption("最慢的 10 個區段")
+            st.dataframe(
+                slowest.reindex(columns=["name", "ticker", "duration_ms", "cache_hits", "cache_misses", "bytes"]),
+                width='stretch',
+                hide_index=True,
+            )
+        st.download_button(
+            "匯出 JSON",
+            data=perf.export_json(perf_history),
+            file_name="perf_profile.json",
+            mime="application/json",
+            on_click="ignore",
+        )
+        if metrics_port:
+            st.caption(f"Prometheus 指標：http://127.0.0.1:{metrics_port}/metrics")
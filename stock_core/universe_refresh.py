@@ -0,0 +1,315 @@
+# stock_core/universe_refresh.py
+# 股票池批次更新服務（獨立程序執行，不在 Streamlit 內）：
+# 多個工作程序從同一個佇列領取待處理的股票批次（做完就再領，快的程序自然多做），
+# 更新基本面分析、收盤價與評分並寫入本機結果庫；每完成一批寫入檢查點，中斷後可從未完成的股票接續
+
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from . import rate_limit
+from .result_export import append_to_dataset, results_table
+from .scoring_rules import load_rule_set
+from .sector_percentiles import build_sector_table, metrics_frame, save_sector_table
+from .watchlists import load_results, store_results
+
+CHUNK_SIZE = 10
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+CHECKPOINT_DIR = os.path.join(".cache", "universe_runs")
+# 工作程序全部結束後，等待佇列中剩餘結果的秒數
+DRAIN_SECONDS = 2.0
+# 單一批次的處理上限（秒）：超過即終止該工作程序、整批記為失敗，另起一個工作程序接手其餘批次
+CHUNK_TIMEOUT = float(os.environ.get("UNIVERSE_CHUNK_TIMEOUT", "900"))
+ANALYSIS_FIELDS = ("details", "total_score", "suggestion", "mode", "stock", "scores", "fundamentals")
+
+
+def read_universe(path: str) -> list[str]:
+    """股票池檔案：每行一個代碼，# 開頭為註解。"""
+    with open(path, encoding="utf-8") as f:
+        return [line.split("#")[0].strip().upper() for line in f if line.split("#")[0].strip()]
+
+
+@dataclass
+class RunReport:
+    run_id: str
+    total: int
+    done: int = 0
+    resumed: int = 0  # 上次中斷前已完成、本次略過的股票數
+    failed: dict = field(default_factory=dict)  # symbol -> 錯誤訊息
+    unfinished: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def tickers_per_min(self) -> float:
+        processed = self.done - self.resumed + len(self.failed)
+        return processed / self.elapsed * 60.0 if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "total": self.total,
+            "done": self.done,
+            "resumed": self.resumed,
+            "failed": self.failed,
+            "unfinished": self.unfinished,
+            "elapsed_s": round(self.elapsed, 2),
+            "tickers_per_min": round(self.tickers_per_min, 2),
+        }
+
+    def summary(self) -> str:
+        lines = [
+            f"[{self.run_id}] 完成 {self.done}/{self.total} 檔（其中 {self.resumed} 檔沿用上次進度）、"
+            f"失敗 {len(self.failed)} 檔、未完成 {len(self.unfinished)} 檔；"
+            f"耗時 {self.elapsed:.1f} 秒，{self.tickers_per_min:.1f} 檔/分鐘"
+        ]
+        for sym, err in list(self.failed.items())[:20]:
+            lines.append(f"  失敗 {sym}: {err[:160]}")
+        if len(self.failed) > 20:
+            lines.append(f"  …另有 {len(self.failed) - 20} 檔失敗")
+        return "\n".join(lines)
+
+
+# ===== 檢查點 =====
+def _universe_hash(universe: list[str], period: str) -> str:
+    return hashlib.sha256(json.dumps([sorted(universe), period]).encode()).hexdigest()[:16]
+
+
+def _save_checkpoint(ckpt: dict) -> None:
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = os.path.join(CHECKPOINT_DIR, f"{ckpt['run_id']}.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ckpt, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _latest_incomplete(universe_hash: str) -> dict | None:
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return None
+    for fname in sorted(os.listdir(CHECKPOINT_DIR), reverse=True):
+        if not fname.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(CHECKPOINT_DIR, fname), encoding="utf-8") as f:
+                ckpt = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if ckpt.get("universe_hash") == universe_hash and not ckpt.get("complete"):
+            return ckpt
+    return None
+
+
+# ===== 工作程序 =====
+def _process_chunk(chunk: list[str], period: str) -> dict:
+    from .analysis import analyze_stock
+    from .price_panel import download_close_panel
+
+    analysis, failed = {}, {}
+    for symbol in chunk:
+        try:
+            analysis[symbol] = analyze_stock(symbol)
+        except Exception as e:
+            failed[symbol] = str(e) or type(e).__name__
+    closes = {}
+    try:
+        close_df, _ = download_close_panel(chunk, period)
+        for symbol in close_df.columns:
+            series = close_df[symbol].dropna()
+            if not series.empty:
+                closes[symbol] = series
+    except Exception as e:
+        print(f"收盤價下載失敗（{', '.join(chunk)}）: {e}")
+    return {"chunk": chunk, "analysis": analysis, "closes": closes, "failed": failed}
+
+
+def _worker(tasks, results, period: str, workers: int) -> None:
+    # 每個程序各有一個權杖桶；平分總速率，讓整個工作池合計仍守住 YAHOO_RATE_PER_SEC
+    rate_limit.YAHOO_BUCKET = rate_limit.TokenBucket(
+        rate_limit.YAHOO_RATE / workers, max(1.0, rate_limit.YAHOO_BURST / workers)
+    )
+    name = mp.current_process().name
+    while True:
+        try:
+            chunk = tasks.get(timeout=0.5)
+        except queue.Empty:
+            return
+        # 先回報開始處理哪一批，主程序據此判斷逾時
+        results.put({"worker": name, "started": chunk})
+        try:
+            out = _process_chunk(chunk, period)
+        except Exception as e:
+            out = {"chunk": chunk, "analysis": {}, "closes": {}, "failed": {s: str(e) for s in chunk}}
+        results.put({"worker": name, **out})
+
+
+def run_refresh(
+    universe: list[str],
+    period: str = "1y",
+    workers: int = DEFAULT_WORKERS,
+    resume: bool = True,
+    rebuild_sector_table: bool = True,
+    export_results: bool = True,
+    chunk_timeout: float = CHUNK_TIMEOUT,
+) -> RunReport:
+    """更新整個股票池；resume=True 時接續同一股票池最近一次未完成的執行。
+
+    全部完成後以本次股票池的結果重建產業百分位表（rebuild_sector_table=False 可略過），
+    並把評分結果附加到歷史結果資料集（export_results=False 可略過）。
+    單一批次超過 chunk_timeout 秒仍未完成時終止該工作程序，整批記為失敗，其餘批次照常處理。
+    """
+    universe = list(dict.fromkeys(s.strip().upper() for s in universe if s.strip()))
+    uhash = _universe_hash(universe, period)
+    ckpt = _latest_incomplete(uhash) if resume else None
+    if ckpt is None:
+        ckpt = {
+            "run_id": time.strftime("%Y%m%d-%H%M%S"),
+            "universe_hash": uhash,
+            "period": period,
+            "total": len(universe),
+            "done": [],
+            "failed": {},
+            "complete": False,
+        }
+    done = set(ckpt["done"])
+    report = RunReport(ckpt["run_id"], len(universe), resumed=len(done))
+    pending = [s for s in universe if s not in done]
+    chunks = [pending[i:i + CHUNK_SIZE] for i in range(0, len(pending), CHUNK_SIZE)]
+    print(f"[{report.run_id}] 股票池 {len(universe)} 檔，待處理 {len(pending)} 檔（{len(chunks)} 批、{workers} 個工作程序）")
+
+    t0 = time.perf_counter()
+    if chunks:
+        tasks, results = mp.Queue(), mp.Queue()
+        for chunk in chunks:
+            tasks.put(chunk)
+        procs: dict[str, mp.Process] = {}
+        serial = itertools.count()
+
+        def spawn() -> None:
+            name = f"universe-worker-{next(serial)}"
+            proc = mp.Process(target=_worker, args=(tasks, results, period, workers), name=name, daemon=True)
+            proc.start()
+            procs[name] = proc
+
+        for _ in range(max(1, min(workers, len(chunks)))):
+            spawn()
+
+        received, idle_since = 0, None
+        running = {}  # 工作程序名稱 -> (處理中的批次, 開始時間)
+        while received < len(chunks):
+            # 卡住（仍存活但超時）的工作程序：終止、整批記為失敗，另起一個接手佇列中的其餘批次
+            now = time.monotonic()
+            for name in [n for n, (_, started) in running.items() if now - started > chunk_timeout]:
+                chunk, _ = running.pop(name)
+                procs.pop(name).terminate()
+                received += 1
+                ckpt["failed"].update({sym: f"逾時：超過 {chunk_timeout:.0f} 秒未完成，已終止工作程序" for sym in chunk})
+                _save_checkpoint(ckpt)
+                print(f"[{report.run_id}] 批次逾時（{', '.join(chunk)}），已終止 {name}")
+                if received < len(chunks):
+                    spawn()
+            if received >= len(chunks):
+                break
+            try:
+                out = results.get(timeout=0.5)
+            except queue.Empty:
+                # 工作程序都結束了（含異常終止）：再等一下佇列中的剩餘結果，之後的股票留待下次接續
+                if not any(p.is_alive() for p in procs.values()):
+                    idle_since = idle_since or time.monotonic()
+                    if time.monotonic() - idle_since > DRAIN_SECONDS:
+                        break
+                continue
+            if "started" in out:
+                if out["worker"] in procs:
+                    running[out["worker"]] = (out["started"], time.monotonic())
+                continue
+            if out["worker"] not in procs:
+                continue  # 已因逾時終止的工作程序在終止前送出的結果：該批已記為失敗
+            running.pop(out["worker"], None)
+            received += 1
+            store_results("analysis", out["analysis"])
+            store_results(f"close:{period}", out["closes"])
+            done.update(out["analysis"])
+            ckpt["done"] = sorted(done)
+            for sym in out["analysis"]:
+                ckpt["failed"].pop(sym, None)
+            ckpt["failed"].update(out["failed"])
+            _save_checkpoint(ckpt)
+            print(f"[{report.run_id}] 進度 {len(done)}/{len(universe)}，失敗 {len(ckpt['failed'])}")
+        for p in procs.values():
+            p.join(timeout=5)
+
+    report.elapsed = time.perf_counter() - t0
+    report.done = len(done)
+    report.failed = dict(ckpt["failed"])
+    report.unfinished = [s for s in universe if s not in done and s not in report.failed]
+    ckpt["complete"] = not report.unfinished
+    ckpt["report"] = report.to_dict()
+    _save_checkpoint(ckpt)
+
+    if ckpt["complete"] and done and (rebuild_sector_table or export_results):
+        analysis = load_results("analysis", sorted(done))
+        if rebuild_sector_table:
+            table = build_sector_table(metrics_frame({sym: result[-1] for sym, result in analysis.items()}))
+            print(f"已更新產業百分位表：{save_sector_table(table)}")
+        if export_results:
+            try:
+                all_details = {sym: dict(zip(ANALYSIS_FIELDS, result)) for sym, result in analysis.items()}
+                written = append_to_dataset(results_table(all_details, rule_set=load_rule_set().name))
+                print(f"已寫入歷史結果資料集：{len(written)} 個檔案")
+            except RuntimeError as e:
+                print(f"略過結果匯出：{e}")
+    return report
+
+
+def _seconds_until(hhmm: str) -> float:
+    now = pd.Timestamp.now()
+    target = now.normalize() + pd.Timedelta(hhmm + ":00")
+    if target <= now:
+        target += pd.Timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="股票池批次更新（基本面、收盤價、評分）")
+    parser.add_argument("tickers", nargs="*", help="股票代碼（可與 --universe 併用）")
+    parser.add_argument("--universe", default=os.environ.get("UNIVERSE_FILE"), help="股票池檔案（每行一個代碼）")
+    parser.add_argument("--period", default="1y", help="收盤價期間（預設 1y）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"工作程序數（預設 {DEFAULT_WORKERS}）")
+    parser.add_argument("--no-resume", action="store_true", help="不接續上次未完成的執行")
+    parser.add_argument("--no-sector-table", action="store_true", help="完成後不重建產業百分位表（只有指定 --universe 時才會重建）")
+    parser.add_argument("--no-export", action="store_true", help="完成後不寫入歷史結果資料集（Parquet）")
+    parser.add_argument("--chunk-timeout", type=float, default=CHUNK_TIMEOUT, help=f"單一批次的處理上限秒數，逾時即終止該工作程序並記為失敗（預設 {CHUNK_TIMEOUT:.0f}）")
+    parser.add_argument("--at", metavar="HH:MM", help="每天於指定時間（本機時間）執行，不指定則只執行一次")
+    args = parser.parse_args(argv)
+
+    universe = list(args.tickers)
+    if args.universe:
+        universe += read_universe(args.universe)
+    if not universe:
+        parser.error("請指定股票代碼或 --universe")
+
+    while True:
+        if args.at:
+            wait = _seconds_until(args.at)
+            print(f"下次執行：{args.at}（{wait / 3600:.1f} 小時後）")
+            time.sleep(wait)
+        report = run_refresh(
+            universe,
+            period=args.period,
+            workers=max(1, args.workers),
+            resume=not args.no_resume,
+            rebuild_sector_table=bool(args.universe) and not args.no_sector_table,
+            export_results=not args.no_export,
+            chunk_timeout=args.chunk_timeout,
+        )
+        print(report.summary())
+        if not args.at:
+            break
@@ -0,0 +1,317 @@
+# stock_core/watchlists.py
+# 自選清單：清單與預先計算的結果（分析、收盤價、新聞）存在本機 SQLite，
+# 背景排程依各清單的更新頻率重新計算；開啟清單時直接讀取結果，不必等待即時分析
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from . import perf
+from . import telemetry
+
+WATCHLIST_DB = os.environ.get("WATCHLIST_DB", os.path.join(".cache", "watchlists.sqlite3"))
+DEFAULT_REFRESH_MINUTES = 60
+# 排程檢查間隔（秒）；WATCHLIST_SCHEDULER=0 停用背景排程
+SCHEDULER_POLL_SECONDS = 30
+# 互動頁面直接採用批次更新（refresh_universe.py）結果的期限
+PRECOMPUTED_MAX_AGE = float(os.environ.get("PRECOMPUTED_MAX_AGE_HOURS", "24")) * 3600
+
+WATCHLIST_REFRESHES = telemetry.counter(
+    "watchlist_refreshes_total",
+    "自選清單背景更新次數（result=ok/partial/error）",
+    ("result",),
+)
+WATCHLIST_REFRESH_SECONDS = telemetry.histogram(
+    "watchlist_refresh_seconds",
+    "單一自選清單更新耗時（秒）",
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlists (
+    name TEXT PRIMARY KEY,
+    symbols TEXT NOT NULL,
+    period TEXT NOT NULL DEFAULT '1y',
+    refresh_minutes INTEGER NOT NULL DEFAULT 60,
+    include_news INTEGER NOT NULL DEFAULT 0,
+    last_refreshed REAL,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+"""
+
+
+@dataclass(frozen=True)
+class Watchlist:
+    name: str
+    symbols: list
+    period: str = "1y"
+    refresh_minutes: int = DEFAULT_REFRESH_MINUTES
+    include_news: bool = False
+    last_refreshed: float | None = None
+    last_error: str | None = None
+
+    def due(self, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        return self.last_refreshed is None or now - self.last_refreshed >= self.refresh_minutes * 60
+
+
+@dataclass
+class Snapshot:
+    """某清單在資料庫中的預先計算結果；缺少的股票不在 dict 中。"""
+
+    analysis: dict = field(default_factory=dict)  # symbol -> analyze_stock 回傳的 tuple
+    closes: dict = field(default_factory=dict)  # symbol -> 收盤價 Series
+    news: dict = field(default_factory=dict)  # symbol -> [(title, url), ...]
+    refreshed_at: float | None = None
+
+
+def _connect(path: str | None = None) -> sqlite3.Connection:
+    path = path or WATCHLIST_DB
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _parse_symbols(symbols) -> list[str]:
+    if isinstance(symbols, str):
+        symbols = symbols.split(",")
+    return list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+
+
+def save_watchlist(
+    name: str,
+    symbols,
+    period: str = "1y",
+    refresh_minutes: int = DEFAULT_REFRESH_MINUTES,
+    include_news: bool = False,
+) -> Watchlist:
+    """新增或覆寫清單；股票代碼變動時清除上次更新時間，讓排程盡快補算。"""
+    name = name.strip()
+    symbols = _parse_symbols(symbols)
+    if not name or not symbols:
+        raise ValueError("清單名稱與股票代碼不可為空")
+    with _connect() as conn:
+        row = conn.execute("SELECT symbols, period, last_refreshed FROM watchlists WHERE name = ?", (name,)).fetchone()
+        last = row[2] if row and row[0] == ",".join(symbols) and row[1] == period else None
+        conn.execute(
+            "INSERT OR REPLACE INTO watchlists (name, symbols, period, refresh_minutes, include_news, last_refreshed, last_error)"
+            " VALUES (?, ?, ?, ?, ?, ?, NULL)",
+            (name, ",".join(symbols), period, int(refresh_minutes), int(bool(include_news)), last),
+        )
+    return get_watchlist(name)
+
+
+def delete_watchlist(name: str) -> None:
+    with _connect() as conn:
+        conn.execute("DELETE FROM watchlists WHERE name = ?", (name,))
+
+
+def _row_to_watchlist(row) -> Watchlist:
+    name, symbols, period, minutes, news, last, err = row
+    return Watchlist(name, symbols.split(","), period, int(minutes), bool(news), last, err)
+
+
+def list_watchlists() -> list[Watchlist]:
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT name, symbols, period, refresh_minutes, include_news, last_refreshed, last_error FROM watchlists ORDER BY name"
+        ).fetchall()
+    return [_row_to_watchlist(r) for r in rows]
+
+
+def get_watchlist(name: str) -> Watchlist | None:
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT name, symbols, period, refresh_minutes, include_news, last_refreshed, last_error FROM watchlists WHERE name = ?",
+            (name,),
+        ).fetchone()
+    return _row_to_watchlist(row) if row else None
+
+
+def _store(conn: sqlite3.Connection, kind: str, items: dict, now: float) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO results (kind, key, payload, refreshed_at) VALUES (?, ?, ?, ?)",
+        [(kind, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now) for key, value in items.items()],
+    )
+
+
+def store_results(kind: str, items: dict, now: float | None = None) -> None:
+    """寫入預先計算的結果（kind 如 "analysis"、"close:1y"、"news"；key 為股票代碼）。"""
+    if items:
+        with _connect() as conn:
+            _store(conn, kind, items, time.time() if now is None else now)
+
+
+def load_results(kind: str, keys, max_age: float | None = None) -> dict:
+    """讀出預先計算的結果；max_age（秒）以內的才回傳，查無的 key 不在結果中。"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    marks = ",".join("?" * len(keys))
+    oldest = time.time() - max_age if max_age is not None else 0.0
+    out, nbytes = {}, 0
+    with _connect() as conn:
+        for key, payload in conn.execute(
+            f"SELECT key, payload FROM results WHERE kind = ? AND refreshed_at >= ? AND key IN ({marks})", (kind, oldest, *keys)
+        ):
+            out[key] = pickle.loads(payload)
+            nbytes += len(payload)
+    perf.note(nbytes=nbytes)
+    return out
+
+
+def result_times(kind: str, keys) -> dict:
+    """各 key 預先計算結果的更新時間（epoch 秒），不讀取結果本身；查無的 key 不在結果中。"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    marks = ",".join("?" * len(keys))
+    with _connect() as conn:
+        return dict(conn.execute(f"SELECT key, refreshed_at FROM results WHERE kind = ? AND key IN ({marks})", (kind, *keys)))
+
+
+def load_snapshot(watchlist: Watchlist) -> Snapshot:
+    """讀出清單所有股票的預先計算結果（結果以股票為單位共用，多個清單包含同一檔時只存一份）。"""
+    snap = Snapshot(
+        analysis=load_results("analysis", watchlist.symbols),
+        closes=load_results(f"close:{watchlist.period}", watchlist.symbols),
+        news=load_results("news", watchlist.symbols) if watchlist.include_news else {},
+        refreshed_at=watchlist.last_refreshed,
+    )
+    perf.note(hits=len(snap.analysis), misses=len(watchlist.symbols) - len(snap.analysis))
+    return snap
+
+
+# ===== 更新 =====
+_refresh_locks: dict[str, threading.Lock] = {}
+_refresh_locks_guard = threading.Lock()
+
+
+def _lock_for(name: str) -> threading.Lock:
+    with _refresh_locks_guard:
+        return _refresh_locks.setdefault(name, threading.Lock())
+
+
+def refresh_watchlist(name: str, wait: bool = True) -> Watchlist | None:
+    """重新計算清單的分析、收盤價（與新聞）並寫入資料庫。
+
+    同一清單同時只會有一個更新在進行；wait=False 時若已在更新中直接返回 None。
+    """
+    lock = _lock_for(name)
+    if not lock.acquire(blocking=wait):
+        return None
+    try:
+        watchlist = get_watchlist(name)
+        if watchlist is None:
+            return None
+        return _refresh(watchlist)
+    finally:
+        lock.release()
+
+
+def _refresh(watchlist: Watchlist) -> Watchlist:
+    from .analysis import analyze_stock
+    from .price_panel import download_close_panel
+
+    t0 = time.perf_counter()
+    errors = []
+    analysis = {}
+    for symbol in watchlist.symbols:
+        try:
+            analysis[symbol] = analyze_stock(symbol)
+        except Exception as e:
+            errors.append(f"{symbol}: {e}")
+
+    closes = {}
+    close_df, err = download_close_panel(watchlist.symbols, watchlist.period)
+    if err is not None:
+        errors.append(str(err))
+    for symbol in close_df.columns:
+        series = close_df[symbol].dropna()
+        if not series.empty:
+            closes[symbol] = series
+
+    news = {}
+    if watchlist.include_news:
+        try:
+            from .news_scraper import scrape_news_headlines
+        except ImportError as e:
+            errors.append(f"新聞爬蟲無法載入: {e}")
+        else:
+            for symbol in watchlist.symbols:
+                name = analysis[symbol][-1].get("name") if symbol in analysis else None
+                headlines = scrape_news_headlines(symbol, company_name=name)
+                if headlines:
+                    news[symbol] = headlines
+
+    now = time.time()
+    with _connect() as conn:
+        _store(conn, "analysis", analysis, now)
+        _store(conn, f"close:{watchlist.period}", closes, now)
+        _store(conn, "news", news, now)
+        conn.execute(
+            "UPDATE watchlists SET last_refreshed = ?, last_error = ? WHERE name = ?",
+            (now, "；".join(errors)[:2000] or None, watchlist.name),
+        )
+    result = "ok" if not errors else ("partial" if analysis else "error")
+    WATCHLIST_REFRESHES.inc(result=result)
+    WATCHLIST_REFRESH_SECONDS.observe(time.perf_counter() - t0)
+    return get_watchlist(watchlist.name)
+
+
+# ===== 背景排程 =====
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _scheduler_loop(poll_seconds: float) -> None:
+    while True:
+        try:
+            for watchlist in list_watchlists():
+                if watchlist.due():
+                    refresh_watchlist(watchlist.name, wait=False)
+        except Exception:
+            logger.exception("自選清單背景更新失敗")
+        time.sleep(poll_seconds)
+
+
+def start_scheduler(poll_seconds: float = SCHEDULER_POLL_SECONDS) -> bool:
+    """啟動背景排程執行緒（每個程序只啟動一次）；回傳排程是否在執行。"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return True
+        if os.environ.get("WATCHLIST_SCHEDULER", "1") == "0":
+            return False
+        _scheduler = threading.Thread(target=_scheduler_loop, args=(poll_seconds,), name="watchlist-scheduler", daemon=True)
+        _scheduler.start()
+        return True
+
+
+def age_text(ts: float | None) -> str:
+    """「最後更新」顯示用文字。"""
+    if ts is None:
+        return "尚未更新"
+    minutes = (time.time() - ts) / 60
+    stamp = pd.Timestamp(ts, unit="s", tz="UTC").tz_convert(None).strftime("%Y-%m-%d %H:%M UTC")
+    if minutes < 1:
+        return f"{stamp}（剛剛）"
+    if minutes < 120:
+        return f"{stamp}（{minutes:.0f} 分鐘前）"
+    return f"{stamp}（{minutes / 60:.1f} 小時前）"
@@ -0,0 +1,113 @@
+# stock_core/whatif.py
+# 情境分析：以 analyze_stock 已算好的原始指標為基準，一次向量化評估「股價衝擊 × 盈餘衝擊」格點下
+# 每檔股票的總分與投資建議（形狀為 股票 × 盈餘衝擊 × 股價衝擊），不需重抓資料
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .analysis import classify_mode
+from .scoring_rules import RuleSet
+from .sector_percentiles import load_sector_table, percentile_values
+
+DEFAULT_SHOCKS = np.round(np.linspace(-0.5, 0.5, 21), 4)
+METRICS = ["EPS", "ROE", "P/E", "P/B", "淨利率"]
+
+
+def shock_metrics(base: pd.DataFrame, price_shocks, earnings_shocks) -> dict[str, np.ndarray]:
+    """把基準指標套上衝擊，回傳 {指標: (股票, 盈餘衝擊, 股價衝擊) 陣列}。
+
+    衝擊皆為相對變動（-0.2 代表 -20%）。盈餘衝擊視為淨利等比例變動：EPS、ROE、淨利率同乘 (1+e)，
+    權益與營收不變；股價衝擊只影響 P/E、P/B。
+    """
+    p = np.asarray(price_shocks, dtype=float)
+    e = np.asarray(earnings_shocks, dtype=float)
+    if np.any(p <= -1) or np.any(e <= -1):
+        raise ValueError("衝擊幅度必須大於 -100%")
+    col = {m: pd.to_numeric(base[m], errors="coerce").to_numpy(dtype=float)[:, None, None] if m in base else np.full((len(base), 1, 1), np.nan) for m in METRICS}
+    g = (1.0 + e)[None, :, None]
+    q = (1.0 + p)[None, None, :]
+    shape = (len(base), len(e), len(p))
+    return {
+        "EPS": np.broadcast_to(col["EPS"] * g, shape),
+        "ROE": np.broadcast_to(col["ROE"] * g, shape),
+        "P/E": col["P/E"] * q / g,
+        "P/B": np.broadcast_to(col["P/B"] * q, shape),
+        "淨利率": np.broadcast_to(col["淨利率"] * g, shape),
+    }
+
+
+@dataclass(frozen=True)
+class WhatIfResult:
+    tickers: list
+    price_shocks: np.ndarray
+    earnings_shocks: np.ndarray
+    total: np.ndarray  # (股票, 盈餘衝擊, 股價衝擊) 總分
+    rank: np.ndarray  # 同形狀；投資建議在規則中的序位（0 為最差）
+    labels: list  # 序位 -> 投資建議
+    base_total: np.ndarray
+    base_rank: np.ndarray
+
+    def suggestions(self, ticker: str) -> np.ndarray:
+        return np.asarray(self.labels, dtype=object)[self.rank[self.tickers.index(ticker)]]
+
+    def changed_count(self) -> np.ndarray:
+        """每個情境下投資建議與基準不同的股票數（盈餘衝擊 × 股價衝擊）。"""
+        return (self.rank != self.base_rank[:, None, None]).sum(axis=0)
+
+    def transitions(self, earnings_shock: float, price_shock: float) -> pd.DataFrame:
+        """指定情境下的建議轉移表：列為基準建議、欄為情境建議、值為股票數。"""
+        ei = int(np.abs(self.earnings_shocks - earnings_shock).argmin())
+        pi = int(np.abs(self.price_shocks - price_shock).argmin())
+        ladder = self.labels[::-1]
+        labels = np.asarray(self.labels, dtype=object)
+        table = pd.crosstab(pd.Series(labels[self.base_rank], name="基準"), pd.Series(labels[self.rank[:, ei, pi]], name="情境"))
+        return table.reindex(index=ladder, columns=ladder, fill_value=0)
+
+
+def run_whatif(
+    all_details: dict,
+    rules: RuleSet,
+    price_shocks=DEFAULT_SHOCKS,
+    earnings_shocks=DEFAULT_SHOCKS,
+) -> WhatIfResult:
+    """對 all_details 中所有股票一次評估整個衝擊格點（股型會依衝擊後的指標重新分類）。"""
+    tickers = list(all_details)
+    base = pd.DataFrame.from_dict(
+        {sym: all_details[sym]["fundamentals"].get("metrics", {}) for sym in tickers}, orient="index"
+    ).reindex(tickers)
+    price_shocks = np.asarray(price_shocks, dtype=float)
+    earnings_shocks = np.asarray(earnings_shocks, dtype=float)
+
+    def evaluate(p, e):
+        shocked = shock_metrics(base, p, e)
+        modes = classify_mode(shocked["EPS"], shocked["P/E"], shocked["P/B"]).reshape(-1)
+        if rules.basis == "sector_percentile":
+            shocked = _to_percentiles(shocked, [all_details[s]["fundamentals"].get("sector") for s in tickers], rules)
+        total = np.zeros(modes.shape)
+        for metric in rules.metrics:
+            if metric in shocked:
+                total += np.nan_to_num(rules.score_array(metric, shocked[metric].reshape(-1), modes))
+        total = total.astype(int)
+        return total.reshape(len(tickers), len(e), len(p)), rules.suggestions.lookup(total).reshape(len(tickers), len(e), len(p))
+
+    total, rank = evaluate(price_shocks, earnings_shocks)
+    base_total, base_rank = evaluate(np.zeros(1), np.zeros(1))
+    return WhatIfResult(
+        tickers, price_shocks, earnings_shocks, total, rank,
+        list(rules.suggestions.values), base_total[:, 0, 0], base_rank[:, 0, 0],
+    )
+
+
+def _to_percentiles(shocked: dict, sectors: list, rules: RuleSet) -> dict:
+    table = load_sector_table()
+    out = {}
+    for metric, values in shocked.items():
+        pct = np.full(values.shape, np.nan)
+        for i, sector in enumerate(sectors):
+            q = table.lookup(sector, metric)
+            if q is not None:
+                pct[i] = percentile_values(q, values[i], rules.directions.get(metric, "higher"), metric in table.positive_only)
+        out[metric] = pct
+    return out
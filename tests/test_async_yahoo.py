@@ -0,0 +1,158 @@
+# tests/test_async_yahoo.py
+# 非同步 Yahoo 資料層對本機回放伺服器（tests/yahoo_stub.py）：
+# 回傳的資料包 / 日線須與 yfinance 解析同一份 JSON 的結果完全相同，並驗證 crumb 失效時重新取得
+
+import asyncio
+import json
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode, urlsplit
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("curl_cffi")
+
+from yahoo_stub import YahooStub, load_fixture
+
+from stock_core import async_yahoo
+from stock_core.async_yahoo import AsyncYahooClient
+from stock_core.ticker_bundle import BUNDLE_FRAMES, RECENT_HISTORY, fetch_ticker_bundle
+
+
+@pytest.fixture
+def stub():
+    with YahooStub() as s:
+        yield s
+
+
+def _run(stub, make_coro):
+    """以指向回放伺服器的客戶端執行 make_coro(client)。"""
+    async def main():
+        async with AsyncYahooClient(base_url=stub.base_url, cookie_url=f"{stub.base_url}/fc") as client:
+            return await make_coro(client)
+
+    return asyncio.run(main())
+
+
+class _Response:
+    def __init__(self, status: int, raw: bytes, url: str):
+        self.status_code, self.text, self.url = status, raw.decode("utf-8"), url
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise urllib.error.HTTPError(self.url, self.status_code, self.text, None, None)
+
+
+@pytest.fixture
+def yf_stub(stub, monkeypatch, tmp_path):
+    """讓 yfinance 對同一台回放伺服器發出請求（取代 YfData 的 HTTP 層，解析流程不變）。"""
+    import yfinance as yf
+    from yfinance.data import YfData
+
+    def get(self, url, params=None, timeout=30):
+        parts = urlsplit(url)
+        query = dict(params or {})
+        if "quoteSummary" in parts.path:
+            query["crumb"] = stub.issue_crumb()
+        target = f"{stub.base_url}{parts.path}?" + "&".join(q for q in (parts.query, urlencode(query)) if q)
+        try:
+            with urllib.request.urlopen(target, timeout=timeout) as resp:
+                return _Response(resp.status, resp.read(), target)
+        except urllib.error.HTTPError as e:
+            return _Response(e.code, e.read(), target)
+
+    monkeypatch.setattr(YfData, "get", get)
+    monkeypatch.setattr(YfData, "cache_get", get)
+    yf.set_tz_cache_location(str(tmp_path))
+    return yf
+
+
+def test_bundle_matches_fetch_ticker_bundle(stub, yf_stub):
+    ours = _run(stub, lambda c: c.bundle("AAPL"))
+    theirs = fetch_ticker_bundle("AAPL", parallel=False)
+    assert ours.errors == {} and theirs.errors == {}
+    for name in (*BUNDLE_FRAMES, "recent_history"):
+        pd.testing.assert_frame_equal(getattr(ours, name), getattr(theirs, name), obj=name)
+    # info：兩邊都有的欄位值相同（yf.Ticker.info 另外合併 v7 quote 的即時欄位，不在資料包內）；
+    # analyze_stock 用到的欄位兩邊都有
+    for key in ("sharesOutstanding", "trailingEps", "forwardEps", "sector"):
+        assert ours.info[key] == theirs.info[key], key
+    for key, value in ours.info.items():
+        if value is not None and key in theirs.info:
+            assert theirs.info[key] == value, key
+    # 數值取 raw、空 dict 視為缺值、去掉各模組的 maxAge
+    assert "maxAge" not in ours.info
+    assert ours.info["pegRatio"] is None
+
+
+def test_statement_titles_and_order(stub):
+    balance = _run(stub, lambda c: c.statement("AAPL", "balance-sheet", "annual"))
+    # 依 yfinance 的項目順序重排、沒有資料的項目不出現；資產負債表只保留 PPE 縮寫
+    assert list(balance.index) == ["Total Debt", "Stockholders Equity", "Total Liabilities Net Minority Interest", "Total Assets", "Net PPE"]
+    assert list(balance.columns) == sorted(balance.columns, reverse=True)
+    assert balance.loc["Total Assets", pd.Timestamp("2024-09-30")] == 364980e6
+
+    income = _run(stub, lambda c: c.statement("AAPL", "financials", "quarterly"))
+    assert list(income.index) == ["EBITDA", "Basic EPS", "Net Income", "Total Revenue"]
+    assert "Preferred Stock Dividends" not in income.index
+    assert income.shape == (4, 5)
+
+
+def test_history_adjclose_and_dividends(stub, yf_stub):
+    hist = _run(stub, lambda c: c.history("AAPL", period="1mo"))
+    pd.testing.assert_frame_equal(hist, yf_stub.Ticker("AAPL").history(period="1mo", auto_adjust=True))
+
+    raw = load_fixture("chart_AAPL_1mo.json")["chart"]["result"][0]
+    adj = [a for a in raw["indicators"]["adjclose"][0]["adjclose"] if a is not None]
+    # null 報價列被丟棄，Close 為還原後價格，開高低依同一比例調整
+    assert len(hist) == len(adj) == len(raw["timestamp"]) - 1
+    assert hist["Close"].tolist() == pytest.approx(adj)
+    assert (hist["High"] - hist["Close"]).iloc[0] == pytest.approx(1.9 * adj[0] / raw["indicators"]["quote"][0]["close"][0])
+    # 日線索引為交易所時區的午夜（跨夏令時間仍對齊到同一天）；股利落在除息日
+    assert str(hist.index.tz) == "America/New_York"
+    assert (hist.index == hist.index.normalize()).all()
+    assert hist.loc[hist["Dividends"] > 0, "Dividends"].to_dict() == {pd.Timestamp("2024-11-08", tz="America/New_York"): 0.25}
+    assert hist.index.name == "Date"
+
+
+def test_recent_history_matches_yfinance(stub, yf_stub):
+    hist = _run(stub, lambda c: c.history("AAPL", **RECENT_HISTORY))
+    pd.testing.assert_frame_equal(hist, yf_stub.Ticker("AAPL").history(**RECENT_HISTORY))
+
+
+def test_crumb_refresh_on_401(stub):
+    async def twice(client):
+        first = await client.info("AAPL")
+        stub.expire_crumb()
+        return first, await client.info("AAPL")
+
+    first, second = _run(stub, twice)
+    assert first == second and first["sector"] == "Technology"
+    # 第一次取得 crumb；失效後 401 → 重新取得一次 → 重送成功
+    assert stub.crumbs_issued == 2
+    assert len(stub.paths("/v10/finance/quoteSummary/")) == 3
+    crumbs = [q.get("crumb") for p, q in stub.requests if p.startswith("/v10/")]
+    assert crumbs == ["crumb-1", "crumb-1", "crumb-2"]
+
+
+def test_news_and_missing_symbol(stub):
+    news = _run(stub, lambda c: c.news("AAPL"))
+    # 標題去除空白，沒有標題的項目略過
+    assert news == [
+        ("Apple's iPhone sales beat estimates", "https://finance.yahoo.com/news/apple-iphone-sales-1.html"),
+        ("Apple supplier outlook", "https://finance.yahoo.com/news/apple-supplier-2.html"),
+    ]
+    with pytest.raises(async_yahoo.YahooHTTPError, match="HTTP 404"):
+        _run(stub, lambda c: c.history("BAD"))
+
+
+def test_prefetch_closes_and_errors(stub):
+    out = _run(stub, lambda c: async_yahoo.prefetch_async(["AAPL", "BAD"], period="1mo", client=c))
+    assert set(out.bundles) == {"AAPL"}
+    close = out.closes["AAPL"]
+    assert close.name == "AAPL" and close.index.tz is None and len(close) == 22
+    assert ("BAD", "bundle") in out.errors and ("BAD", "close") in out.errors
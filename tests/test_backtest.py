@@ -0,0 +1,40 @@
+# tests/test_backtest.py
+# 投資組合回測：缺值日（不同交易所休市）的報酬不能遺失、尚未上市的股票不持有
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_core.backtest import run_backtest, weights_from_scores
+
+DAYS = pd.bdate_range("2024-01-01", periods=5)
+
+
+def test_gap_in_prices_keeps_the_move():
+    close = pd.DataFrame({"A": [100, np.nan, 110, 110, 110], "B": [50.0] * 5}, index=DAYS)
+    res = run_backtest(close, pd.Series({"A": 0.5, "B": 0.5}), rebalance=None)
+    # A 跨過缺口上漲 10%，半數資金 → 淨值 1.05
+    assert res["value"].iloc[-1] == pytest.approx(1.05)
+    assert res["value"].iloc[1] == pytest.approx(1.0)
+    assert res["value"].iloc[2] == pytest.approx(1.05)
+
+
+def test_gap_on_rebalance_day_still_holds_ticker():
+    close = pd.DataFrame({"A": [100, 100, np.nan, 120, 120], "B": [50.0] * 5}, index=DAYS)
+    res = run_backtest(close, pd.Series({"A": 0.5, "B": 0.5}), rebalance="D")
+    # 缺值日照常持有 A（以前值計），不會把權重全部移到 B 而錯過隔天的漲幅
+    assert res["value"].iloc[-1] == pytest.approx(1.10)
+
+
+def test_not_yet_listed_ticker_is_not_held():
+    close = pd.DataFrame({"A": [np.nan, np.nan, 10, 20, 20], "B": [50, 55, 55, 55, 55.0]}, index=DAYS)
+    res = run_backtest(close, pd.Series({"A": 0.5, "B": 0.5}), rebalance=None)
+    # 期初只有 B 有報價：全部資金在 B，A 上市後的漲幅不計入
+    assert res["value"].iloc[-1] == pytest.approx(1.10)
+
+
+def test_weights_from_scores():
+    details = {"A": {"total_score": 15, "suggestion": "買入"}, "B": {"total_score": 5, "suggestion": "觀望"}}
+    assert weights_from_scores(details).to_dict() == {"A": 0.75, "B": 0.25}
+    assert weights_from_scores(details, "equal").to_dict() == {"A": 0.5, "B": 0.5}
+    assert weights_from_scores(details, suggestions=["買入"]).to_dict() == {"A": 1.0}
@@ -0,0 +1,164 @@
+# tests/test_bar_cache.py
+# 分時 K 線快取：視窗涵蓋範圍、過期緩衝區重置、下載失敗的重試間隔、只追加的磁碟寫入、逐檔下載鎖
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_core import bar_cache
+from stock_core.bar_cache import BarRing, IntradayBarCache
+
+
+def _bars(start: pd.Timestamp, end: pd.Timestamp, freq: str = "1min") -> pd.DataFrame:
+    idx = pd.date_range(start, end, freq=freq, tz="UTC")
+    close = np.arange(len(idx), dtype=float) + 100
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1.0}, index=idx)
+
+
+class _Stub:
+    """取代 IntradayBarCache._download：依 period / start 回傳合成 K 棒並記錄呼叫。"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, tickers, **kwargs):
+        self.calls.append((list(tickers), kwargs))
+        if self.fail:
+            raise RuntimeError("boom")
+        now = pd.Timestamp.now(tz="UTC").floor("min")
+        if "period" in kwargs:
+            start = now - pd.Timedelta(days=bar_cache._PERIOD_DAYS[kwargs["period"]]) + pd.Timedelta(minutes=1)
+        else:
+            start = pd.Timestamp(kwargs["start"])
+        return {sym: _bars(start, now) for sym in tickers}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    c = IntradayBarCache("1m", capacity=20000, spill_dir=None)
+    stub = _Stub()
+    monkeypatch.setattr(c, "_download", stub)
+    return c, stub
+
+
+def test_longer_window_is_backfilled(cache):
+    c, stub = cache
+    c.refresh(["AAA"], period="1d")
+    c.refresh(["AAA"], period="7d")
+    assert [kw.get("period") for _, kw in stub.calls] == ["1d", "7d"]
+    span = c.close_panel(["AAA"], "7d").index
+    assert span[-1] - span[0] > pd.Timedelta(days=6)
+
+
+def test_shorter_window_uses_cached_bars(cache):
+    c, stub = cache
+    c.refresh(["AAA"], period="7d")
+    c.refresh(["AAA"], period="1d")
+    assert len(stub.calls) == 1
+
+
+def test_stale_ring_is_reset(cache):
+    c, stub = cache
+    old = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=30)
+    ring = BarRing(c.capacity)
+    ts = _bars(old, old + pd.Timedelta(minutes=9)).index.as_unit("ns").asi8
+    ring.append(ts, np.ones((len(ts), len(bar_cache.BAR_FIELDS))))
+    c._rings["AAA"] = ring
+    c._rings["BBB"] = BarRing(c.capacity)
+    c.refresh(["AAA", "BBB"], period="1d")
+    # 兩檔都走整段視窗下載，不會因過期的 last_ts 以 start= 增量下載
+    assert stub.calls == [(["AAA", "BBB"], {"period": "1d"})]
+    assert c._rings["AAA"].first_ts > ts[-1]
+
+
+def test_failed_download_waits_min_gap(monkeypatch):
+    c = IntradayBarCache("1m", spill_dir=None)
+    stub = _Stub(fail=True)
+    monkeypatch.setattr(c, "_download", stub)
+    c.refresh(["AAA"], period="1d", min_gap=60)
+    c.refresh(["AAA"], period="1d", min_gap=60)
+    assert len(stub.calls) == 1
+    c._failed_at["AAA"] = time.time() - 61
+    c.refresh(["AAA"], period="1d", min_gap=60)
+    assert len(stub.calls) == 2
+
+
+def test_spill_keeps_covered_from(tmp_path):
+    ring = BarRing(100)
+    now = pd.Timestamp.now(tz="UTC").floor("min")
+    ts = _bars(now - pd.Timedelta(minutes=9), now).index.as_unit("ns").asi8
+    ring.append(ts, np.ones((len(ts), len(bar_cache.BAR_FIELDS))))
+    ring.covered_from = int(ts[0]) - 3600 * 10**9
+    path = str(tmp_path / "AAA.npz")
+    ring.save(path)
+    assert BarRing.load(path, 100).covered_from == ring.covered_from
+
+
+def test_incremental_spill_appends_only(monkeypatch, tmp_path):
+    c = IntradayBarCache("1m", capacity=20000, spill_dir=str(tmp_path))
+    stub = _Stub()
+
+    def download(tickers, **kwargs):
+        frames = stub(tickers, **kwargs)
+        if "start" in kwargs:
+            # 增量下載：時間往後推，帶回 5 根新 K 棒
+            frames = {sym: _bars(df.index[0], df.index[-1] + pd.Timedelta(minutes=5)) for sym, df in frames.items()}
+        return frames
+
+    monkeypatch.setattr(c, "_download", download)
+    c.refresh(["AAA"], period="1d", min_gap=0)
+    path = c._spill_path("AAA")
+    snapshot = os.stat(path).st_mtime_ns
+    c._rings["AAA"].fetched_at = 0.0
+    c.refresh(["AAA"], period="1d", min_gap=0)
+    # 增量下載只寫追加檔，快照不重寫；重新載入與記憶體中的緩衝區相同
+    assert os.stat(path).st_mtime_ns == snapshot
+    assert os.path.getsize(path + ".tail") > 0
+    loaded = BarRing.load(path, c.capacity)
+    for got, want in zip(loaded.arrays(), c._rings["AAA"].arrays()):
+        np.testing.assert_array_equal(got, want)
+    assert loaded.covered_from == c._rings["AAA"].covered_from
+
+
+def test_spill_compacts_when_tail_is_full(tmp_path):
+    ring = BarRing(10)
+    path = str(tmp_path / "AAA.npz")
+    start = pd.Timestamp.now(tz="UTC").floor("min")
+    for i in range(15):
+        ts = np.array([(start + pd.Timedelta(minutes=i)).value])
+        ring.append(ts, np.full((1, len(bar_cache.BAR_FIELDS)), float(i)))
+        ring.spill(path, ts, np.full((1, len(bar_cache.BAR_FIELDS)), float(i)))
+    assert ring._tail_rows < ring.capacity
+    loaded = BarRing.load(path, 10)
+    np.testing.assert_array_equal(loaded.arrays()[0], ring.arrays()[0])
+    # 寫到一半中斷的紀錄不影響載入
+    with open(path + ".tail", "ab") as f:
+        f.write(b"\x00" * 7)
+    assert len(BarRing.load(path, 10)) == len(ring)
+
+
+def test_different_tickers_do_not_wait(monkeypatch):
+    c = IntradayBarCache("1m", capacity=20000, spill_dir=None)
+    release = threading.Event()
+    stub = _Stub()
+
+    def download(tickers, **kwargs):
+        if "AAA" in tickers:
+            assert release.wait(5)
+        return stub(tickers, **kwargs)
+
+    monkeypatch.setattr(c, "_download", download)
+    slow = threading.Thread(target=c.refresh, args=(["AAA"], "1d"))
+    slow.start()
+    # AAA 的下載尚未完成時，另一個 session 查詢 BBB 不必等待
+    done = threading.Event()
+    threading.Thread(target=lambda: (c.refresh(["BBB"], "1d"), done.set())).start()
+    assert done.wait(2)
+    release.set()
+    slow.join(5)
+    assert len(c._rings["AAA"]) and len(c._rings["BBB"])
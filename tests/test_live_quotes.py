@@ -0,0 +1,61 @@
+# tests/test_live_quotes.py
+# 即時模式：最新 1 分鐘 K 棒併入主走勢圖的收盤價面板、綜合評分表只重算 P/E、P/B
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_core.live_quotes import apply_live_metrics, merge_live_bars
+
+
+def _minute_bars(start: str, closes: dict) -> pd.DataFrame:
+    n = len(next(iter(closes.values())))
+    return pd.DataFrame(closes, index=pd.date_range(start, periods=n, freq="1min"), dtype=float)
+
+
+def test_daily_updates_today_row():
+    close = pd.DataFrame({"AAPL": [100.0, 101.0], "MSFT": [200.0, 202.0]}, index=pd.to_datetime(["2024-03-04", "2024-03-05"]))
+    bars = _minute_bars("2024-03-05 14:30", {"AAPL": [101.5, 102.0], "MSFT": [203.0, np.nan]})
+    merged = merge_live_bars(close, bars, "1d")
+    # 當日那一列以最新價格取代（缺值沿用前一根 K 棒），不新增分鐘列
+    assert list(merged.index) == list(close.index)
+    assert merged.loc["2024-03-05"].tolist() == [102.0, 203.0]
+    assert merged.loc["2024-03-04"].tolist() == [100.0, 200.0]
+
+
+def test_daily_appends_new_session():
+    close = pd.DataFrame({"AAPL": [100.0]}, index=pd.to_datetime(["2024-03-04"]))
+    bars = _minute_bars("2024-03-05 14:30", {"AAPL": [104.0]})
+    merged = merge_live_bars(close, bars, "1d")
+    assert merged["AAPL"].to_dict() == {pd.Timestamp("2024-03-04"): 100.0, pd.Timestamp("2024-03-05"): 104.0}
+
+
+def test_intraday_updates_last_bar_and_appends():
+    close = pd.DataFrame({"AAPL": [100.0, 101.0]}, index=pd.date_range("2024-03-05 14:30", periods=2, freq="5min"))
+    # 14:35 那根 K 棒尚未收完（14:35–14:39），之後接上 14:40 的新 K 棒
+    bars = _minute_bars("2024-03-05 14:35", {"AAPL": [101.0, 101.2, 101.4, 101.3, 101.6, 102.0]})
+    merged = merge_live_bars(close, bars, "5m")
+    assert merged["AAPL"].tolist() == [100.0, 101.6, 102.0]
+    assert merged.index[-1] == pd.Timestamp("2024-03-05 14:40")
+
+
+def test_no_bars_keeps_panel():
+    close = pd.DataFrame({"AAPL": [100.0]}, index=pd.to_datetime(["2024-03-04"]))
+    assert merge_live_bars(close, pd.DataFrame(), "1d") is close
+
+
+def test_apply_live_metrics_only_touches_pe_pb():
+    summary = pd.DataFrame({
+        "股票代碼": ["AAPL", "MSFT"], "總分": [7, 5], "EPS": [6.0, 10.0], "P/E": [20.0, 30.0], "P/B": [40.0, 10.0],
+    })
+    fundamentals = {
+        "AAPL": {"price": 120.0, "eps": 6.0, "pe_comparable": True, "bvps": 3.0},
+        # 幣別不同、EPS 不可比：P/E 維持分析時的數值，P/B 照常重算
+        "MSFT": {"price": 300.0, "eps": 10.0, "pe_comparable": False, "bvps": 30.0},
+    }
+    bars = _minute_bars("2024-03-05 14:30", {"AAPL": [126.0], "MSFT": [330.0]})
+    out = apply_live_metrics(summary, fundamentals, bars)
+    assert out["P/E"].tolist() == pytest.approx([21.0, 30.0])
+    assert out["P/B"].tolist() == pytest.approx([42.0, 11.0])
+    pd.testing.assert_frame_equal(out.drop(columns=["P/E", "P/B"]), summary.drop(columns=["P/E", "P/B"]))
+    assert summary["P/E"].tolist() == [20.0, 30.0]
@@ -0,0 +1,25 @@
+# tests/test_pdf_report.py
+# PDF 快取鍵：附圖表時財報表格不同即為不同報告；不附圖表時只看評分內容
+
+import pandas as pd
+
+from stock_core.pdf_report import report_cache_key
+from stock_core.ticker_bundle import StatementTable, TickerRecord
+
+
+def _details(net_income: float) -> dict:
+    income = StatementTable(("2023", "2024"), ("Total Revenue", "Net Income"), ((100.0, 10.0), (120.0, net_income)))
+    return {"AAPL": {
+        "details": [["EPS", "TTM", 6.0, "A", ""]], "total_score": 7, "suggestion": "買入", "mode": "VALUE",
+        "scores": {"EPS": 2}, "stock": TickerRecord("AAPL", income, None),
+    }}
+
+
+def test_chart_key_tracks_statements():
+    summary = pd.DataFrame({"股票代碼": ["AAPL"], "總分": [7]})
+    old, new = _details(12.0), _details(15.0)
+    assert report_cache_key(old, summary, include_charts=True) != report_cache_key(new, summary, include_charts=True)
+    assert report_cache_key(old, summary, include_charts=True) == report_cache_key(_details(12.0), summary, include_charts=True)
+    # 不附圖表的報告不含財報表格：評分相同即可沿用
+    assert report_cache_key(old, summary) == report_cache_key(new, summary)
+    assert report_cache_key(old, summary) != report_cache_key(old, summary, include_charts=True)
@@ -0,0 +1,69 @@
+# tests/test_rate_limit.py
+# 限流判斷：依例外型別 / 狀態碼 / 明確字樣判斷，代號中的數字不算；yf.download 只看本次代號的錯誤
+
+import logging
+
+import pandas as pd
+import pytest
+
+from stock_core import rate_limit
+from stock_core.async_yahoo import YahooHTTPError
+
+
+class YFRateLimitError(Exception):
+    """與 yfinance.exceptions.YFRateLimitError 同名的替身（依型別名稱判斷）。"""
+
+
+class _HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__("HTTP error")
+        self.response = type("Resp", (), {"status_code": status})()
+
+
+@pytest.mark.parametrize("exc", [
+    YFRateLimitError("Rate limited"),
+    YahooHTTPError("info", 429),
+    _HTTPError(429),
+    RuntimeError("Too Many Requests. Rate limited. Try after a while."),
+    RuntimeError("HTTP Error 429: "),
+    RuntimeError("yahoo chart HTTP 429"),
+])
+def test_throttle_errors(exc):
+    assert rate_limit.is_throttle_error(exc)
+
+
+@pytest.mark.parametrize("exc", [
+    ValueError("1429.TW: No data found, symbol may be delisted"),
+    YahooHTTPError("chart", 404, "No data found for 4290.T"),
+    _HTTPError(500),
+    KeyError("2429"),
+    RuntimeError("HTTP 4290"),
+])
+def test_non_throttle_errors(exc):
+    assert not rate_limit.is_throttle_error(exc)
+
+
+def _fake_download(errors: dict):
+    """yf.download 替身：回傳空表，並以 yfinance 的格式記錄逐檔錯誤。"""
+    def download(tickers, **kwargs):
+        log = logging.getLogger("yfinance")
+        for sym, err in errors.items():
+            log.error(f"['{sym}']: {err}")
+        return pd.DataFrame()
+    return download
+
+
+def test_checked_download_throttled(monkeypatch):
+    yf = pytest.importorskip("yfinance")
+    monkeypatch.setattr(yf, "download", _fake_download({"AAPL": "YFRateLimitError('Too Many Requests. Rate limited.')"}))
+    with pytest.raises(rate_limit._DownloadThrottled):
+        rate_limit._checked_download(["AAPL", "MSFT"], progress=False)
+
+
+def test_checked_download_ignores_other_tickers(monkeypatch):
+    yf = pytest.importorskip("yfinance")
+    from yfinance import shared
+    # 其他 session 的代號被限流、或本次代號只是下市：都不是本次呼叫的限流
+    monkeypatch.setattr(shared, "_ERRORS", {"TSLA": "YFRateLimitError('Too Many Requests')"}, raising=False)
+    monkeypatch.setattr(yf, "download", _fake_download({"1429.TW": "YFPricesMissingError('possibly delisted')"}))
+    assert rate_limit._checked_download("1429.TW", progress=False).empty
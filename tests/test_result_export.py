@@ -0,0 +1,51 @@
+# tests/test_result_export.py
+# 結果資料集：寫入後讀回的內容與型別、同一天多次匯出的去重（依股票 × 評分規則）
+
+import time
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from stock_core.result_export import RESULT_FIELDS, append_to_dataset, read_dataset, results_frame, results_table
+
+
+def _details(total_score: int = 7, roe: float | None = 0.25) -> dict:
+    return {"AAPL": {
+        "details": [["EPS", "TTM", 6.0, "A", ""], ["ROE", "FY", roe, "B", ""]],
+        "total_score": total_score,
+        "suggestion": "買入",
+        "mode": "VALUE",
+        "scores": {"EPS": 2, "ROE": 1},
+        "fundamentals": {"metrics": {"EPS": 6.0, "ROE": roe}},
+    }}
+
+
+def test_round_trip(tmp_path):
+    root = str(tmp_path)
+    details = _details(roe=None)
+    written = append_to_dataset(results_table(details, as_of="2024-03-05", rule_set="default"), root=root)
+    assert written and all("as_of=2024-03-05" in path for path in written)
+    got = read_dataset(root)
+    want = results_frame(details, as_of="2024-03-05", rule_set="default")
+    assert list(got.columns) == [f[0] for f in RESULT_FIELDS]
+    assert got["metric"].astype(str).tolist() == want["metric"].tolist()
+    assert got["value"].tolist()[0] == 6.0 and pd.isna(got["value"].tolist()[1])
+    assert got["points"].tolist() == [2, 1]
+    assert set(got["rule_set"].astype(str)) == {"default"}
+    assert pd.Timestamp(got["as_of"].iloc[0]) == pd.Timestamp("2024-03-05")
+
+
+def test_same_day_exports_keep_latest_per_rule_set(tmp_path):
+    root = str(tmp_path)
+    append_to_dataset(results_table(_details(total_score=5), as_of="2024-03-05", rule_set="default"), root=root)
+    time.sleep(0.01)
+    append_to_dataset(results_table(_details(total_score=8), as_of="2024-03-05", rule_set="default"), root=root)
+    time.sleep(0.01)
+    append_to_dataset(results_table(_details(total_score=3), as_of="2024-03-05", rule_set="sector"), root=root)
+    got = read_dataset(root)
+    # 同一規則只保留最新一次；另一套規則的結果不被覆蓋
+    scores = got.groupby(got["rule_set"].astype(str))["total_score"].unique().map(list).to_dict()
+    assert scores == {"default": [8], "sector": [3]}
+    assert len(got) == 4
@@ -0,0 +1,109 @@
+# tests/test_shared_cache.py
+# 跨 session 共用快取的 single-flight 行為：多個執行緒同時查詢同一 key 時只呼叫上游一次
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from stock_core import price_panel, shared_cache
+from stock_core.price_panel import PanelStore
+from stock_core.shared_cache import SharedCache
+
+N_THREADS = 8
+
+
+def _run_together(fn, n: int = N_THREADS) -> list:
+    """n 個執行緒在 barrier 後同時呼叫 fn(i)，回傳各自的結果或例外。"""
+    barrier = threading.Barrier(n)
+
+    def call(i):
+        barrier.wait()
+        try:
+            return fn(i)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(call, range(n)))
+
+
+class _SlowFetch:
+    """上游替身：延遲回傳，讓其他執行緒在請求進行中抵達。"""
+
+    def __init__(self, result=None, error: Exception | None = None, delay: float = 0.3):
+        self.result = result
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.result(*args) if callable(self.result) else self.result
+
+
+@pytest.fixture(autouse=True)
+def _fresh_caches(monkeypatch):
+    monkeypatch.setattr(shared_cache, "_caches", {})
+
+
+def test_get_or_fetch_single_flight():
+    cache = SharedCache("test")
+    value = {"price": 1.0}
+    fetch = _SlowFetch(result=value)
+    results = _run_together(lambda i: cache.get_or_fetch("AAPL", fetch))
+    assert fetch.calls == 1
+    assert all(r is value for r in results)
+    # 之後的呼叫直接命中快取
+    assert cache.get_or_fetch("AAPL", fetch) is value
+    assert fetch.calls == 1
+
+
+def test_get_or_fetch_error_reaches_all_waiters():
+    cache = SharedCache("test")
+    err = ValueError("upstream down")
+    fetch = _SlowFetch(error=err)
+    results = _run_together(lambda i: cache.get_or_fetch("AAPL", fetch))
+    assert fetch.calls == 1
+    assert all(r is err for r in results)
+    # 失敗不寫入快取：下一次呼叫重新請求上游
+    fetch.error = None
+    fetch.result = 2.0
+    assert cache.get_or_fetch("AAPL", fetch) == 2.0
+    assert fetch.calls == 2
+
+
+def _close_frame(syms, period, interval="1d"):
+    idx = pd.bdate_range("2024-01-01", periods=5)
+    return pd.DataFrame({s: range(1, 6) for s in syms}, index=idx, dtype=float), None
+
+
+def test_panel_store_single_flight(monkeypatch):
+    fetch = _SlowFetch(result=_close_frame)
+    monkeypatch.setattr(price_panel, "download_close_panel", fetch)
+    # 每個 session 各有一個 PanelStore，共用同一個程序層級快取
+    stores = [PanelStore("1mo") for _ in range(N_THREADS)]
+    results = _run_together(lambda i: stores[i].get(["AAPL", "MSFT"]))
+    assert fetch.calls == 1
+    first = results[0].close
+    assert list(first.columns) == ["AAPL", "MSFT"]
+    for store, panel in zip(stores, results):
+        pd.testing.assert_frame_equal(panel.close, first)
+        # 各 session 保存的是同一份序列物件，不是各自下載的副本
+        assert store._series["AAPL"] is stores[0]._series["AAPL"]
+
+
+def test_panel_store_error_reaches_all_waiters(monkeypatch):
+    err = ConnectionError("no network")
+    fetch = _SlowFetch(error=err)
+    monkeypatch.setattr(price_panel, "download_close_panel", fetch)
+    results = _run_together(lambda i: PanelStore("1mo").get(["AAPL"]))
+    assert fetch.calls == 1
+    assert all(r is err for r in results)
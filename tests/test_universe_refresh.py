@@ -0,0 +1,33 @@
+# tests/test_universe_refresh.py
+# 股票池批次更新：卡住（存活但不回應）的工作程序逾時後被終止，該批記為失敗，其餘批次照常完成
+
+import multiprocessing as mp
+import time
+
+import pytest
+
+from stock_core import universe_refresh
+
+pytestmark = pytest.mark.skipif("fork" not in mp.get_all_start_methods(), reason="需以 fork 啟動工作程序（替身函式才會帶進子程序）")
+
+
+def _fake_chunk(chunk, period):
+    if "STUCK" in chunk:
+        time.sleep(3600)
+    return {"chunk": chunk, "analysis": {s: ("ok",) for s in chunk}, "closes": {}, "failed": {}}
+
+
+def test_stuck_chunk_times_out(monkeypatch, tmp_path):
+    monkeypatch.setattr(mp, "Process", mp.get_context("fork").Process)
+    monkeypatch.setattr(universe_refresh, "_process_chunk", _fake_chunk)
+    monkeypatch.setattr(universe_refresh, "store_results", lambda kind, results: None)
+    monkeypatch.setattr(universe_refresh, "CHECKPOINT_DIR", str(tmp_path))
+    monkeypatch.setattr(universe_refresh, "CHUNK_SIZE", 1)
+    t0 = time.monotonic()
+    report = universe_refresh.run_refresh(
+        ["AAA", "STUCK", "BBB", "CCC"], workers=2, resume=False,
+        rebuild_sector_table=False, export_results=False, chunk_timeout=1.0,
+    )
+    assert time.monotonic() - t0 < 30
+    assert report.done == 3 and report.unfinished == []
+    assert list(report.failed) == ["STUCK"] and "逾時" in report.failed["STUCK"]
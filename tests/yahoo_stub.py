@@ -0,0 +1,113 @@
+# tests/yahoo_stub.py
+# 離線回放用的 Yahoo 端點替身：以 http.server 依路徑回傳 tests/fixtures/yahoo 下的 JSON
+# - quoteSummary 需要有效的 crumb（否則 401，同 Yahoo）；expire_crumb() 讓目前的 crumb 失效以測試重新取得
+# - fundamentals-timeseries 依 type 參數篩選項目；chart 依 range 取檔；v7 quote 供 yf.Ticker.info 比對；其他未知路徑回傳 404
+
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "yahoo")
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class YahooStub:
+    """在背景執行緒提供回放端點；以 with 使用，離開時關閉。"""
+
+    def __init__(self):
+        self.requests: list[tuple[str, dict]] = []  # (路徑, 查詢參數)
+        self.crumbs_issued = 0
+        self._crumb = None
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def issue_crumb(self) -> str:
+        with self._lock:
+            self.crumbs_issued += 1
+            self._crumb = f"crumb-{self.crumbs_issued}"
+            return self._crumb
+
+    def expire_crumb(self) -> None:
+        with self._lock:
+            self._crumb = None
+
+    def paths(self, prefix: str = "") -> list[str]:
+        return [p for p, _ in self.requests if p.startswith(prefix)]
+
+    # ===== 路由 =====
+    def route(self, path: str, query: dict):
+        """回傳 (狀態碼, 內容)；內容為 str 時以純文字送出。"""
+        if path == "/fc":
+            return 404, "Not Found"
+        if path == "/v1/test/getcrumb":
+            return 200, self.issue_crumb()
+        symbol = path.rsplit("/", 1)[-1]
+        if path.startswith("/v10/finance/quoteSummary/"):
+            if self._crumb is None or query.get("crumb") != self._crumb:
+                return 401, {"finance": {"result": None, "error": {"code": "Unauthorized", "description": "Invalid Crumb"}}}
+            return self._fixture(f"quoteSummary_{symbol}.json", "quoteSummary")
+        if path.startswith("/ws/fundamentals-timeseries/"):
+            status, payload = self._fixture(f"timeseries_{symbol}.json", "timeseries")
+            if status == 200:
+                wanted = set(query.get("type", "").split(","))
+                payload["timeseries"]["result"] = [r for r in payload["timeseries"]["result"] if r["meta"]["type"][0] in wanted]
+            return status, payload
+        if path.startswith("/v8/finance/chart/"):
+            # yfinance 查詢時區時用 range=1d：以最短的檔案代替
+            rng = query.get("range", "1mo")
+            name = f"chart_{symbol}_{rng}.json"
+            if not os.path.exists(os.path.join(FIXTURE_DIR, name)):
+                name = f"chart_{symbol}_5d.json"
+            return self._fixture(name, "chart")
+        if path == "/v7/finance/quote":
+            # yf.Ticker.info 另外查詢的即時報價欄位
+            return self._fixture(f"quote_{query.get('symbols')}.json", "quoteResponse")
+        if path == "/v1/finance/search":
+            return self._fixture(f"search_{query.get('q')}.json", "finance")
+        return 404, {"finance": {"result": None, "error": {"code": "Not Found", "description": path}}}
+
+    @staticmethod
+    def _fixture(name: str, root: str):
+        if not os.path.exists(os.path.join(FIXTURE_DIR, name)):
+            return 404, {root: {"result": None, "error": {"code": "Not Found", "description": "No data found, symbol may be delisted"}}}
+        return 200, load_fixture(name)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive，同 Yahoo
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                with stub._lock:
+                    stub.requests.append((url.path, query))
+                status, body = stub.route(url.path, query)
+                raw = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain" if isinstance(body, str) else "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler